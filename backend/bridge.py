@@ -5,11 +5,19 @@ Exposes Python methods to the Vue.js frontend.
 import base64
 import os
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
-from PyQt6.QtCore import QObject, pyqtSlot, pyqtSignal, QTimer
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSlot, pyqtSignal, QTimer
 from PyQt6.QtWidgets import QFileDialog
-from database import Database, get_app_data_dir
+from bridge_recorder import CallRecorder, recorded
+from database import Database, get_app_data_dir, face_encoding_to_blob, FACE_ENCODING_FORMAT
+from face_gallery_cache import FaceGalleryCache
+from face_analysis import FaceAnalysis
+from face_duplicates import get_duplicate_settings
+from face_recognizer import FaceRecognizer, decode_photo_base64
+from presence_gate import PresenceGate, IDLE_SCAN_MS
+from recognition_metrics import METRICS, SUMMARY_INTERVAL_SECONDS
 
 # Get logger for this module (initialized by main.py)
 def _get_logger():
@@ -17,25 +25,105 @@ def _get_logger():
     return logging.getLogger(__name__)
 
 
+class _TaskSignals(QObject):
+    """Signals for _BridgeTask (QRunnable cannot emit signals itself)."""
+
+    finished = pyqtSignal(str, str, str)  # kind, request_id, result JSON
+
+
+class _ProgressSignals(QObject):
+    """
+    Relay for progress reported by plain Python threads (bulk enrollment, re-encoding).
+    Created on the GUI thread, so its queued connection delivers on the GUI thread.
+    """
+
+    progress = pyqtSignal(str, str)  # kind, progress JSON
+
+
+class _BridgeTask(QRunnable):
+    """Runs a synchronous bridge method on a worker thread and reports its JSON result."""
+
+    def __init__(self, kind, request_id, func, *args):
+        super().__init__()
+        self.kind = kind
+        self.request_id = request_id
+        self.func = func
+        self.args = args
+        self.signals = _TaskSignals()
+
+    def run(self):
+        import json
+
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            _get_logger().error(f"❌ Async {self.kind} task failed: {e}", exc_info=True)
+            result = json.dumps({
+                "success": False,
+                "message": f"Error: {str(e)}"
+            })
+
+        self.signals.finished.emit(self.kind, self.request_id, result)
+
+
 class KioskBridge(QObject):
     """Bridge between Vue.js frontend and Python backend."""
 
     # Signals for progress updates
     populateProgressUpdate = pyqtSignal(str)  # Emits JSON with progress info
+    bulkEnrollmentProgress = pyqtSignal(str)  # Same shape, final update carries the per-file report
+
+    # Signals for async face operations - emit JSON {"request_id": str, "result": {...}}
+    recognitionResult = pyqtSignal(str)
+    multiRecognitionResult = pyqtSignal(str)
+    faceQualityResult = pyqtSignal(str)
+    faceRegistrationResult = pyqtSignal(str)
+
+    # Re-encoding job status after an encoding model change (JSON, see getFaceReencodingStatus)
+    faceReencodingProgress = pyqtSignal(str)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, db_path=None):
         super().__init__()
-        self.db = Database()
+        self.db = Database(db_path)
         self.parent = parent  # Store parent widget for file dialogs
-        # Cache for face encodings to avoid repeated DB queries
-        self._face_encodings_cache = None
-        self._cache_timestamp = None
-        self._cache_ttl_seconds = 300  # Cache expires after 5 minutes
+        # Opt-in call log for reproducing slow kiosks (KIOSK_RECORD_CALLS, see bridge_recorder)
+        self._recorder = CallRecorder.from_environment(self.db.db_path)
+        # Face gallery cache - kept in sync through the DB gallery version; exact
+        # search unless FACE_GALLERY_INDEX opts in to the ANN index (10k+ employees)
+        self._face_cache = FaceGalleryCache(self.db)
+        # In-process recognizer, built on first use (only on fallback while the worker runs)
+        self._face_recognizer = None
+        self._face_recognizer_lock = threading.Lock()
+        # Skips recognition of unchanged frames and sets the scan cadence
+        self._presence_gate = PresenceGate()
+        # Optional out-of-process recognition worker (started by KioskWindow)
+        self._recognition_service = None
+        # Worker thread for face detection/encoding so the GUI thread never blocks.
+        # One thread: dlib models are shared and scans are processed in order.
+        self._face_pool = QThreadPool()
+        self._face_pool.setMaxThreadCount(1)
+        # Progress from background job threads, re-emitted on the GUI thread
+        self._progress_signals = _ProgressSignals()
+        self._progress_signals.progress.connect(self._on_progress, Qt.ConnectionType.QueuedConnection)
         # Batch processing state
         self._populate_timer = None
         self._populate_state = None
+        # Running bulk enrollment job (at most one)
+        self._bulk_enrollment_job = None
+        # Re-encoding job after an encoding model change (started by KioskWindow)
+        self._reencoding_job = None
+        # Fidelity tier of the last recognized face (logged when the governor changes it)
+        self._fidelity_tier = None
+        # Periodic stage timing summary in the debug log
+        self._metrics_logged_count = 0
+        self._metrics_timer = QTimer(self)
+        self._metrics_timer.timeout.connect(self._log_recognition_metrics)
+        self._metrics_timer.start(SUMMARY_INTERVAL_SECONDS * 1000)
+        # Convert legacy JSON face encodings to binary in the background
+        QTimer.singleShot(1000, self._migrate_face_encodings_batch)
 
     @pyqtSlot(str, str, str, result=str)
+    @recorded
     def logTimeEntry(self, employee_id, action, photo_base64):
         """
         Log a time entry with photo.
@@ -95,9 +183,8 @@ class KioskBridge(QObject):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{employee_id}_{action}_{timestamp}.png"
 
-        # Save to photos directory in app data dir
-        data_dir = get_app_data_dir()
-        photos_dir = data_dir / "photos"
+        # Save to the photos directory next to the database
+        photos_dir = Path(self.db.db_path).parent / "photos"
         photos_dir.mkdir(parents=True, exist_ok=True)
 
         photo_path = photos_dir / filename
@@ -107,32 +194,129 @@ class KioskBridge(QObject):
         # Return relative path
         return str(photo_path)
 
-    def _get_cached_face_encodings(self):
+    def _migrate_face_encodings_batch(self, after_id=0, converted_total=0):
         """
-        Get face encodings from cache or database.
-        Refreshes cache every 5 minutes to balance performance and data freshness.
+        Convert one chunk of legacy JSON face encodings to binary (called by QTimer).
+        Chunks are spaced out so recognition and clock-ins keep running.
+        """
+        import sys
 
-        Returns:
-            list: Tuples of (id, name, face_encoding_json, employee_number)
+        try:
+            scanned, converted, last_id = self.db.migrate_face_encodings_batch(after_id)
+        except Exception as e:
+            sys.stderr.write(f"❌ Face encoding migration failed: {e}\n")
+            sys.stderr.flush()
+            return
+
+        converted_total += converted
+
+        if scanned > 0:
+            # More rows may remain - schedule next chunk
+            QTimer.singleShot(50, lambda: self._migrate_face_encodings_batch(last_id, converted_total))
+        elif converted_total > 0:
+            sys.stderr.write(f"✅ Migrated {converted_total} face encodings to binary storage\n")
+            sys.stderr.flush()
+
+    def _run_async(self, kind, request_id, func, *args):
+        """
+        Run a synchronous face method on the face worker thread.
+        The result is delivered through the signal matching kind.
         """
-        from datetime import datetime, timedelta
+        task = _BridgeTask(kind, request_id, func, *args)
+        task.signals.finished.connect(self._on_async_finished)
+        self._face_pool.start(task)
 
-        now = datetime.now()
+    @pyqtSlot(str, str, str)
+    def _on_async_finished(self, kind, request_id, result):
+        """Forward a worker result to the frontend (runs on the GUI thread)."""
+        import json
 
-        # Check if cache is empty or expired
-        if (self._face_encodings_cache is None or
-            self._cache_timestamp is None or
-            (now - self._cache_timestamp).total_seconds() > self._cache_ttl_seconds):
+        signal = {
+            "recognition": self.recognitionResult,
+            "multi_recognition": self.multiRecognitionResult,
+            "quality": self.faceQualityResult,
+            "registration": self.faceRegistrationResult
+        }[kind]
 
-            # Refresh cache from database
-            self._face_encodings_cache = self.db.get_all_face_encodings()
-            self._cache_timestamp = now
+        # result is already JSON - embed it without re-parsing
+        signal.emit(f'{{"request_id": {json.dumps(request_id)}, "result": {result}}}')
 
-            import sys
-            sys.stderr.write(f"🔄 Face encodings cache refreshed ({len(self._face_encodings_cache)} employees)\n")
-            sys.stderr.flush()
+    def _emit_progress(self, kind, progress):
+        """
+        Report job progress from any thread; the frontend signal is emitted on the GUI thread.
 
-        return self._face_encodings_cache
+        Args:
+            kind (str): Progress signal to emit ("bulk_enrollment" or "face_reencoding")
+            progress (dict): Progress/status to send as JSON
+        """
+        import json
+        self._progress_signals.progress.emit(kind, json.dumps(progress))
+
+    @pyqtSlot(str, str)
+    def _on_progress(self, kind, progress_json):
+        """Forward job progress to the frontend (runs on the GUI thread)."""
+        signal = {
+            "bulk_enrollment": self.bulkEnrollmentProgress,
+            "face_reencoding": self.faceReencodingProgress
+        }[kind]
+        signal.emit(progress_json)
+
+    @pyqtSlot(str, str)
+    def recognizeFaceAsync(self, request_id, photo_base64):
+        """
+        Non-blocking recognizeFace. Result arrives via recognitionResult.
+
+        Args:
+            request_id (str): Caller-chosen id echoed back with the result
+            photo_base64 (str): Base64 encoded photo
+        """
+        self._run_async("recognition", request_id, self.recognizeFace, photo_base64)
+
+    @pyqtSlot(str, str)
+    def recognizeFacesAsync(self, request_id, photo_base64):
+        """
+        Non-blocking recognizeFaces. Result arrives via multiRecognitionResult.
+
+        Args:
+            request_id (str): Caller-chosen id echoed back with the result
+            photo_base64 (str): Base64 encoded photo
+        """
+        self._run_async("multi_recognition", request_id, self.recognizeFaces, photo_base64)
+
+    @pyqtSlot(str, str)
+    def checkFaceQualityAsync(self, request_id, photo_base64):
+        """
+        Non-blocking checkFaceQuality. Result arrives via faceQualityResult.
+
+        Args:
+            request_id (str): Caller-chosen id echoed back with the result
+            photo_base64 (str): Base64 encoded photo
+        """
+        self._run_async("quality", request_id, self.checkFaceQuality, photo_base64)
+
+    @pyqtSlot(str, int, str)
+    def registerFaceEncodingAsync(self, request_id, employee_id, photo_base64):
+        """
+        Non-blocking registerFaceEncoding. Result arrives via faceRegistrationResult.
+
+        Args:
+            request_id (str): Caller-chosen id echoed back with the result
+            employee_id (int): Database ID of employee
+            photo_base64 (str): Base64 encoded photo
+        """
+        self._run_async("registration", request_id, self.registerFaceEncoding, employee_id, photo_base64)
+
+    @pyqtSlot(str, int, str)
+    def registerFaceEncodingApprovedAsync(self, request_id, employee_id, photo_base64):
+        """
+        Non-blocking registerFaceEncodingApproved. Result arrives via faceRegistrationResult.
+
+        Args:
+            request_id (str): Caller-chosen id echoed back with the result
+            employee_id (int): Database ID of employee
+            photo_base64 (str): Base64 encoded photo
+        """
+        self._run_async("registration", request_id, self.registerFaceEncodingApproved, employee_id, photo_base64)
 
     @pyqtSlot(result=str)
     def testConnection(self):
@@ -651,14 +835,16 @@ class KioskBridge(QObject):
 
                     # Check if employee already exists
                     cursor.execute("""
-                        SELECT id, name, employee_number, deleted_at, face_encoding, face_registered_at
+                        SELECT id, name, employee_number, deleted_at,
+                               face_encoding_blob IS NOT NULL OR face_encoding IS NOT NULL,
+                               face_registered_at
                         FROM employee WHERE backend_id = ?
                     """, (system_id,))
 
                     existing = cursor.fetchone()
 
                     if existing:
-                        emp_id, current_name, current_number, deleted_at, local_face_encoding, local_face_registered_at = existing
+                        emp_id, current_name, current_number, deleted_at, has_local_face_encoding, local_face_registered_at = existing
 
                         # Check if data changed or if restoring deleted employee
                         data_changed = (current_name != full_name or current_number != employee_number)
@@ -676,22 +862,32 @@ class KioskBridge(QObject):
                         # Handle face encoding sync
                         if has_face_registration and api_face_encoding:
                             # Cloud has face data
-                            if not local_face_encoding:
+                            if not has_local_face_encoding:
                                 # Local doesn't have face data - download from cloud
+                                # (JSON from the API is stored locally in binary form)
                                 cursor.execute("""
                                     UPDATE employee
-                                    SET face_encoding = ?,
+                                    SET face_encoding = NULL,
+                                        face_encoding_blob = ?,
+                                        face_encoding_format = ?,
+                                        face_encoding_model = (SELECT encoding_model FROM face_gallery_state WHERE id = 1),
+                                        face_upload_pending = 0,
                                         face_registered_at = ?,
                                         has_face_registration = 1
                                     WHERE id = ?
-                                """, (api_face_encoding, api_face_registered_at, emp_id))
+                                """, (face_encoding_to_blob(json.loads(api_face_encoding)), FACE_ENCODING_FORMAT,
+                                      api_face_registered_at, emp_id))
                                 face_sync_count += 1
-                        elif not has_face_registration and local_face_encoding:
+                        elif not has_face_registration and has_local_face_encoding:
                             # Cloud doesn't have face data but local does - clear local
                             # (Cloud is source of truth)
                             cursor.execute("""
                                 UPDATE employee
                                 SET face_encoding = NULL,
+                                    face_encoding_blob = NULL,
+                                    face_encoding_format = NULL,
+                                    face_encoding_model = NULL,
+                                    face_upload_pending = 0,
                                     face_registered_at = NULL,
                                     has_face_registration = 0,
                                     face_photo_path = NULL
@@ -704,9 +900,15 @@ class KioskBridge(QObject):
                         if has_face_registration and api_face_encoding:
                             cursor.execute("""
                                 INSERT INTO employee (backend_id, name, employee_number,
-                                                    face_encoding, face_registered_at, has_face_registration)
-                                VALUES (?, ?, ?, ?, ?, 1)
-                            """, (system_id, full_name, employee_number, api_face_encoding, api_face_registered_at))
+                                                    face_encoding_blob, face_encoding_format,
+                                                    face_encoding_model,
+                                                    face_registered_at, has_face_registration)
+                                VALUES (?, ?, ?, ?, ?,
+                                        (SELECT encoding_model FROM face_gallery_state WHERE id = 1),
+                                        ?, 1)
+                            """, (system_id, full_name, employee_number,
+                                  face_encoding_to_blob(json.loads(api_face_encoding)), FACE_ENCODING_FORMAT,
+                                  api_face_registered_at))
                             face_sync_count += 1
                         else:
                             cursor.execute("""
@@ -770,11 +972,6 @@ class KioskBridge(QObject):
             conn.commit()
             conn.close()
 
-            # Clear face encodings cache after sync
-            if face_sync_count > 0:
-                self._face_encodings_cache = None
-                self._cache_timestamp = None
-
             return json.dumps({
                 "success": True,
                 "added_count": added_count,
@@ -906,6 +1103,7 @@ class KioskBridge(QObject):
             })
 
     @pyqtSlot(str, result=str)
+    @recorded
     def checkFaceQuality(self, photo_base64):
         """
         Check quality of a face photo before registration.
@@ -918,219 +1116,67 @@ class KioskBridge(QObject):
             str: JSON string with quality score and issues
         """
         import json
-        import numpy as np
-        import cv2
+
+        timer = METRICS.start("quality")
+        try:
+            return json.dumps(self._check_face_quality(photo_base64, timer))
+        finally:
+            timer.finish()
+
+    def _check_face_quality(self, photo_base64, timer):
+        """checkFaceQuality body; timer receives per-stage laps. Returns the result dict."""
+        # Wait for a running model warm-up instead of loading dlib twice
+        if self._face_recognizer is not None:
+            self._face_recognizer.wait_for_warmup()
 
         try:
             import face_recognition
         except ImportError as e:
-            return json.dumps({
+            return {
                 "success": False,
                 "quality_score": 0,
                 "message": f"Face recognition library not installed: {str(e)}",
                 "issues": []
-            })
+            }
 
         try:
-            # Remove data URL prefix
-            if "base64," in photo_base64:
-                photo_base64 = photo_base64.split("base64,")[1]
-
-            # Decode base64
-            photo_bytes = base64.b64decode(photo_base64)
-            nparr = np.frombuffer(photo_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            if image is None:
-                return json.dumps({
-                    "success": False,
-                    "quality_score": 0,
-                    "message": "Failed to decode image",
-                    "issues": [{"type": "decode", "severity": "error", "message": "Failed to decode image"}]
-                })
-
-            # Convert BGR to RGB for face_recognition
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            height, width = image.shape[:2]
-
-            issues = []
-            quality_score = 0
-
-            # 1. Face Detection (mandatory)
-            face_locations = face_recognition.face_locations(rgb_image)
-
-            if len(face_locations) == 0:
-                return json.dumps({
-                    "success": False,
-                    "quality_score": 0,
-                    "message": "No face detected in photo",
-                    "issues": [{"type": "no_face", "severity": "error", "message": "No face detected. Ensure your face is visible and well-lit."}]
-                })
-
-            if len(face_locations) > 1:
-                return json.dumps({
-                    "success": False,
-                    "quality_score": 0,
-                    "message": "Multiple faces detected",
-                    "issues": [{"type": "multiple_faces", "severity": "error", "message": "Multiple faces detected. Ensure only your face is visible."}]
-                })
-
-            # Get face bounding box
-            top, right, bottom, left = face_locations[0]
-            face_width = right - left
-            face_height = bottom - top
-            face_area = face_width * face_height
-            frame_area = width * height
-            face_size_ratio = face_area / frame_area
-
-            # 2. Blur Detection (30 points)
-            # Adjusted thresholds for typical webcam quality (720p-1080p)
-            # Lowered thresholds to be more forgiving for standard webcams
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-
-            if laplacian_var > 80:
-                # Good focus - most webcams should achieve this
-                quality_score += 30
-            elif laplacian_var > 30:
-                # Acceptable focus - still usable for face recognition
-                quality_score += 20
-                issues.append({"type": "blur", "severity": "warning", "message": "Image is slightly blurry. Hold camera steady."})
-            else:
-                # Poor focus - but still allow if score >= 70
-                quality_score += 10
-                issues.append({"type": "blur", "severity": "warning", "message": "Image is blurry. Try holding camera steady or cleaning lens."})
-
-            # 3. Brightness Check (20 points)
-            brightness = np.mean(gray)
-
-            if 80 <= brightness <= 180:
-                quality_score += 20
-            elif 50 <= brightness <= 200:
-                quality_score += 10
-                if brightness < 80:
-                    issues.append({"type": "brightness", "severity": "warning", "message": "Lighting is dim. Move to a brighter area."})
-                else:
-                    issues.append({"type": "brightness", "severity": "warning", "message": "Lighting is too bright. Avoid direct light on face."})
-            else:
-                # Even poor lighting can work if other criteria are met
-                if brightness < 50:
-                    issues.append({"type": "brightness", "severity": "warning", "message": "Too dark. Turn on lights or move to brighter area."})
-                else:
-                    issues.append({"type": "brightness", "severity": "warning", "message": "Too bright. Reduce direct lighting."})
-
-            # 4. Face Size Check (20 points)
-            # More forgiving thresholds - accept smaller faces (further distance)
-            if 0.15 <= face_size_ratio <= 0.40:
-                # Good range - face is clearly visible
-                quality_score += 20
-            elif 0.10 <= face_size_ratio <= 0.50:
-                # Acceptable range - slightly far or close
-                quality_score += 15
-                if face_size_ratio < 0.15:
-                    issues.append({"type": "distance", "severity": "warning", "message": "Face is small. Move 6 inches closer to camera."})
-                else:
-                    issues.append({"type": "distance", "severity": "warning", "message": "Face is large. Move back slightly."})
-            else:
-                # Still usable but not ideal
-                quality_score += 5
-                if face_size_ratio < 0.10:
-                    issues.append({"type": "distance", "severity": "warning", "message": "Too far from camera. Move much closer."})
-                else:
-                    issues.append({"type": "distance", "severity": "warning", "message": "Too close to camera. Move back."})
-
-            # 5. Face Centering Check (15 points)
-            face_center_x = (left + right) / 2
-            face_center_y = (top + bottom) / 2
-            frame_center_x = width / 2
-            frame_center_y = height / 2
-            offset_x = abs(face_center_x - frame_center_x) / width
-            offset_y = abs(face_center_y - frame_center_y) / height
-            max_offset = max(offset_x, offset_y)
-
-            if max_offset < 0.15:
-                quality_score += 15
-            elif max_offset < 0.25:
-                quality_score += 8
-                if offset_x > offset_y:
-                    direction = "left" if face_center_x < frame_center_x else "right"
-                    issues.append({"type": "centering", "severity": "warning", "message": f"Face slightly off-center. Move {direction}."})
-                else:
-                    direction = "down" if face_center_y < frame_center_y else "up"
-                    issues.append({"type": "centering", "severity": "warning", "message": f"Face slightly off-center. Move {direction}."})
-            else:
-                issues.append({"type": "centering", "severity": "error", "message": "Face not centered. Position yourself in the middle of frame."})
-
-            # 6. Face Angle Check (15 points) using landmarks
-            try:
-                face_landmarks_list = face_recognition.face_landmarks(rgb_image)
-                if face_landmarks_list:
-                    landmarks = face_landmarks_list[0]
-
-                    # Calculate nose-to-eye distances (simple frontal face check)
-                    left_eye = np.array(landmarks['left_eye'])
-                    right_eye = np.array(landmarks['right_eye'])
-                    nose_bridge = np.array(landmarks['nose_bridge'])
-
-                    left_eye_center = np.mean(left_eye, axis=0)
-                    right_eye_center = np.mean(right_eye, axis=0)
-                    nose_tip = nose_bridge[-1]
-
-                    # Calculate eye distance and nose-to-eye distances
-                    eye_distance = np.linalg.norm(right_eye_center - left_eye_center)
-                    nose_to_left_eye = np.linalg.norm(nose_tip - left_eye_center)
-                    nose_to_right_eye = np.linalg.norm(nose_tip - right_eye_center)
-
-                    # Check symmetry (frontal face should be symmetric)
-                    symmetry_ratio = min(nose_to_left_eye, nose_to_right_eye) / max(nose_to_left_eye, nose_to_right_eye)
-
-                    if symmetry_ratio > 0.85:
-                        quality_score += 15
-                    elif symmetry_ratio > 0.70:
-                        quality_score += 8
-                        if nose_to_left_eye < nose_to_right_eye:
-                            issues.append({"type": "angle", "severity": "warning", "message": "Turn your head slightly to the right."})
-                        else:
-                            issues.append({"type": "angle", "severity": "warning", "message": "Turn your head slightly to the left."})
-                    else:
-                        issues.append({"type": "angle", "severity": "error", "message": "Face the camera directly. Don't turn your head."})
-            except:
-                # If landmark detection fails, give partial points
-                quality_score += 8
-
-            # Determine overall success
-            # Quality score must be >= 70 AND no critical errors (no_face, multiple_faces, decode)
-            success = quality_score >= 70 and not any(issue['severity'] == 'error' for issue in issues)
-
-            return json.dumps({
-                "success": success,
-                "quality_score": quality_score,
-                "message": f"Quality score: {quality_score}/100",
-                "issues": issues,
-                "metrics": {
-                    "blur_score": float(laplacian_var),
-                    "brightness": float(brightness),
-                    "face_size_ratio": float(face_size_ratio),
-                    "center_offset": float(max_offset)
-                }
-            })
+            return FaceAnalysis.from_base64(photo_base64, timer).quality()
 
         except Exception as e:
             import sys
             sys.stderr.write(f"❌ Error checking face quality: {e}\n")
             sys.stderr.flush()
-            return json.dumps({
+            return {
                 "success": False,
                 "quality_score": 0,
                 "message": f"Error checking face quality: {str(e)}",
                 "issues": [{"type": "error", "severity": "error", "message": str(e)}]
-            })
+            }
 
     @pyqtSlot(int, str, result=str)
     def registerFaceEncoding(self, employee_id, photo_base64):
         """
         Register face encoding for an employee from a photo.
 
+        Args:
+            employee_id (int): Database ID of employee
+            photo_base64 (str): Base64 encoded photo (data:image/png;base64,...)
+
+        Returns:
+            str: JSON string with result
+        """
+        timer = METRICS.start("registration")
+        try:
+            return self._register_face_encoding(employee_id, photo_base64, timer)
+        finally:
+            timer.finish()
+
+    @pyqtSlot(int, str, result=str)
+    def registerFaceEncodingApproved(self, employee_id, photo_base64):
+        """
+        Register a face that registerFaceEncoding flagged as a possible duplicate,
+        after an administrator confirmed it. Not allowed with FACE_DUPLICATE_POLICY=reject.
+
         Args:
             employee_id (int): Database ID of employee
             photo_base64 (str): Base64 encoded photo (data:image/png;base64,...)
@@ -1139,10 +1185,34 @@ class KioskBridge(QObject):
             str: JSON string with result
         """
         import json
+
+        policy, _ = get_duplicate_settings()
+        if policy == "reject":
+            return json.dumps({
+                "success": False,
+                "message": "Duplicate faces cannot be approved (FACE_DUPLICATE_POLICY=reject)"
+            })
+
+        timer = METRICS.start("registration")
+        try:
+            return self._register_face_encoding(employee_id, photo_base64, timer, allow_duplicate=True)
+        finally:
+            timer.finish()
+
+    def _register_face_encoding(self, employee_id, photo_base64, timer, allow_duplicate=False):
+        """
+        registerFaceEncoding body; timer receives per-stage laps.
+        allow_duplicate skips the duplicate-face check (approved registrations).
+        """
+        import json
         import numpy as np
 
         _get_logger().info("registerFace called for employee: %s", employee_id)
 
+        # Wait for a running model warm-up instead of loading dlib twice
+        if self._face_recognizer is not None:
+            self._face_recognizer.wait_for_warmup()
+
         try:
             # Import face_recognition library
             import face_recognition
@@ -1161,9 +1231,14 @@ class KioskBridge(QObject):
             })
 
         try:
+            # Decode and detect once; the quality check, encoding and photo all share it
+            # Encode with the model the gallery is built from (changes only when
+            # face_reencoding swaps in a new one)
+            self._face_cache.refresh()
+            analysis = FaceAnalysis.from_base64(photo_base64, timer, self._face_cache.encoding_model)
+
             # First, check photo quality before processing
-            quality_check_result = self.checkFaceQuality(photo_base64)
-            quality_data = json.loads(quality_check_result)
+            quality_data = analysis.quality()
 
             # If quality check fails, return detailed error
             if not quality_data.get('success', False):
@@ -1181,13 +1256,6 @@ class KioskBridge(QObject):
             # Quality check passed, proceed with registration
             _get_logger().info(f"✅ Face quality check passed: {quality_data.get('quality_score')}/100")
 
-            # Remove data URL prefix
-            if "base64," in photo_base64:
-                photo_base64 = photo_base64.split("base64,")[1]
-
-            # Decode base64
-            photo_bytes = base64.b64decode(photo_base64)
-
             # Save photo to faces directory in app data dir
             import platform
 
@@ -1233,12 +1301,17 @@ class KioskBridge(QObject):
             _get_logger().info(f"   Path length: {len(str(photo_path))} characters")
             _get_logger().info(f"   Employee ID: {employee_id}")
 
+            # Write the photo in the background while the encoding is computed
+            photo_write = analysis.write_photo_async(photo_path_str)
+
+            # Encode at the face location found by the quality check (no second detection)
+            face_encoding = analysis.encoding
+
             # Save photo with proper error handling
             try:
-                with open(photo_path_str, "wb") as f:
-                    f.write(photo_bytes)
+                photo_write.result()
                 _get_logger().info(f"✅ Photo saved successfully to: {photo_filename}")
-                _get_logger().info(f"   File size: {len(photo_bytes)} bytes")
+                _get_logger().info(f"   File size: {len(analysis.photo_bytes)} bytes")
             except Exception as write_error:
                 _get_logger().error(f"❌ Failed to write photo file: {write_error}")
                 _get_logger().error(f"   Error type: {type(write_error).__name__}")
@@ -1250,44 +1323,52 @@ class KioskBridge(QObject):
                     "message": f"Failed to save photo: {str(write_error)}. Check disk space and permissions."
                 })
 
-            # Load image and detect faces
-            image = face_recognition.load_image_file(str(photo_path))
-            face_encodings = face_recognition.face_encodings(image)
+            timer.lap("save_photo")
 
-            if len(face_encodings) == 0:
-                # Delete the saved photo since no face was detected
+            if face_encoding is None:
+                # Delete the saved photo since no face could be encoded
                 os.remove(photo_path)
                 return json.dumps({
                     "success": False,
                     "message": "No face detected in the photo. Please try again with a clear face photo."
                 })
 
-            if len(face_encodings) > 1:
-                # Delete the saved photo since multiple faces were detected
-                os.remove(photo_path)
-                return json.dumps({
-                    "success": False,
-                    "message": "Multiple faces detected. Please ensure only one face is visible in the photo."
-                })
-
-            # Get the face encoding (first and only one)
-            face_encoding = face_encodings[0]
+            # The same face registered to another active employee would make
+            # recognition clock in whichever of the two it meets first
+            policy, duplicate_threshold = get_duplicate_settings()
+            if policy != "off" and not allow_duplicate:
+                duplicates = self._face_cache.find_within(face_encoding, duplicate_threshold, exclude_id=employee_id)
+                timer.lap("duplicate_check")
+                if duplicates:
+                    closest = duplicates[0]
+                    _get_logger().warning(f"⚠️ Face of employee {employee_id} matches employee {closest['id']} "
+                                          f"(distance {closest['distance']})")
+                    os.remove(photo_path)
+                    message = (f"This face is already registered to {closest['name']} "
+                               f"(#{closest['employee_number']}).")
+                    if policy == "flag":
+                        message += " An administrator must approve registering it again."
+                    return json.dumps({
+                        "success": False,
+                        "duplicate": True,
+                        "requires_approval": policy == "flag",
+                        "message": message,
+                        "duplicates": duplicates
+                    })
 
-            # Convert numpy array to list and then to JSON
+            # JSON form is only needed for the cloud upload
             face_encoding_json = json.dumps(face_encoding.tolist())
 
-            # Save to database
+            # Save to database (stored as binary)
             success, message = self.db.save_face_encoding(
                 employee_id,
-                face_encoding_json,
-                str(photo_path)
+                face_encoding,
+                str(photo_path),
+                analysis.encoding_model
             )
+            timer.lap("database")
 
             if success:
-                # Clear face encodings cache after registration
-                self._face_encodings_cache = None
-                self._cache_timestamp = None
-
                 # Fetch backend_id for cloud sync
                 conn = self.db.get_connection()
                 cursor = conn.cursor()
@@ -1319,143 +1400,365 @@ class KioskBridge(QObject):
             })
 
     @pyqtSlot(str, result=str)
+    @recorded
     def recognizeFace(self, photo_base64):
         """
         Recognize face from photo and match against all registered employees.
+        Runs in the recognition worker process when it is enabled, otherwise
+        (or if the worker is unavailable) in this process. Frames of a static
+        scene are skipped by the presence gate.
 
         Args:
             photo_base64 (str): Base64 encoded photo
 
         Returns:
-            str: JSON string with matched employee or null
+            str: JSON string with matched employee or null, plus next_scan_ms
+                 (recommended delay before the next scan), skipped,
+                 multiple_faces (use recognizeFaces on the same photo) and
+                 worker_fallback (reason) when the worker could not take the frame
         """
         import json
-        import numpy as np
 
+        timer = METRICS.start("recognition")
         try:
-            # Import face_recognition library
-            import face_recognition
-        except ImportError as e:
-            import sys
-            sys.stderr.write(f"❌ Failed to import face_recognition in recognizeFace: {e}\n")
-            sys.stderr.flush()
-            return json.dumps({
-                "success": False,
-                "message": f"Face recognition library not installed: {str(e)}"
-            })
-        except Exception as e:
-            import sys
-            sys.stderr.write(f"❌ Unexpected error importing face_recognition in recognizeFace: {e}\n")
-            sys.stderr.flush()
-            return json.dumps({
-                "success": False,
-                "message": f"Error loading face recognition: {str(e)}"
-            })
+            try:
+                photo_bytes = decode_photo_base64(photo_base64)
+            except Exception as e:
+                return json.dumps({
+                    "success": False,
+                    "employee": None,
+                    "message": f"Error recognizing face: {str(e)}"
+                })
+            timer.lap("base64_decode")
+
+            try:
+                gate = self._presence_gate.check(photo_bytes)
+            except Exception:
+                # Undecodable thumbnail - let the full pipeline report the error
+                gate = {"scan": True, "next_scan_ms": IDLE_SCAN_MS}
+            timer.lap("presence_gate")
+
+            if not gate["scan"]:
+                return json.dumps({
+                    "success": True,
+                    "employee": None,
+                    "skipped": True,
+                    "message": "No change",
+                    "next_scan_ms": gate["next_scan_ms"]
+                })
+
+            result = None
+            fallback_reason = None
+            if self._recognition_service is not None:
+                result = self._recognition_service.recognize(photo_bytes, timer=timer)
+                if result is None:
+                    fallback_reason = self._recognition_service.last_fallback_reason or "unavailable"
+                    _get_logger().warning(f"⚠️ Recognition worker unavailable ({fallback_reason}), "
+                                          f"recognizing in-process")
+                    timer.lap("worker_fallback")
+
+            if result is None:
+                result = self._get_face_recognizer().recognize(photo_bytes, timer)
+
+            if fallback_reason is not None:
+                result["worker_fallback"] = fallback_reason
+
+            # The governor may run in the worker process - log its tier changes here too
+            tier = result.get("fidelity_tier")
+            if tier and tier != self._fidelity_tier:
+                if self._fidelity_tier is not None:
+                    _get_logger().info(f"🎚️ Recognition fidelity tier {self._fidelity_tier} -> {tier}")
+                self._fidelity_tier = tier
+
+            # A face was seen but not matched - retry the next frame even if nobody moves
+            if result.get("face_detected") and not result.get("employee"):
+                self._presence_gate.request_rescan()
+
+            result["skipped"] = False
+            result["next_scan_ms"] = gate["next_scan_ms"]
+            return json.dumps(result)
+        finally:
+            timer.finish()
+
+    @pyqtSlot(result=str)
+    @recorded
+    def resetFaceScan(self):
+        """
+        Start face scanning from a clean state (scan start or restart, rejected match):
+        tracked identities are forgotten so a previous match is never reused, and
+        the presence gate scans the next frame even if the scene has not changed.
+
+        Returns:
+            str: JSON string with result {"success": bool, "message": str}
+        """
+        import json
+
+        self._presence_gate.reset()
+        if self._face_recognizer is not None:
+            self._face_recognizer.reset_tracking()
+        if self._recognition_service is not None:
+            self._recognition_service.reset_tracking()
+        return json.dumps({"success": True, "message": "Face scan reset"})
+
+    @pyqtSlot(result=str)
+    def getRecognitionMetrics(self):
+        """
+        Get rolling per-stage latency percentiles for recognition, quality check and registration.
+
+        Returns:
+            str: JSON string with {operation: {stage: {count, window, p50_ms, p95_ms, p99_ms, max_ms}}}
+                 and the hot-set hit rate of in-process recognition (None when disabled)
+        """
+        import json
+
+        hot_set = self._face_recognizer.hot_set if self._face_recognizer is not None else None
+        return json.dumps({
+            "success": True,
+            "window_size": METRICS.window_size,
+            "operations": METRICS.snapshot(),
+            "hot_set": hot_set.get_stats() if hot_set is not None else None
+        })
+
+    @pyqtSlot(result=str)
+    def getFidelityStatus(self):
+        """
+        Get the recognition fidelity tier chosen by the latency governor.
+
+        Returns:
+            str: JSON string with {success, enabled, active_tier, governor}. active_tier is
+                 the tier of the last recognized face (also with the recognition worker
+                 process); governor holds the in-process p95, target and recent tier changes
+        """
+        import json
+
+        governor = self._face_recognizer.governor if self._face_recognizer is not None else None
+        return json.dumps({
+            "success": True,
+            "enabled": governor is not None,
+            "active_tier": self._fidelity_tier,
+            "recognition_process": self._recognition_service is not None,
+            "governor": governor.get_status() if governor is not None else None
+        })
+
+    def _log_recognition_metrics(self):
+        """Write the periodic stage timing summary to timekeeper_debug.log (called by QTimer)."""
+        total = METRICS.total_count()
+        if total == self._metrics_logged_count:
+            return
+
+        self._metrics_logged_count = total
+        for line in METRICS.format_summary().splitlines():
+            _get_logger().info(line)
+
+        hot_set = self._face_recognizer.hot_set if self._face_recognizer is not None else None
+        stats = hot_set.get_stats() if hot_set is not None else None
+        if stats and stats["probes"]:
+            _get_logger().info(f"hot set: {stats['hits']}/{stats['probes']} hits ({stats['hit_rate']:.0%}), "
+                               f"{stats['hot_set_size']} employees, {stats['avg_hot_ms']} ms per probe, "
+                               f"{stats['avg_fallback_ms']} ms per full-gallery fallback")
+
+    def _get_face_recognizer(self):
+        """The in-process FaceRecognizer, built on first use."""
+        with self._face_recognizer_lock:
+            if self._face_recognizer is None:
+                self._face_recognizer = FaceRecognizer(self.db, self._face_cache)
+            return self._face_recognizer
+
+    def start_warmup(self):
+        """
+        Preload the face models and gallery in the background (called after the window is shown).
+        Skipped while the recognition worker runs - it warms up its own copy.
+        """
+        if self._recognition_service is not None:
+            _get_logger().info("Recognition worker running - skipping in-process warm-up")
+            return
+        self._get_face_recognizer().start_warmup()
+
+    def stop_recording(self):
+        """Flush and close the call log if KIOSK_RECORD_CALLS is recording (called on close)."""
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def start_face_reencoding(self):
+        """
+        Re-encode stored faces in the background if the encoding model changed
+        (called after the window is shown). Only runs while nobody is at the kiosk.
+        """
+        import threading
+        from face_reencoding import FaceReencodingJob
+
+        if self._reencoding_job is not None:
+            return
+
+        job = FaceReencodingJob(self.db, is_idle=lambda: not self._presence_gate.is_active(),
+                                progress_callback=lambda status: self._emit_progress("face_reencoding", status))
+        if not job.is_needed():
+            return
+
+        def run():
+            try:
+                status = job.run()
+                _get_logger().info(f"🔄 Face re-encoding {status['state']}: {status['message']}")
+            except Exception as e:
+                _get_logger().error(f"❌ Face re-encoding failed: {e}")
+
+        self._reencoding_job = job
+        threading.Thread(target=run, name="face-reencoding", daemon=True).start()
+
+    def stop_face_reencoding(self):
+        """Stop the re-encoding job; it resumes from the staged results on the next start."""
+        if self._reencoding_job is not None:
+            self._reencoding_job.stop()
+
+    @pyqtSlot(result=str)
+    def getFaceReencodingStatus(self):
+        """
+        Get re-encoding progress after an encoding model change.
+
+        Returns:
+            str: JSON string with state (idle/running/paused/stopped/done), total, done, failed and message
+        """
+        import json
+
+        if self._reencoding_job is None:
+            return json.dumps({"success": True, "state": "idle", "message": "No re-encoding needed"})
+        return json.dumps({"success": True, **self._reencoding_job.get_status()})
+
+    @pyqtSlot(result=str)
+    def getPendingFaceUploads(self):
+        """
+        Get faces re-encoded after an encoding model change that cloud does not have yet.
+        Upload them before syncing from cloud, then call markFaceUploadsDone.
+
+        Returns:
+            str: JSON string with uploads [{employee_id, backend_id, face_encoding}]
+        """
+        import json
 
         try:
-            # Remove data URL prefix
-            if "base64," in photo_base64:
-                photo_base64 = photo_base64.split("base64,")[1]
+            uploads = [{"employee_id": employee_id, "backend_id": backend_id,
+                        "face_encoding": json.dumps(face_encoding)}
+                       for employee_id, backend_id, face_encoding in self.db.get_pending_face_uploads()]
+            return json.dumps({"success": True, "uploads": uploads})
 
-            # Decode base64
-            photo_bytes = base64.b64decode(photo_base64)
+        except Exception as e:
+            return json.dumps({"success": False, "error": str(e), "uploads": []})
 
-            # Load image directly from bytes (no temp file I/O for better performance)
-            from PIL import Image
-            import io
+    @pyqtSlot(str, result=str)
+    def markFaceUploadsDone(self, employee_ids_json):
+        """
+        Clear the upload flag of faces that were uploaded to cloud.
 
-            # Open image from bytes
-            pil_image = Image.open(io.BytesIO(photo_bytes))
+        Args:
+            employee_ids_json (str): JSON array of employee database IDs
 
-            # Convert PIL image to numpy array (required by face_recognition)
-            image = np.array(pil_image)
+        Returns:
+            str: JSON string with result
+        """
+        import json
 
-            # Detect faces
-            face_encodings = face_recognition.face_encodings(image)
+        try:
+            employee_ids = json.loads(employee_ids_json)
+            self.db.mark_face_uploads_done(employee_ids)
+            return json.dumps({"success": True, "count": len(employee_ids)})
 
-            if len(face_encodings) == 0:
-                return json.dumps({
-                    "success": True,
-                    "employee": None,
-                    "message": "No face detected in the photo"
-                })
+        except Exception as e:
+            return json.dumps({"success": False, "error": str(e)})
 
-            if len(face_encodings) > 1:
-                return json.dumps({
-                    "success": True,
-                    "employee": None,
-                    "message": "Multiple faces detected"
-                })
+    @pyqtSlot(result=str)
+    def getWarmupStatus(self):
+        """
+        Get face recognition warm-up progress so the UI can show "ready".
+
+        Returns:
+            str: JSON string with state (idle/running/ready/failed), seconds and message
+        """
+        import json
 
-            # Get the face encoding to match
-            unknown_face_encoding = face_encodings[0]
+        if self._face_recognizer is None and self._recognition_service is not None:
+            # Frames wait in the worker until its own warm-up is done
+            return json.dumps({
+                "success": True,
+                "state": "ready",
+                "seconds": None,
+                "message": "Face recognition runs in the worker process"
+            })
 
-            # Get all registered face encodings (uses cache for performance)
-            registered_employees = self._get_cached_face_encodings()
+        return json.dumps({
+            "success": True,
+            **self._get_face_recognizer().get_warmup_status()
+        })
 
-            if not registered_employees:
+    @pyqtSlot(str, result=str)
+    def recognizeFaces(self, photo_base64):
+        """
+        Multi-face mode: recognize every face in the photo in one batched pass,
+        so several people can be confirmed in quick succession.
+
+        Args:
+            photo_base64 (str): Base64 encoded photo
+
+        Returns:
+            str: JSON string with faces (box, employee or null, distance),
+                 identified faces first, most confident first
+        """
+        import json
+
+        timer = METRICS.start("multi_recognition")
+        try:
+            try:
+                photo_bytes = decode_photo_base64(photo_base64)
+            except Exception as e:
                 return json.dumps({
-                    "success": True,
-                    "employee": None,
-                    "message": "No registered faces in the system"
+                    "success": False,
+                    "faces": [],
+                    "message": f"Error recognizing faces: {str(e)}"
                 })
+            timer.lap("base64_decode")
 
-            # Compare against all registered faces
-            best_match = None
-            best_distance = 1.0  # Lower is better, 0.0 is perfect match
-            HIGH_CONFIDENCE_THRESHOLD = 0.4  # Early stopping threshold for very confident matches
+            return json.dumps(self._get_face_recognizer().recognize_all(photo_bytes, timer))
+        finally:
+            timer.finish()
 
-            for emp_id, name, face_encoding_json, employee_number in registered_employees:
-                # Parse stored encoding
-                stored_encoding = np.array(json.loads(face_encoding_json))
+    def start_recognition_service(self):
+        """Move recognition into a supervised worker process (see recognition_service.py)."""
+        from recognition_service import RecognitionService
 
-                # Calculate face distance (lower = more similar)
-                face_distance = face_recognition.face_distance([stored_encoding], unknown_face_encoding)[0]
+        if self._recognition_service is None:
+            self._recognition_service = RecognitionService(self.db.db_path)
+            self._recognition_service.start()
 
-                # OPTIMIZATION: Early stopping if we find a very high confidence match
-                # This avoids checking remaining employees when we're very confident
-                if face_distance < HIGH_CONFIDENCE_THRESHOLD:
-                    best_match = {
-                        "id": emp_id,
-                        "name": name,
-                        "employee_number": employee_number,
-                        "confidence": round((1 - face_distance) * 100, 2)
-                    }
-                    best_distance = face_distance
-                    break  # Stop searching, we found a highly confident match
-
-                # Check if this is the best match so far
-                if face_distance < best_distance:
-                    best_distance = face_distance
-                    best_match = {
-                        "id": emp_id,
-                        "name": name,
-                        "employee_number": employee_number,
-                        "confidence": round((1 - best_distance) * 100, 2)  # Convert to percentage
-                    }
+    def stop_recognition_service(self):
+        """Stop the recognition worker process, if running."""
+        if self._recognition_service is not None:
+            self._recognition_service.stop()
+            self._recognition_service = None
 
-            # Use confidence threshold (0.6 = 60% match required)
-            # Face distance < 0.6 is generally considered a match
-            if best_match and best_distance < 0.6:
-                return json.dumps({
-                    "success": True,
-                    "employee": best_match,
-                    "message": f"Match found: {best_match['name']} ({best_match['confidence']}% confidence)"
-                })
-            else:
-                return json.dumps({
-                    "success": True,
-                    "employee": None,
-                    "message": "No match found (confidence too low)"
-                })
+    @pyqtSlot(result=str)
+    def getRecognitionServiceStats(self):
+        """
+        Get recognition worker health and throughput.
 
-        except Exception as e:
+        Returns:
+            str: JSON string with running, pid, restarts, in_flight,
+                 frames_per_second and matches_per_second
+        """
+        import json
+
+        if self._recognition_service is None:
             return json.dumps({
-                "success": False,
-                "employee": None,
-                "message": f"Error recognizing face: {str(e)}"
+                "success": True,
+                "enabled": False,
+                "message": "Recognition runs in-process"
             })
 
+        return json.dumps({
+            "success": True,
+            "enabled": True,
+            **self._recognition_service.get_stats()
+        })
+
     @pyqtSlot(int, result=str)
     def deleteFaceRegistration(self, employee_id):
         """
@@ -1471,7 +1774,7 @@ class KioskBridge(QObject):
 
         try:
             # Get face photo path before deleting
-            success, face_encoding_json, photo_path = self.db.get_face_encoding(employee_id)
+            success, face_encoding, photo_path = self.db.get_face_encoding(employee_id)
 
             # Delete from database
             success, message = self.db.delete_face_encoding(employee_id)
@@ -1655,13 +1958,12 @@ class KioskBridge(QObject):
             try:
                 # Generate unique random face encoding (128 dimensions)
                 face_encoding = np.random.uniform(-0.5, 0.5, 128)
-                face_encoding_json = json.dumps(face_encoding.tolist())
                 photo_path = "dummy_face_test.png"
 
                 # Save to database
                 success, msg = self.db.save_face_encoding(
                     employee_id,
-                    face_encoding_json,
+                    face_encoding,
                     photo_path
                 )
 
@@ -1692,10 +1994,6 @@ class KioskBridge(QObject):
             # All batches complete
             duration = round(time.time() - state["start_time"], 2)
 
-            # Clear cache
-            self._face_encodings_cache = None
-            self._cache_timestamp = None
-
             # Emit final completion
             self.populateProgressUpdate.emit(json.dumps({
                 "processed": processed,
@@ -1715,6 +2013,80 @@ class KioskBridge(QObject):
             # Schedule next batch with QTimer (allows UI to update)
             QTimer.singleShot(10, self._process_populate_batch)
 
+    @pyqtSlot(str, str, result=str)
+    def startBulkEnrollment(self, folder, key):
+        """
+        Enroll a folder of photos named by employee number or backend_id.
+        Photos are encoded in parallel worker processes with the checkFaceQuality
+        rules and saved in one transaction. Progress arrives via bulkEnrollmentProgress;
+        the final update carries "uploads" for employeeService.uploadBulkEnrollment,
+        without which the next employee sync clears the new faces.
+
+        Args:
+            folder (str): Photo folder (empty: ask with a folder dialog)
+            key (str): "auto", "employee_number" or "backend_id"
+
+        Returns:
+            str: JSON string with result {"success": bool, "message": str}
+        """
+        import json
+        import threading
+        from bulk_enrollment import BulkEnrollmentJob
+
+        if self._bulk_enrollment_job is not None:
+            return json.dumps({"success": False, "message": "Bulk enrollment is already running"})
+
+        if not folder:
+            folder = QFileDialog.getExistingDirectory(self.parent, "Select Employee Photo Folder")
+            if not folder:
+                return json.dumps({"success": False, "message": "Cancelled by user", "cancelled": True})
+
+        if not os.path.isdir(folder):
+            return json.dumps({"success": False, "message": f"Folder not found: {folder}"})
+
+        try:
+            job = BulkEnrollmentJob(self.db, folder, key or "auto",
+                                    progress_callback=lambda progress: self._emit_progress("bulk_enrollment", progress))
+        except ValueError as e:
+            return json.dumps({"success": False, "message": str(e)})
+
+        def run():
+            try:
+                report = job.run()
+                _get_logger().info(f"✅ Bulk enrollment: {report['message']} ({report['duration']}s)")
+            except Exception as e:
+                _get_logger().error(f"❌ Bulk enrollment failed: {e}")
+                self._emit_progress("bulk_enrollment", {
+                    "processed": 0,
+                    "total": 0,
+                    "percent": 0,
+                    "complete": True,
+                    "success": False,
+                    "message": f"Error: {str(e)}"
+                })
+            finally:
+                self._bulk_enrollment_job = None
+
+        self._bulk_enrollment_job = job
+        threading.Thread(target=run, name="bulk-enrollment", daemon=True).start()
+        return json.dumps({"success": True, "message": f"Bulk enrollment started: {folder}", "folder": folder})
+
+    @pyqtSlot(result=str)
+    def cancelBulkEnrollment(self):
+        """
+        Cancel the running bulk enrollment; nothing is saved.
+
+        Returns:
+            str: JSON string with result {"success": bool, "message": str}
+        """
+        import json
+
+        job = self._bulk_enrollment_job
+        if job is None:
+            return json.dumps({"success": False, "message": "No bulk enrollment is running"})
+        job.cancel()
+        return json.dumps({"success": True, "message": "Bulk enrollment cancelling"})
+
     @pyqtSlot(result=str)
     def clearAllFaceData(self):
         """
@@ -1773,10 +2145,6 @@ class KioskBridge(QObject):
                     sys.stderr.write(f"❌ Error clearing face for employee {employee_id}: {e}\n")
                     sys.stderr.flush()
 
-            # Clear face encodings cache after bulk deletion
-            self._face_encodings_cache = None
-            self._cache_timestamp = None
-
             end_time = time.time()
             duration = round(end_time - start_time, 2)
 
@@ -1839,10 +2207,6 @@ class KioskBridge(QObject):
             success, message = self.db.delete_face_encoding(employee_id)
 
             if success:
-                # Clear cache
-                self._face_encodings_cache = None
-                self._cache_timestamp = None
-
                 return json.dumps({
                     "success": True,
                     "message": message,
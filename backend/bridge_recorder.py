@@ -0,0 +1,344 @@
+"""
+Record and replay of kiosk bridge calls.
+Slowness reported from a kiosk can only be reproduced with what the kiosk
+actually received. With KIOSK_RECORD_CALLS set ("true" for the recordings
+directory next to kiosk.db, or a directory path), every recognizeFace,
+checkFaceQuality and logTimeEntry call is appended to a compact log: photos
+as raw image bytes (not base64), the other arguments, the call's offset
+from the start of the session, its latency and a short result summary.
+Writes happen on a background thread, so recording does not add to the
+recorded latencies. The log holds employee photos - only enable it while
+investigating, and delete the files afterwards.
+
+The replayer feeds a log back through a headless KioskBridge running on a
+copy of the database, at the original pace or faster, and reports latency
+percentiles next to the recorded ones:
+    python bridge_recorder.py calls_20240115_071502.krec --db kiosk.db --speed 4
+"""
+import base64
+import functools
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+
+# File signature and version of the call log
+RECORD_MAGIC = b"KREC1\n"
+
+# Recording stops once a log reaches this size (a morning rush is ~100-200 MB)
+RECORD_MAX_BYTES = 1024 * 2 ** 20
+
+# Index of the photo argument of each recorded bridge method
+PHOTO_ARGUMENTS = {
+    "recognizeFace": 0,
+    "checkFaceQuality": 0,
+    "logTimeEntry": 2
+}
+
+# Record header and payload lengths
+_LENGTHS = struct.Struct("<II")
+
+
+def _summarize_result(result):
+    """Short, comparable summary of a bridge JSON result."""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return None
+
+    summary = {"success": data.get("success")}
+    if "employee" in data:
+        employee = data["employee"]
+        summary["employee_id"] = employee.get("id") if employee else None
+    if data.get("skipped"):
+        summary["skipped"] = True
+    if "quality_score" in data:
+        summary["quality_score"] = data["quality_score"]
+    return summary
+
+
+class CallRecorder:
+    """Appends bridge calls to a call log on a background writer thread."""
+
+    def __init__(self, directory, max_bytes=RECORD_MAX_BYTES):
+        """
+        Args:
+            directory (str): Where the calls_<timestamp>.krec log is created
+            max_bytes (int): Size at which recording stops
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"calls_{datetime.now().strftime('%Y%m%d_%H%M%S')}.krec"
+        self.max_bytes = max_bytes
+        self._start = time.perf_counter()
+        self._written = 0
+        self._full = False
+        # One thread keeps the records in call order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="CallRecorder")
+        self._file = open(self.path, "wb")
+        self._file.write(RECORD_MAGIC)
+        self._write_record({"session": datetime.now().isoformat(), "pid": os.getpid()}, b"")
+
+    @classmethod
+    def from_environment(cls, db_path):
+        """
+        Create a recorder if KIOSK_RECORD_CALLS asks for one.
+
+        Args:
+            db_path (str): Kiosk database path ("true" records next to it)
+
+        Returns:
+            CallRecorder or None
+        """
+        setting = os.environ.get('KIOSK_RECORD_CALLS', '')
+        if setting.lower() in ('', 'false', '0'):
+            return None
+        if setting.lower() in ('true', '1'):
+            setting = Path(db_path).parent / "recordings"
+
+        try:
+            recorder = cls(setting)
+        except OSError as e:
+            sys.stderr.write(f"❌ Cannot record bridge calls to {setting}: {e}\n")
+            sys.stderr.flush()
+            return None
+
+        sys.stderr.write(f"⏺️ Recording bridge calls to {recorder.path}\n")
+        sys.stderr.flush()
+        return recorder
+
+    def record(self, method, args, started_at, seconds, result):
+        """
+        Queue one call for writing.
+
+        Args:
+            method (str): Bridge method name
+            args (tuple): Call arguments
+            started_at (float): perf_counter() when the call started
+            seconds (float): Call latency
+            result (str): JSON result of the call
+        """
+        if self._full:
+            return
+        try:
+            self._writer.submit(self._write_call, method, args, started_at - self._start, seconds, result)
+        except RuntimeError:
+            pass  # Closed while the call was running
+
+    def _write_call(self, method, args, offset, seconds, result):
+        args = list(args)
+        header = {"method": method, "offset": round(offset, 4), "latency_ms": round(seconds * 1000, 2),
+                  "result": _summarize_result(result)}
+        payload = b""
+
+        photo_index = PHOTO_ARGUMENTS.get(method)
+        photo = args[photo_index] if photo_index is not None and photo_index < len(args) else None
+        if isinstance(photo, str) and photo.startswith("data:image") and "base64," in photo:
+            prefix, data = photo.split("base64,", 1)
+            payload = base64.b64decode(data)
+            header["photo_argument"] = photo_index
+            header["photo_prefix"] = prefix + "base64,"
+            args[photo_index] = None
+
+        header["args"] = args
+        self._write_record(header, payload)
+
+    def _write_record(self, header, payload):
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        size = _LENGTHS.size + len(header_bytes) + len(payload)
+        if self._written + size > self.max_bytes:
+            self._full = True
+            sys.stderr.write(f"⚠️ Call log {self.path} is full - recording stopped\n")
+            sys.stderr.flush()
+            return
+
+        self._file.write(_LENGTHS.pack(len(header_bytes), len(payload)))
+        self._file.write(header_bytes)
+        self._file.write(payload)
+        self._file.flush()
+        self._written += size
+
+    def close(self):
+        """Finish pending writes and close the log."""
+        self._writer.shutdown(wait=True)
+        self._file.close()
+
+
+def recorded(method):
+    """
+    Record calls of a bridge method when the bridge has a recorder.
+    Goes below @pyqtSlot so the slot keeps its name and signature.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        recorder = self._recorder
+        if recorder is None:
+            return method(self, *args)
+
+        started_at = time.perf_counter()
+        result = method(self, *args)
+        recorder.record(method.__name__, args, started_at, time.perf_counter() - started_at, result)
+        return result
+
+    return wrapper
+
+
+def read_calls(path):
+    """
+    Read a call log.
+
+    Args:
+        path (str): .krec file
+
+    Yields:
+        tuple: (header dict, args list with the photo restored as a base64 data URL)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a bridge call log")
+
+        while True:
+            lengths = f.read(_LENGTHS.size)
+            if len(lengths) < _LENGTHS.size:
+                return
+            header_length, payload_length = _LENGTHS.unpack(lengths)
+            header = json.loads(f.read(header_length))
+            payload = f.read(payload_length)
+            if "method" not in header:
+                continue  # Session header
+
+            args = header["args"]
+            if "photo_argument" in header:
+                args[header["photo_argument"]] = header["photo_prefix"] + base64.b64encode(payload).decode("ascii")
+            yield header, args
+
+
+def _latency_summary(samples_ms):
+    """Percentiles of a list of latencies in ms."""
+    import numpy as np
+
+    if not samples_ms:
+        return None
+    samples = np.asarray(samples_ms)
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "p99_ms": round(float(np.percentile(samples, 99)), 2),
+        "max_ms": round(float(samples.max()), 2)
+    }
+
+
+def replay(path, db_path, speed=1.0, methods=None):
+    """
+    Replay a call log through a headless KioskBridge on a copy of the database.
+    Calls run one after another; at speed 0 they run back to back, otherwise a
+    call waits until its recorded offset divided by speed (late calls run at once).
+
+    Args:
+        path (str): .krec file
+        db_path (str): Database to copy for the replay (the original is never written)
+        speed (float): Pace multiplier (1 = original pace, 0 = as fast as possible)
+        methods (list, optional): Only replay these methods
+
+    Returns:
+        dict: JSON-serialisable report with recorded and replayed latencies per method
+    """
+    from PyQt6.QtCore import QCoreApplication
+    from bridge import KioskBridge
+    from recognition_metrics import METRICS
+
+    # The bridge's QObjects and timers need an application object (kept alive until the end)
+    app = QCoreApplication.instance() or QCoreApplication([])
+    work_dir = Path(tempfile.mkdtemp(prefix="kiosk-replay-"))
+    try:
+        shutil.copyfile(db_path, work_dir / "kiosk.db")
+        bridge = KioskBridge(db_path=str(work_dir / "kiosk.db"))
+        bridge._recorder = None  # Never record the replay itself
+
+        # Load the models before the clock starts, like the kiosk does after start-up
+        bridge.start_warmup()
+        bridge._get_face_recognizer().wait_for_warmup()
+
+        recorded_ms, replayed_ms = {}, {}
+        compared = changed = 0
+        lag_total = 0.0
+        start = time.perf_counter()
+
+        for header, args in read_calls(path):
+            method = header["method"]
+            if methods and method not in methods:
+                continue
+
+            if speed > 0:
+                delay = header["offset"] / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lag_total -= delay
+
+            call_start = time.perf_counter()
+            result = getattr(bridge, method)(*args)
+            replayed_ms.setdefault(method, []).append((time.perf_counter() - call_start) * 1000)
+            recorded_ms.setdefault(method, []).append(header["latency_ms"])
+
+            if method == "recognizeFace" and header.get("result"):
+                compared += 1
+                changed += (_summarize_result(result) or {}).get("employee_id") != header["result"].get("employee_id")
+
+        return {
+            "log": str(path),
+            "speed": speed,
+            "wall_seconds": round(time.perf_counter() - start, 2),
+            "schedule_lag_seconds": round(lag_total, 2),
+            "methods": {method: {"recorded": _latency_summary(recorded_ms[method]),
+                                 "replayed": _latency_summary(samples)}
+                        for method, samples in replayed_ms.items()},
+            "recognition_changed": changed,
+            "recognition_compared": compared,
+            "stages": METRICS.snapshot()
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    """Replay a call log and print recorded vs replayed latencies."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded kiosk bridge calls against this build")
+    parser.add_argument("log", help="calls_<timestamp>.krec file recorded with KIOSK_RECORD_CALLS")
+    parser.add_argument("--db", required=True, help="Database to replay against (a copy is used)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pace multiplier (0 = as fast as possible)")
+    parser.add_argument("--methods", nargs="+", choices=sorted(PHOTO_ARGUMENTS), default=None)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = replay(args.log, args.db, args.speed, args.methods)
+
+    for method, latencies in report["methods"].items():
+        for kind in ("recorded", "replayed"):
+            summary = latencies[kind]
+            print(f"{method:>16} {kind:>8}: n={summary['count']}  p50={summary['p50_ms']:.1f}  "
+                  f"p95={summary['p95_ms']:.1f}  p99={summary['p99_ms']:.1f}  max={summary['max_ms']:.1f} ms")
+    print(f"Replayed in {report['wall_seconds']}s at speed {report['speed']} "
+          f"(fell {report['schedule_lag_seconds']}s behind schedule); recognition result changed for "
+          f"{report['recognition_changed']} of {report['recognition_compared']} frames")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Bulk face enrollment from a folder of photos.
+Each photo is named after the employee it belongs to (employee number or
+backend_id, e.g. "1042.jpg" or "1042_jane_doe.jpg"). Photos are checked and
+encoded in parallel across CPU cores with the same FaceAnalysis quality
+rules as checkFaceQuality, and every accepted encoding is written to the
+employee table in a single transaction. The job ends with one report line
+per file and the encodings to upload to the cloud: the next employee sync
+treats the cloud as the source of truth and clears local faces it lacks.
+
+Run directly to enroll without the kiosk UI:
+    python bulk_enrollment.py photos/ --key employee_number
+"""
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from database import Database, get_app_data_dir
+
+
+PHOTO_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+# How photo names are resolved to employees
+ENROLLMENT_KEYS = ("auto", "employee_number", "backend_id")
+
+# Leading digits of the file name identify the employee
+_EMPLOYEE_KEY_PATTERN = re.compile(r"^(\d+)")
+
+
+def default_workers():
+    """Worker processes to use: every core but one, which stays with the UI."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _analyze_photo(path, encoding_model):
+    """
+    Quality-check and encode one photo (runs in a worker process).
+
+    Args:
+        path (str): Photo file path
+        encoding_model (int): Encoding model version to encode with
+
+    Returns:
+        dict: {accepted, quality_score, message, issues, encoding (list or None)}
+    """
+    from face_analysis import FaceAnalysis
+
+    try:
+        analysis = FaceAnalysis(Path(path).read_bytes(), encoding_model=encoding_model)
+        quality = analysis.quality()
+        encoding = analysis.encoding if quality["success"] else None
+        accepted = encoding is not None
+        message = quality["message"]
+        if quality["success"] and not accepted:
+            message = "Face could not be encoded"
+        return {
+            "accepted": accepted,
+            "quality_score": quality.get("quality_score", 0),
+            "message": message,
+            "issues": [issue["message"] for issue in quality.get("issues", []) if issue["severity"] == "error"],
+            "encoding": encoding.tolist() if accepted else None
+        }
+    except Exception as e:
+        return {"accepted": False, "quality_score": 0, "message": f"Error: {str(e)}", "issues": [], "encoding": None}
+
+
+class BulkEnrollmentJob:
+    """Enrolls a folder of photos; progress and the final report go to a callback."""
+
+    def __init__(self, db, folder, key="auto", workers=None, progress_callback=None):
+        """
+        Args:
+            db (Database): Kiosk database
+            folder (str): Folder of photos named by employee number or backend_id
+            key (str): "auto" (employee number, then backend_id), "employee_number" or "backend_id"
+            workers (int, optional): Worker processes (default: default_workers())
+            progress_callback (callable, optional): Called with a progress dict after each photo
+                and once more with complete=True and the per-file report
+        """
+        if key not in ENROLLMENT_KEYS:
+            raise ValueError(f"Unknown enrollment key: {key}")
+
+        self.db = db
+        self.folder = Path(folder)
+        self.key = key
+        self.workers = workers or default_workers()
+        self.progress_callback = progress_callback
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Stop after the photos already being encoded; nothing is written."""
+        self._cancelled.set()
+
+    def _emit(self, progress):
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
+
+    def _load_employees(self):
+        """Active employees as (id, name, backend_id), keyed by employee number and by backend_id."""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, name, employee_number, backend_id
+            FROM employee
+            WHERE deleted_at IS NULL
+        """)
+        rows = cursor.fetchall()
+        conn.close()
+
+        by_number = {number: (emp_id, name, backend_id)
+                     for emp_id, name, number, backend_id in rows if number is not None}
+        by_backend = {backend_id: (emp_id, name, backend_id)
+                      for emp_id, name, _, backend_id in rows if backend_id is not None}
+        return by_number, by_backend
+
+    def _resolve(self, path, by_number, by_backend):
+        """
+        Find the employee a photo belongs to.
+
+        Returns:
+            tuple: ((employee_id, name, backend_id) or None, error message or None)
+        """
+        found = _EMPLOYEE_KEY_PATTERN.match(path.stem)
+        if not found:
+            return None, "File name does not start with an employee number or backend_id"
+
+        value = int(found.group(1))
+        number_match = by_number.get(value) if self.key in ("auto", "employee_number") else None
+        backend_match = by_backend.get(value) if self.key in ("auto", "backend_id") else None
+
+        if number_match and backend_match and number_match != backend_match:
+            return None, f"{value} is an employee number and a different employee's backend_id"
+        employee = number_match or backend_match
+        if employee is None:
+            return None, f"No active employee matches {value}"
+        return employee, None
+
+    def run(self):
+        """
+        Enroll every photo in the folder.
+
+        Returns:
+            dict: {success, message, enrolled, rejected, duration, files: [per-file report],
+                   uploads: [{employee_id, backend_id, face_encoding (JSON)}] for the cloud}
+        """
+        start_time = time.time()
+        photos = sorted(path for path in self.folder.iterdir()
+                        if path.is_file() and path.suffix.lower() in PHOTO_SUFFIXES)
+        by_number, by_backend = self._load_employees()
+
+        files = []
+        pending = {}
+        claimed = {}
+        for path in photos:
+            employee, error = self._resolve(path, by_number, by_backend)
+            entry = {"file": path.name, "employee_id": None, "backend_id": None, "name": None,
+                     "status": "rejected", "quality_score": None, "message": error}
+            files.append(entry)
+            if employee is None:
+                continue
+
+            entry["employee_id"], entry["name"], entry["backend_id"] = employee
+            if employee[0] in claimed:
+                entry["message"] = f"Another photo ({claimed[employee[0]]}) is already enrolling this employee"
+                continue
+            claimed[employee[0]] = path.name
+            pending[str(path)] = entry
+
+        total = len(files)
+        processed = total - len(pending)
+        accepted = []
+        # Encode with the gallery's active model so the new rows are matched right away
+        encoding_model = self.db.get_face_encoding_model()
+
+        if pending:
+            # spawn: safe alongside Qt threads and identical on Windows/macOS/Linux
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), mp_context=context) as pool:
+                futures = {pool.submit(_analyze_photo, path, encoding_model): path for path in pending}
+                for future in as_completed(futures):
+                    if self._cancelled.is_set():
+                        for other in futures:
+                            other.cancel()
+                        break
+
+                    path = futures[future]
+                    entry = pending[path]
+                    result = future.result()
+                    entry["quality_score"] = result["quality_score"]
+                    entry["message"] = "; ".join([result["message"]] + result["issues"])
+                    if result["accepted"]:
+                        entry["status"] = "accepted"
+                        accepted.append((Path(path), entry, result["encoding"]))
+
+                    processed += 1
+                    self._emit({
+                        "processed": processed,
+                        "total": total,
+                        "percent": round(processed / total * 100),
+                        "complete": False,
+                        "file": entry["file"],
+                        "status": entry["status"]
+                    })
+
+        if self._cancelled.is_set():
+            report = {"success": False, "message": "Bulk enrollment cancelled - nothing was saved",
+                      "enrolled": 0, "rejected": total, "files": files, "uploads": []}
+        else:
+            report = self._save(accepted, files, total, encoding_model)
+
+        report["duration"] = round(time.time() - start_time, 2)
+        self._emit(dict(report, processed=total, total=total, percent=100, complete=True))
+        return report
+
+    def _save(self, accepted, files, total, encoding_model):
+        """Copy accepted photos into the faces directory and write every encoding in one transaction."""
+        faces_dir = get_app_data_dir() / "faces"
+        faces_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        entries, copied = [], []
+        for path, entry, encoding in accepted:
+            # Same naming as registerFaceEncoding: emp_<id>_<timestamp>.<ext>
+            photo_path = faces_dir / f"emp_{entry['employee_id']}_{timestamp}{path.suffix.lower()}"
+            shutil.copyfile(path, photo_path)
+            copied.append(photo_path)
+            entries.append((entry["employee_id"], encoding, str(photo_path)))
+
+        success, message, saved_ids = self.db.save_face_encodings_bulk(entries, encoding_model)
+        saved_ids = set(saved_ids)
+
+        for photo_path, (employee_id, _, _), (_, entry, _) in zip(copied, entries, accepted):
+            if employee_id not in saved_ids:
+                photo_path.unlink(missing_ok=True)
+                entry["status"] = "rejected"
+                entry["message"] = message if not success else "Employee no longer exists"
+
+        # Same upload as registerFaceEncoding's face_encoding; employees without a
+        # backend_id are not synced from the API yet and stay local
+        uploads = []
+        for (employee_id, encoding, _), (_, entry, _) in zip(entries, accepted):
+            if employee_id not in saved_ids:
+                continue
+            if entry["backend_id"] is None:
+                entry["message"] = "; ".join(filter(None, [entry["message"], "No backend_id - not uploaded"]))
+                continue
+            uploads.append({"employee_id": employee_id, "backend_id": entry["backend_id"],
+                            "face_encoding": json.dumps(encoding)})
+
+        enrolled = len(saved_ids)
+        return {
+            "success": success,
+            "message": f"Enrolled {enrolled} of {total} photos" if success else message,
+            "enrolled": enrolled,
+            "rejected": total - enrolled,
+            "files": files,
+            "uploads": uploads
+        }
+
+
+def main(argv=None):
+    """Enroll a folder of photos from the command line and print the per-file report."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-enroll employee faces from a folder of photos")
+    parser.add_argument("folder", help="Folder of photos named by employee number or backend_id")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--key", choices=ENROLLMENT_KEYS, default="auto")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--uploads", help="Write the encodings to upload to the cloud to this JSON file")
+    args = parser.parse_args(argv)
+
+    def progress(update):
+        if not update["complete"]:
+            print(f"[{update['processed']}/{update['total']}] {update['file']}: {update['status']}")
+
+    job = BulkEnrollmentJob(Database(args.db), args.folder, args.key, args.workers, progress)
+    report = job.run()
+
+    for entry in report["files"]:
+        print(f"{entry['status']:>8}  {entry['file']}  {entry['message'] or ''}")
+    print(f"{report['message']} ({report['duration']}s)")
+    if report["uploads"]:
+        if args.uploads:
+            Path(args.uploads).write_text(json.dumps(report["uploads"], indent=2))
+        # The CLI has no API session - the next employee sync clears faces the cloud lacks
+        print(f"⚠️ {len(report['uploads'])} faces are not uploaded to the cloud yet; "
+              f"the next employee sync clears them unless they are uploaded"
+              + (f" (see {args.uploads})" if args.uploads else " (use --uploads to save them)"))
+    return 0 if report["success"] else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -9,6 +9,63 @@ from datetime import datetime
 from pathlib import Path
 
 
+# Binary face encoding formats (employee.face_encoding_format)
+# Encodings are stored as raw little-endian bytes in employee.face_encoding_blob;
+# the JSON text form is only used at the cloud API boundary.
+FACE_ENCODING_FORMAT_FLOAT64 = 1
+FACE_ENCODING_FORMAT_FLOAT32 = 2
+FACE_ENCODING_FORMAT = FACE_ENCODING_FORMAT_FLOAT64
+
+# Encoding model version of rows written before versions were recorded
+# (employee.face_encoding_model NULL); see face_detection.ENCODING_MODELS
+LEGACY_FACE_ENCODING_MODEL = 1
+
+_FACE_ENCODING_DTYPES = {
+    FACE_ENCODING_FORMAT_FLOAT64: '<f8',
+    FACE_ENCODING_FORMAT_FLOAT32: '<f4',
+}
+
+
+def face_encoding_to_blob(face_encoding, encoding_format=FACE_ENCODING_FORMAT):
+    """
+    Serialize a face encoding to raw little-endian bytes.
+
+    Args:
+        face_encoding: Sequence of 128 floats (numpy array or list)
+        encoding_format (int): One of the FACE_ENCODING_FORMAT_* constants
+
+    Returns:
+        bytes: Raw encoding bytes for the face_encoding_blob column
+    """
+    import numpy as np
+    return np.asarray(face_encoding, dtype=_FACE_ENCODING_DTYPES[encoding_format]).tobytes()
+
+
+def face_encoding_from_blob(blob, encoding_format):
+    """
+    Read a stored face encoding without copying the bytes.
+
+    Args:
+        blob (bytes): Value of the face_encoding_blob column
+        encoding_format (int): Value of the face_encoding_format column
+
+    Returns:
+        np.ndarray: Read-only 1-D view over the blob
+    """
+    import numpy as np
+    return np.frombuffer(blob, dtype=_FACE_ENCODING_DTYPES[encoding_format])
+
+
+def _decode_face_encoding(blob, encoding_format, face_encoding_json):
+    """Decode a face encoding from the binary column, falling back to legacy JSON text."""
+    import json
+    import numpy as np
+
+    if blob is not None:
+        return face_encoding_from_blob(blob, encoding_format or FACE_ENCODING_FORMAT_FLOAT64)
+    return np.asarray(json.loads(face_encoding_json), dtype=np.float64)
+
+
 def get_app_data_dir():
     """
     Get the application data directory (writable location).
@@ -76,12 +133,14 @@ class Database:
                 self._create_schema(cursor)
                 self._add_face_recognition_fields(cursor)
                 self._add_timesheet_sync_fields(cursor)
+                self._add_face_gallery_tracking(cursor)
                 conn.commit()
                 print("✅ Database schema initialized")
             else:
                 # Ensure new columns exist even for existing databases
                 self._add_face_recognition_fields(cursor)
                 self._add_timesheet_sync_fields(cursor)
+                self._add_face_gallery_tracking(cursor)
                 conn.commit()
 
             conn.close()
@@ -166,6 +225,16 @@ class Database:
             cursor.execute("ALTER TABLE employee ADD COLUMN face_registered_at DATETIME")
         if 'has_face_registration' not in existing_columns:
             cursor.execute("ALTER TABLE employee ADD COLUMN has_face_registration BOOLEAN DEFAULT 0")
+        if 'face_encoding_blob' not in existing_columns:
+            cursor.execute("ALTER TABLE employee ADD COLUMN face_encoding_blob BLOB")
+        if 'face_encoding_format' not in existing_columns:
+            cursor.execute("ALTER TABLE employee ADD COLUMN face_encoding_format INTEGER")
+        if 'face_encoding_model' not in existing_columns:
+            cursor.execute("ALTER TABLE employee ADD COLUMN face_encoding_model INTEGER")
+        # Set when the local encoding changed without being uploaded to cloud
+        # (re-encoding job), cleared by mark_face_uploads_done
+        if 'face_upload_pending' not in existing_columns:
+            cursor.execute("ALTER TABLE employee ADD COLUMN face_upload_pending BOOLEAN DEFAULT 0")
 
     def _add_timesheet_sync_fields(self, cursor):
         """Add backend sync fields to timesheet table if they don't exist."""
@@ -189,6 +258,101 @@ class Database:
         if not cursor.fetchone():
             cursor.execute("CREATE INDEX idx_timesheet_backend_id ON timesheet(backend_timesheet_id)")
 
+    def _add_face_gallery_tracking(self, cursor):
+        """
+        Create the face gallery version counter, change log and employee triggers.
+        Every write that can change the recognition gallery (including direct
+        DB edits) bumps face_gallery_state.version and logs the employee id,
+        so caches can patch single employees instead of reloading everything.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS face_gallery_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0,
+                pruned_version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO face_gallery_state (id, version, pruned_version) VALUES (1, 0, 0)")
+
+        # Random id of this database, so persisted gallery snapshots are never
+        # applied to a different (e.g. recreated) kiosk.db
+        cursor.execute("PRAGMA table_info(face_gallery_state)")
+        if 'epoch' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE face_gallery_state ADD COLUMN epoch TEXT")
+        cursor.execute("UPDATE face_gallery_state SET epoch = lower(hex(randomblob(8))) WHERE epoch IS NULL")
+
+        # Encoding model the gallery is built from; only rows encoded with it are matched
+        cursor.execute("PRAGMA table_info(face_gallery_state)")
+        if 'encoding_model' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE face_gallery_state ADD COLUMN encoding_model INTEGER")
+        cursor.execute("UPDATE face_gallery_state SET encoding_model = ? WHERE encoding_model IS NULL",
+                       (LEGACY_FACE_ENCODING_MODEL,))
+
+        # Encodings made by the re-encoding job, swapped in all at once when it
+        # finishes (face_encoding_blob NULL = photo could not be re-encoded)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS face_reencode_staging (
+                employee_id INTEGER PRIMARY KEY,
+                encoding_model INTEGER NOT NULL,
+                face_registered_at DATETIME,
+                face_encoding_blob BLOB,
+                face_encoding_format INTEGER,
+                message TEXT
+            )
+        """)
+
+        # employee_id NULL means "everything may have changed"
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS face_gallery_changes (
+                version INTEGER PRIMARY KEY,
+                employee_id INTEGER
+            )
+        """)
+
+        bump = """
+            UPDATE face_gallery_state SET version = version + 1 WHERE id = 1;
+            INSERT INTO face_gallery_changes (version, employee_id)
+            SELECT version, {row}.id FROM face_gallery_state WHERE id = 1;
+        """
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employee_face_insert
+            AFTER INSERT ON employee
+            WHEN NEW.has_face_registration = 1
+            BEGIN {bump.format(row='NEW')} END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employee_face_delete
+            AFTER DELETE ON employee
+            WHEN OLD.has_face_registration = 1
+            BEGIN {bump.format(row='OLD')} END
+        """)
+        # Skip rows that only moved from the JSON column to the binary column
+        # (migrate_face_encodings_batch) - the encoding itself is unchanged
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employee_face_update
+            AFTER UPDATE OF name, employee_number, deleted_at, has_face_registration,
+                            face_encoding, face_encoding_blob, face_encoding_format
+            ON employee
+            WHEN (OLD.has_face_registration = 1 OR NEW.has_face_registration = 1)
+             AND NOT (OLD.face_encoding IS NOT NULL AND NEW.face_encoding IS NULL
+                      AND OLD.face_encoding_blob IS NULL AND NEW.face_encoding_blob IS NOT NULL
+                      AND OLD.face_registered_at IS NEW.face_registered_at
+                      AND OLD.has_face_registration IS NEW.has_face_registration
+                      AND OLD.deleted_at IS NEW.deleted_at
+                      AND OLD.name IS NEW.name
+                      AND OLD.employee_number IS NEW.employee_number)
+            BEGIN {bump.format(row='NEW')} END
+        """)
+
+    def _bump_face_gallery_version(self, cursor, employee_id):
+        """Record a gallery change that is not covered by the employee triggers."""
+        cursor.execute("UPDATE face_gallery_state SET version = version + 1 WHERE id = 1")
+        cursor.execute("""
+            INSERT INTO face_gallery_changes (version, employee_id)
+            SELECT version, ? FROM face_gallery_state WHERE id = 1
+        """, (employee_id,))
+
     def reset_database(self):
         """Drop all tables and recreate schema."""
         try:
@@ -200,11 +364,16 @@ class Database:
             cursor.execute("DROP TABLE IF EXISTS employee")
             cursor.execute("DROP TABLE IF EXISTS company")
             cursor.execute("DROP TABLE IF EXISTS users")
+            cursor.execute("DROP TABLE IF EXISTS face_reencode_staging")
 
             # Recreate schema
             self._create_schema(cursor)
             self._add_face_recognition_fields(cursor)
             self._add_timesheet_sync_fields(cursor)
+            self._add_face_gallery_tracking(cursor)
+
+            # All employees are gone - face galleries must reload completely
+            self._bump_face_gallery_version(cursor, None)
 
             conn.commit()
             conn.close()
@@ -353,6 +522,39 @@ class Database:
         conn.close()
         return rows
 
+    def get_hot_set_employee_ids(self, since_date):
+        """
+        Get the employees most likely to clock in next: everyone who punched on
+        or after since_date, plus everyone whose last punch is IN.
+
+        Args:
+            since_date (str): First date counted as recent (YYYY-MM-DD)
+
+        Returns:
+            list: Database IDs of active employees
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        # MAX() picks each employee's latest punch; SQLite returns log_type from that row
+        cursor.execute("""
+            SELECT t.employee_id
+            FROM timesheet t
+            JOIN employee e ON e.id = t.employee_id AND e.deleted_at IS NULL
+            WHERE t.date >= ?
+            UNION
+            SELECT last.employee_id
+            FROM (SELECT employee_id, log_type, MAX(date || ' ' || time) AS punched_at
+                  FROM timesheet
+                  GROUP BY employee_id) last
+            JOIN employee e ON e.id = last.employee_id AND e.deleted_at IS NULL
+            WHERE last.log_type = 'in'
+        """, (since_date,))
+        employee_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        return employee_ids
+
     def get_unsynced_logs(self):
         """
         Get all timesheet logs that haven't been synced.
@@ -500,14 +702,16 @@ class Database:
         has_records = len(record_types) > 0
         return has_records, record_types
 
-    def save_face_encoding(self, employee_id, face_encoding_json, photo_path):
+    def save_face_encoding(self, employee_id, face_encoding, photo_path, encoding_model=None):
         """
-        Save face encoding for an employee.
+        Save face encoding for an employee in binary form.
 
         Args:
             employee_id (int): Database ID of employee
-            face_encoding_json (str): JSON-serialized face encoding array
+            face_encoding: 128-d face encoding (numpy array or list of floats)
             photo_path (str): Path to reference photo
+            encoding_model (int, optional): Encoding model version the encoding was
+                made with (default: the gallery's active version)
 
         Returns:
             tuple: (success: bool, message: str)
@@ -519,12 +723,16 @@ class Database:
             # Update employee record with face data
             cursor.execute("""
                 UPDATE employee
-                SET face_encoding = ?,
+                SET face_encoding = NULL,
+                    face_encoding_blob = ?,
+                    face_encoding_format = ?,
+                    face_encoding_model = COALESCE(?, (SELECT encoding_model FROM face_gallery_state WHERE id = 1)),
                     face_photo_path = ?,
                     face_registered_at = ?,
                     has_face_registration = 1
                 WHERE id = ?
-            """, (face_encoding_json, photo_path, datetime.now(), employee_id))
+            """, (face_encoding_to_blob(face_encoding), FACE_ENCODING_FORMAT, encoding_model,
+                  photo_path, datetime.now(), employee_id))
 
             if cursor.rowcount == 0:
                 conn.close()
@@ -537,6 +745,51 @@ class Database:
         except Exception as e:
             return False, f"Error saving face encoding: {str(e)}"
 
+    def save_face_encodings_bulk(self, entries, encoding_model=None):
+        """
+        Save face encodings for many employees in one transaction.
+        Either every row is written or, on error, none is.
+
+        Args:
+            entries (list): [(employee_id, face_encoding, photo_path)]
+            encoding_model (int, optional): Encoding model version of the encodings
+                (default: the gallery's active version)
+
+        Returns:
+            tuple: (success: bool, message: str, saved_ids: list of employee ids that exist)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        now = datetime.now()
+
+        try:
+            saved_ids = []
+            for employee_id, face_encoding, photo_path in entries:
+                cursor.execute("""
+                    UPDATE employee
+                    SET face_encoding = NULL,
+                        face_encoding_blob = ?,
+                        face_encoding_format = ?,
+                        face_encoding_model = COALESCE(?, (SELECT encoding_model FROM face_gallery_state WHERE id = 1)),
+                        face_photo_path = ?,
+                        face_registered_at = ?,
+                        has_face_registration = 1
+                    WHERE id = ?
+                """, (face_encoding_to_blob(face_encoding), FACE_ENCODING_FORMAT, encoding_model,
+                      photo_path, now, employee_id))
+                if cursor.rowcount:
+                    saved_ids.append(employee_id)
+
+            conn.commit()
+            return True, f"Saved {len(saved_ids)} face encodings", saved_ids
+
+        except Exception as e:
+            conn.rollback()
+            return False, f"Error saving face encodings: {str(e)}", []
+
+        finally:
+            conn.close()
+
     def get_face_encoding(self, employee_id):
         """
         Get face encoding for an employee.
@@ -545,14 +798,14 @@ class Database:
             employee_id (int): Database ID of employee
 
         Returns:
-            tuple: (success: bool, face_encoding_json: str or None, photo_path: str or None)
+            tuple: (success: bool, face_encoding: np.ndarray or None, photo_path: str or None)
         """
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
 
             cursor.execute("""
-                SELECT face_encoding, face_photo_path
+                SELECT face_encoding_blob, face_encoding_format, face_encoding, face_photo_path
                 FROM employee
                 WHERE id = ? AND has_face_registration = 1 AND deleted_at IS NULL
             """, (employee_id,))
@@ -560,34 +813,55 @@ class Database:
             row = cursor.fetchone()
             conn.close()
 
-            if row and row[0]:
-                return True, row[0], row[1]
+            if row and (row[0] is not None or row[2]):
+                return True, _decode_face_encoding(row[0], row[1], row[2]), row[3]
             else:
                 return False, None, None
 
         except Exception as e:
             return False, None, None
 
+    def _read_face_encodings(self, cursor, where="", params=()):
+        """
+        Select and decode active face encodings, skipping unreadable rows.
+        Only rows made with the gallery's active encoding model are returned;
+        others are not comparable until face_reencoding has converted them.
+        """
+        cursor.execute(f"""
+            SELECT id, name, face_encoding_blob, face_encoding_format, face_encoding, employee_number
+            FROM employee
+            WHERE has_face_registration = 1
+              AND (face_encoding_blob IS NOT NULL OR face_encoding IS NOT NULL)
+              AND deleted_at IS NULL
+              AND COALESCE(face_encoding_model, {LEGACY_FACE_ENCODING_MODEL}) =
+                  (SELECT encoding_model FROM face_gallery_state WHERE id = 1)
+              {where}
+        """, params)
+
+        encodings = []
+        for emp_id, name, blob, encoding_format, face_encoding_json, employee_number in cursor.fetchall():
+            try:
+                face_encoding = _decode_face_encoding(blob, encoding_format, face_encoding_json)
+            except (ValueError, TypeError, KeyError) as e:
+                print(f"⚠️ Skipping unreadable face encoding for employee {emp_id}: {e}")
+                continue
+            encodings.append((emp_id, name, face_encoding, employee_number))
+
+        return encodings
+
     def get_all_face_encodings(self):
         """
         Get all face encodings for active employees.
+        Binary rows are decoded zero-copy; rows not yet migrated from the
+        legacy JSON text column are parsed on the fly.
 
         Returns:
-            list: List of tuples (employee_id, name, face_encoding_json)
+            list: List of tuples (employee_id, name, face_encoding: np.ndarray, employee_number)
         """
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT id, name, face_encoding, employee_number
-                FROM employee
-                WHERE has_face_registration = 1
-                  AND face_encoding IS NOT NULL
-                  AND deleted_at IS NULL
-            """)
-
-            rows = cursor.fetchall()
+            rows = self._read_face_encodings(cursor)
             conn.close()
             return rows
 
@@ -595,6 +869,148 @@ class Database:
             print(f"Error getting face encodings: {str(e)}")
             return []
 
+    def get_face_gallery_snapshot(self):
+        """
+        Get all active face encodings together with the gallery version they belong to.
+        All are read inside one transaction so the version matches the rows.
+
+        Returns:
+            tuple: (version: int, rows: list, encoding_model: int) with rows as in
+                   get_all_face_encodings()
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT version, encoding_model FROM face_gallery_state WHERE id = 1")
+            version, encoding_model = cursor.fetchone()
+            rows = self._read_face_encodings(cursor)
+            conn.commit()
+            return version, rows, encoding_model
+
+        finally:
+            conn.close()
+
+    def get_face_gallery_state(self):
+        """
+        Get the identity and current version of this database's face gallery.
+
+        Returns:
+            tuple: (epoch: str, version: int)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT epoch, version FROM face_gallery_state WHERE id = 1")
+        row = cursor.fetchone()
+        conn.close()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def get_face_encoding_model(self):
+        """
+        Get the encoding model version the face gallery is built from.
+
+        Returns:
+            int: Active encoding model version
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT encoding_model FROM face_gallery_state WHERE id = 1")
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row and row[0] is not None else LEGACY_FACE_ENCODING_MODEL
+
+    def get_face_gallery_version(self):
+        """
+        Get the current face gallery version (bumped by every gallery-relevant write).
+
+        Returns:
+            int: Monotonically increasing version number
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM face_gallery_state WHERE id = 1")
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    def get_face_gallery_changes(self, since_version):
+        """
+        Get the employees whose gallery entry changed after a given version.
+
+        Args:
+            since_version (int): Version the caller's gallery was built at
+
+        Returns:
+            tuple: (current_version: int, employee_ids: list, full_reload: bool)
+                   full_reload is True when the change log cannot describe the
+                   difference (pruned history or a bulk reset)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT version, pruned_version FROM face_gallery_state WHERE id = 1")
+            current_version, pruned_version = cursor.fetchone()
+
+            if since_version < pruned_version:
+                conn.commit()
+                return current_version, [], True
+
+            cursor.execute("""
+                SELECT DISTINCT employee_id
+                FROM face_gallery_changes
+                WHERE version > ? AND version <= ?
+            """, (since_version, current_version))
+            employee_ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+
+            return current_version, [emp_id for emp_id in employee_ids if emp_id is not None], None in employee_ids
+
+        finally:
+            conn.close()
+
+    def get_face_encodings_for(self, employee_ids):
+        """
+        Get active face encodings for specific employees.
+        Employees without an active registration are simply absent from the result.
+
+        Args:
+            employee_ids (list): Database IDs of employees
+
+        Returns:
+            list: Rows as in get_all_face_encodings()
+        """
+        if not employee_ids:
+            return []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(employee_ids))
+        rows = self._read_face_encodings(cursor, f"AND id IN ({placeholders})", list(employee_ids))
+        conn.close()
+        return rows
+
+    def prune_face_gallery_changes(self, up_to_version):
+        """
+        Delete change log entries a rebuilt gallery no longer needs.
+        Callers whose gallery is older than up_to_version will get a full reload.
+
+        Args:
+            up_to_version (int): Delete entries with version <= this
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM face_gallery_changes WHERE version <= ?", (up_to_version,))
+        cursor.execute("""
+            UPDATE face_gallery_state
+            SET pruned_version = MAX(pruned_version, ?)
+            WHERE id = 1
+        """, (up_to_version,))
+        conn.commit()
+        conn.close()
+
     def delete_face_encoding(self, employee_id):
         """
         Delete face encoding for an employee.
@@ -613,6 +1029,10 @@ class Database:
             cursor.execute("""
                 UPDATE employee
                 SET face_encoding = NULL,
+                    face_encoding_blob = NULL,
+                    face_encoding_format = NULL,
+                    face_encoding_model = NULL,
+                    face_upload_pending = 0,
                     face_photo_path = NULL,
                     face_registered_at = NULL,
                     has_face_registration = 0
@@ -630,6 +1050,220 @@ class Database:
         except Exception as e:
             return False, f"Error deleting face encoding: {str(e)}"
 
+    def get_face_reencode_candidates(self, encoding_model):
+        """
+        Get registered employees whose encoding is not (yet) in a given model version
+        and that have no staged re-encoding for their current registration.
+
+        Args:
+            encoding_model (int): Target encoding model version
+
+        Returns:
+            list: Tuples (employee_id, face_photo_path, face_registered_at)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT e.id, e.face_photo_path, e.face_registered_at
+            FROM employee e
+            WHERE e.has_face_registration = 1
+              AND e.deleted_at IS NULL
+              AND COALESCE(e.face_encoding_model, {LEGACY_FACE_ENCODING_MODEL}) != ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM face_reencode_staging s
+                  WHERE s.employee_id = e.id
+                    AND s.encoding_model = ?
+                    AND s.face_registered_at IS e.face_registered_at
+              )
+            ORDER BY e.id
+        """, (encoding_model, encoding_model))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
+    def stage_face_reencodings(self, encoding_model, entries):
+        """
+        Store re-encoded faces until the gallery is swapped.
+
+        Args:
+            encoding_model (int): Encoding model version of the encodings
+            entries (list): [(employee_id, face_registered_at, face_encoding or None, message)]
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO face_reencode_staging
+                (employee_id, encoding_model, face_registered_at,
+                 face_encoding_blob, face_encoding_format, message)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(employee_id, encoding_model, registered_at,
+               face_encoding_to_blob(face_encoding) if face_encoding is not None else None,
+               FACE_ENCODING_FORMAT if face_encoding is not None else None, message)
+              for employee_id, registered_at, face_encoding, message in entries])
+        conn.commit()
+        conn.close()
+
+    def swap_face_encoding_model(self, encoding_model):
+        """
+        Atomically switch the gallery to a new encoding model version.
+        Staged encodings replace the stored ones (unless the employee re-registered
+        since they were made), the active version changes and the staging table
+        is cleared - all in one transaction.
+
+        Args:
+            encoding_model (int): Encoding model version to activate
+
+        Returns:
+            tuple: (swapped: int, not_converted: list of (employee_id, message))
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                UPDATE employee
+                SET face_encoding = NULL,
+                    face_encoding_blob = (SELECT s.face_encoding_blob FROM face_reencode_staging s
+                                          WHERE s.employee_id = employee.id),
+                    face_encoding_format = (SELECT s.face_encoding_format FROM face_reencode_staging s
+                                            WHERE s.employee_id = employee.id),
+                    face_encoding_model = ?,
+                    face_upload_pending = 1
+                WHERE id IN (
+                    SELECT s.employee_id FROM face_reencode_staging s
+                    WHERE s.encoding_model = ?
+                      AND s.face_encoding_blob IS NOT NULL
+                      AND s.face_registered_at IS employee.face_registered_at
+                )
+            """, (encoding_model, encoding_model))
+            swapped = cursor.rowcount
+
+            cursor.execute(f"""
+                SELECT e.id,
+                       CASE WHEN s.employee_id IS NULL THEN 'Not re-encoded'
+                            WHEN s.face_registered_at IS NOT e.face_registered_at
+                                THEN 'Re-registered during re-encoding'
+                            ELSE s.message END
+                FROM employee e
+                LEFT JOIN face_reencode_staging s ON s.employee_id = e.id
+                WHERE e.has_face_registration = 1
+                  AND e.deleted_at IS NULL
+                  AND COALESCE(e.face_encoding_model, {LEGACY_FACE_ENCODING_MODEL}) != ?
+            """, (encoding_model,))
+            not_converted = cursor.fetchall()
+
+            cursor.execute("UPDATE face_gallery_state SET encoding_model = ? WHERE id = 1 AND encoding_model IS NOT ?",
+                           (encoding_model, encoding_model))
+            if cursor.rowcount:
+                # Rows of the old model drop out of the gallery - force a full reload
+                self._bump_face_gallery_version(cursor, None)
+            cursor.execute("DELETE FROM face_reencode_staging")
+            conn.commit()
+            return swapped, not_converted
+
+        except Exception:
+            conn.rollback()
+            raise
+
+        finally:
+            conn.close()
+
+    def get_pending_face_uploads(self):
+        """
+        Get re-encoded faces that cloud does not have yet.
+
+        Returns:
+            list: Tuples (employee_id, backend_id, face_encoding list)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, backend_id, face_encoding_blob, face_encoding_format, face_encoding
+            FROM employee
+            WHERE face_upload_pending = 1
+              AND has_face_registration = 1
+              AND deleted_at IS NULL
+              AND backend_id IS NOT NULL
+            ORDER BY id
+        """)
+        rows = cursor.fetchall()
+        conn.close()
+        return [(employee_id, backend_id, _decode_face_encoding(blob, encoding_format, face_encoding_json).tolist())
+                for employee_id, backend_id, blob, encoding_format, face_encoding_json in rows]
+
+    def mark_face_uploads_done(self, employee_ids):
+        """
+        Clear the upload flag of employees whose encoding reached cloud.
+
+        Args:
+            employee_ids (list): Database IDs of uploaded employees
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("UPDATE employee SET face_upload_pending = 0 WHERE id = ?",
+                           [(employee_id,) for employee_id in employee_ids])
+        conn.commit()
+        conn.close()
+
+    def migrate_face_encodings_batch(self, after_id=0, batch_size=200):
+        """
+        Convert one chunk of legacy JSON text encodings to the binary column.
+        Each chunk runs in its own short transaction so clock-ins are never
+        blocked for long; call repeatedly with the returned last_id until
+        fewer than batch_size rows are scanned.
+
+        Args:
+            after_id (int): Only rows with id greater than this are scanned
+            batch_size (int): Maximum number of rows to scan
+
+        Returns:
+            tuple: (scanned: int, converted: int, last_id: int)
+        """
+        import json
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("""
+                SELECT id, face_encoding
+                FROM employee
+                WHERE id > ?
+                  AND face_encoding IS NOT NULL
+                  AND face_encoding_blob IS NULL
+                ORDER BY id
+                LIMIT ?
+            """, (after_id, batch_size))
+
+            rows = cursor.fetchall()
+            converted = 0
+            last_id = after_id
+
+            for emp_id, face_encoding_json in rows:
+                last_id = emp_id
+                try:
+                    blob = face_encoding_to_blob(json.loads(face_encoding_json))
+                except (ValueError, TypeError) as e:
+                    print(f"⚠️ Skipping unreadable face encoding for employee {emp_id}: {e}")
+                    continue
+
+                # Guard on the old value in case the row changed since it was read
+                cursor.execute("""
+                    UPDATE employee
+                    SET face_encoding_blob = ?,
+                        face_encoding_format = ?,
+                        face_encoding = NULL
+                    WHERE id = ? AND face_encoding = ?
+                """, (blob, FACE_ENCODING_FORMAT, emp_id, face_encoding_json))
+                converted += cursor.rowcount
+
+            conn.commit()
+            return len(rows), converted, last_id
+
+        finally:
+            conn.close()
+
     def get_face_registration_status(self, employee_id):
         """
         Check if employee has face registration.
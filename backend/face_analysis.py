@@ -0,0 +1,582 @@
+"""
+Single-pass face photo analysis for the quality check and registration.
+A FaceAnalysis decodes the photo once and detects faces once. Blur,
+brightness, size, centering and pose are all computed from that one decode
+and those boxes, and the encoding is taken at the known face location
+instead of running detection again. The registration photo is written on a
+background thread while the encoding is computed.
+
+Sharpness, exposure and contrast can be measured on the face crop at a fixed
+size instead of the whole frame (FACE_QUALITY_ROI=true). A downscaled, tight
+face crop needs its own thresholds: QUALITY_THRESHOLDS["roi"] has not been
+calibrated on real kiosk captures yet, so the full-frame measurement stays the
+default. To calibrate, run on a folder of real captures; --calibrate prints
+face-crop thresholds fitted to the full-frame decisions and their agreement:
+    python face_analysis.py photos/ --calibrate   (optional pass/ and fail/ sub-folders)
+Record the thresholds and the measured agreement (within
+QUALITY_DECISION_TOLERANCE) here before turning the face crop on by default.
+"""
+import base64
+import operator
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from face_detection import CURRENT_ENCODING_MODEL, encoding_params
+
+
+# Quality score needed to register (and no error-severity issue)
+MIN_QUALITY_SCORE = 70
+
+# Sharpness/exposure/contrast are measured on the face box, padded by this
+# fraction of its size and resized to a fixed square so scores do not depend
+# on camera resolution or distance
+ROI_MARGIN = 0.15
+ROI_SIZE = 160
+
+# Sharpness (Laplacian variance), brightness (mean gray level) and contrast
+# (gray level std) thresholds per measurement area. "frame" are the original
+# whole-frame thresholds; "roi" still equals them until calibrated (see above).
+QUALITY_THRESHOLDS = {
+    "frame": {
+        "sharp": 80.0,                 # above: good focus (30 points)
+        "acceptable_sharpness": 30.0,  # above: slightly blurry (20 points)
+        "bright_min": 80.0,            # bright_min..bright_max: good lighting (20 points)
+        "bright_max": 180.0,
+        "dim_min": 50.0,               # dim_min..dim_max: usable lighting (10 points)
+        "dim_max": 200.0,
+        "min_contrast": 25.0,          # below: flat face warning (no points, face crop only)
+    },
+    "roi": {
+        "sharp": 80.0,
+        "acceptable_sharpness": 30.0,
+        "bright_min": 80.0,
+        "bright_max": 180.0,
+        "dim_min": 50.0,
+        "dim_max": 200.0,
+        "min_contrast": 25.0,
+    },
+}
+
+# Whether QUALITY_THRESHOLDS["roi"] has been calibrated on real captures
+ROI_THRESHOLDS_CALIBRATED = False
+
+# Largest share of pass/fail decisions the face-crop metrics may change
+# compared with the previous full-frame metrics (checked by main())
+QUALITY_DECISION_TOLERANCE = 0.05
+
+
+def roi_quality_enabled():
+    """Whether quality() measures on the face crop by default (FACE_QUALITY_ROI, default false)."""
+    return os.environ.get('FACE_QUALITY_ROI', 'false').lower() == 'true'
+
+
+def score_sharpness(laplacian_var, thresholds):
+    """
+    Blur points (out of 30) for a Laplacian variance.
+
+    Returns:
+        tuple: (points, issue dict or None)
+    """
+    if laplacian_var > thresholds["sharp"]:
+        # Good focus - most webcams should achieve this
+        return 30, None
+    if laplacian_var > thresholds["acceptable_sharpness"]:
+        # Acceptable focus - still usable for face recognition
+        return 20, {"type": "blur", "severity": "warning", "message": "Image is slightly blurry. Hold camera steady."}
+    # Poor focus - but still allow if score >= 70
+    return 10, {"type": "blur", "severity": "warning", "message": "Image is blurry. Try holding camera steady or cleaning lens."}
+
+
+def score_brightness(brightness, thresholds):
+    """
+    Lighting points (out of 20) for a mean gray level.
+
+    Returns:
+        tuple: (points, issue dict or None)
+    """
+    if thresholds["bright_min"] <= brightness <= thresholds["bright_max"]:
+        return 20, None
+    if thresholds["dim_min"] <= brightness <= thresholds["dim_max"]:
+        if brightness < thresholds["bright_min"]:
+            return 10, {"type": "brightness", "severity": "warning", "message": "Lighting is dim. Move to a brighter area."}
+        return 10, {"type": "brightness", "severity": "warning", "message": "Lighting is too bright. Avoid direct light on face."}
+    # Even poor lighting can work if other criteria are met
+    if brightness < thresholds["dim_min"]:
+        return 0, {"type": "brightness", "severity": "warning", "message": "Too dark. Turn on lights or move to brighter area."}
+    return 0, {"type": "brightness", "severity": "warning", "message": "Too bright. Reduce direct lighting."}
+
+# Photo writes overlap with the encoding; one writer keeps disk access sequential
+_PHOTO_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-photo-writer")
+
+
+class FaceAnalysis:
+    """Decoded photo plus the lazily computed detections, landmarks and encoding."""
+
+    def __init__(self, photo_bytes, timer=None, encoding_model=None):
+        """
+        Decode a photo.
+
+        Args:
+            photo_bytes (bytes): Encoded JPEG/PNG photo
+            timer (StageTimer, optional): Receives image_decode/detection/metrics/landmarks/encoding laps
+            encoding_model (int, optional): Encoding model version (default: current)
+        """
+        import cv2
+
+        self.photo_bytes = photo_bytes
+        self.timer = timer
+        self.encoding_model = encoding_model or CURRENT_ENCODING_MODEL
+        self._locations = None
+        self._landmarks = None
+        self._encoding = None
+
+        self.bgr_image = cv2.imdecode(np.frombuffer(photo_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if self.bgr_image is not None:
+            self.rgb_image = cv2.cvtColor(self.bgr_image, cv2.COLOR_BGR2RGB)
+            self.gray_image = cv2.cvtColor(self.bgr_image, cv2.COLOR_BGR2GRAY)
+        else:
+            self.rgb_image = self.gray_image = None
+        self._lap("image_decode")
+
+    @classmethod
+    def from_base64(cls, photo_base64, timer=None, encoding_model=None):
+        """Build an analysis from a data URL or bare base64 string."""
+        if "base64," in photo_base64:
+            photo_base64 = photo_base64.split("base64,")[1]
+        return cls(base64.b64decode(photo_base64), timer, encoding_model)
+
+    def _lap(self, stage):
+        if self.timer is not None:
+            self.timer.lap(stage)
+
+    @property
+    def decoded(self):
+        """Whether the photo could be decoded."""
+        return self.bgr_image is not None
+
+    @property
+    def face_locations(self):
+        """(top, right, bottom, left) boxes, detected once on first use."""
+        if self._locations is None:
+            import face_recognition
+            self._locations = face_recognition.face_locations(self.rgb_image)
+            self._lap("detection")
+        return self._locations
+
+    @property
+    def landmarks(self):
+        """68-point landmarks of the single detected face (None if unavailable)."""
+        if self._landmarks is None and len(self.face_locations) == 1:
+            import face_recognition
+            landmarks = face_recognition.face_landmarks(self.rgb_image, face_locations=self.face_locations)
+            self._landmarks = landmarks[0] if landmarks else None
+            self._lap("landmarks")
+        return self._landmarks
+
+    @property
+    def encoding(self):
+        """128-d encoding of the single detected face, computed at the known location with encoding_model."""
+        if self._encoding is None and len(self.face_locations) == 1:
+            import face_recognition
+            encodings = face_recognition.face_encodings(self.rgb_image, known_face_locations=self.face_locations,
+                                                        **encoding_params(self.encoding_model))
+            self._encoding = encodings[0] if encodings else None
+            self._lap("encoding")
+        return self._encoding
+
+    def face_roi(self, location):
+        """
+        Grayscale face crop at the normalized size.
+
+        Args:
+            location (tuple): (top, right, bottom, left) face box
+
+        Returns:
+            np.ndarray: (ROI_SIZE, ROI_SIZE) uint8 crop
+        """
+        import cv2
+
+        top, right, bottom, left = location
+        height, width = self.gray_image.shape[:2]
+        pad_y = int((bottom - top) * ROI_MARGIN)
+        pad_x = int((right - left) * ROI_MARGIN)
+        crop = self.gray_image[max(0, top - pad_y):min(height, bottom + pad_y),
+                               max(0, left - pad_x):min(width, right + pad_x)]
+        return cv2.resize(crop, (ROI_SIZE, ROI_SIZE), interpolation=cv2.INTER_AREA)
+
+    def write_photo_async(self, path):
+        """
+        Write the original photo bytes on the background writer thread.
+
+        Args:
+            path (str): Destination file path
+
+        Returns:
+            concurrent.futures.Future: Resolves when the file is written (raises the write error)
+        """
+        def write():
+            with open(path, "wb") as f:
+                f.write(self.photo_bytes)
+
+        return _PHOTO_WRITER.submit(write)
+
+    def quality(self, roi=None, thresholds=None):
+        """
+        Score the photo for registration.
+        Validates blur, brightness, face size, centering, and angle.
+
+        Args:
+            roi (bool, optional): Measure sharpness/exposure/contrast on the normalized
+                face crop instead of the whole frame (default: roi_quality_enabled())
+            thresholds (dict, optional): Override QUALITY_THRESHOLDS for the chosen area
+                (used when calibrating)
+
+        Returns:
+            dict: {success, quality_score, message, issues[, metrics, timings_ms]}
+        """
+        if not self.decoded:
+            return {
+                "success": False,
+                "quality_score": 0,
+                "message": "Failed to decode image",
+                "issues": [{"type": "decode", "severity": "error", "message": "Failed to decode image"}]
+            }
+
+        import cv2
+
+        if roi is None:
+            roi = roi_quality_enabled()
+        if thresholds is None:
+            thresholds = QUALITY_THRESHOLDS["roi" if roi else "frame"]
+
+        height, width = self.bgr_image.shape[:2]
+        issues = []
+        quality_score = 0
+        timings = {}
+
+        # 1. Face Detection (mandatory)
+        face_locations = self.face_locations
+
+        if len(face_locations) == 0:
+            return {
+                "success": False,
+                "quality_score": 0,
+                "message": "No face detected in photo",
+                "issues": [{"type": "no_face", "severity": "error", "message": "No face detected. Ensure your face is visible and well-lit."}]
+            }
+
+        if len(face_locations) > 1:
+            return {
+                "success": False,
+                "quality_score": 0,
+                "message": "Multiple faces detected",
+                "issues": [{"type": "multiple_faces", "severity": "error", "message": "Multiple faces detected. Ensure only your face is visible."}]
+            }
+
+        # Get face bounding box
+        top, right, bottom, left = face_locations[0]
+        face_width = right - left
+        face_height = bottom - top
+        face_area = face_width * face_height
+        frame_area = width * height
+        face_size_ratio = face_area / frame_area
+
+        start_time = time.perf_counter()
+        gray = self.face_roi(face_locations[0]) if roi else self.gray_image
+        timings["roi"] = time.perf_counter() - start_time
+
+        # 2. Blur Detection (30 points)
+        # Adjusted thresholds for typical webcam quality (720p-1080p)
+        # Lowered thresholds to be more forgiving for standard webcams
+        start_time = time.perf_counter()
+        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        timings["sharpness"] = time.perf_counter() - start_time
+
+        points, issue = score_sharpness(laplacian_var, thresholds)
+        quality_score += points
+        if issue is not None:
+            issues.append(issue)
+
+        # 3. Brightness Check (20 points)
+        start_time = time.perf_counter()
+        brightness = np.mean(gray)
+        timings["exposure"] = time.perf_counter() - start_time
+
+        points, issue = score_brightness(brightness, thresholds)
+        quality_score += points
+        if issue is not None:
+            issues.append(issue)
+
+        # Contrast (informational - does not change the score). Only the face crop
+        # warns about it, so the default full-frame result keeps its original issues
+        start_time = time.perf_counter()
+        contrast = float(np.std(gray))
+        timings["contrast"] = time.perf_counter() - start_time
+
+        if roi and contrast < thresholds["min_contrast"]:
+            issues.append({"type": "contrast", "severity": "warning", "message": "Face looks flat. Avoid strong backlight."})
+
+        # 4. Face Size Check (20 points)
+        # More forgiving thresholds - accept smaller faces (further distance)
+        if 0.15 <= face_size_ratio <= 0.40:
+            # Good range - face is clearly visible
+            quality_score += 20
+        elif 0.10 <= face_size_ratio <= 0.50:
+            # Acceptable range - slightly far or close
+            quality_score += 15
+            if face_size_ratio < 0.15:
+                issues.append({"type": "distance", "severity": "warning", "message": "Face is small. Move 6 inches closer to camera."})
+            else:
+                issues.append({"type": "distance", "severity": "warning", "message": "Face is large. Move back slightly."})
+        else:
+            # Still usable but not ideal
+            quality_score += 5
+            if face_size_ratio < 0.10:
+                issues.append({"type": "distance", "severity": "warning", "message": "Too far from camera. Move much closer."})
+            else:
+                issues.append({"type": "distance", "severity": "warning", "message": "Too close to camera. Move back."})
+
+        # 5. Face Centering Check (15 points)
+        face_center_x = (left + right) / 2
+        face_center_y = (top + bottom) / 2
+        frame_center_x = width / 2
+        frame_center_y = height / 2
+        offset_x = abs(face_center_x - frame_center_x) / width
+        offset_y = abs(face_center_y - frame_center_y) / height
+        max_offset = max(offset_x, offset_y)
+
+        if max_offset < 0.15:
+            quality_score += 15
+        elif max_offset < 0.25:
+            quality_score += 8
+            if offset_x > offset_y:
+                direction = "left" if face_center_x < frame_center_x else "right"
+                issues.append({"type": "centering", "severity": "warning", "message": f"Face slightly off-center. Move {direction}."})
+            else:
+                direction = "down" if face_center_y < frame_center_y else "up"
+                issues.append({"type": "centering", "severity": "warning", "message": f"Face slightly off-center. Move {direction}."})
+        else:
+            issues.append({"type": "centering", "severity": "error", "message": "Face not centered. Position yourself in the middle of frame."})
+
+        self._lap("metrics")
+
+        # 6. Face Angle Check (15 points) using landmarks at the detected box
+        start_time = time.perf_counter()
+        try:
+            landmarks = self.landmarks
+            if landmarks:
+                # Calculate nose-to-eye distances (simple frontal face check)
+                left_eye_center = np.mean(np.array(landmarks['left_eye']), axis=0)
+                right_eye_center = np.mean(np.array(landmarks['right_eye']), axis=0)
+                nose_tip = np.array(landmarks['nose_bridge'])[-1]
+
+                nose_to_left_eye = np.linalg.norm(nose_tip - left_eye_center)
+                nose_to_right_eye = np.linalg.norm(nose_tip - right_eye_center)
+
+                # Check symmetry (frontal face should be symmetric)
+                symmetry_ratio = min(nose_to_left_eye, nose_to_right_eye) / max(nose_to_left_eye, nose_to_right_eye)
+
+                if symmetry_ratio > 0.85:
+                    quality_score += 15
+                elif symmetry_ratio > 0.70:
+                    quality_score += 8
+                    if nose_to_left_eye < nose_to_right_eye:
+                        issues.append({"type": "angle", "severity": "warning", "message": "Turn your head slightly to the right."})
+                    else:
+                        issues.append({"type": "angle", "severity": "warning", "message": "Turn your head slightly to the left."})
+                else:
+                    issues.append({"type": "angle", "severity": "error", "message": "Face the camera directly. Don't turn your head."})
+        except Exception:
+            # If landmark detection fails, give partial points
+            quality_score += 8
+        timings["pose"] = time.perf_counter() - start_time
+
+        # Quality score must be >= 70 AND no critical errors (no_face, multiple_faces, decode)
+        success = quality_score >= MIN_QUALITY_SCORE and not any(issue['severity'] == 'error' for issue in issues)
+
+        return {
+            "success": success,
+            "quality_score": quality_score,
+            "message": f"Quality score: {quality_score}/100",
+            "issues": issues,
+            "metrics": {
+                "blur_score": float(laplacian_var),
+                "brightness": float(brightness),
+                "contrast": contrast,
+                "face_size_ratio": float(face_size_ratio),
+                "center_offset": float(max_offset)
+            },
+            "timings_ms": {metric: round(seconds * 1000.0, 3) for metric, seconds in timings.items()}
+        }
+
+
+# Metric and comparison behind each QUALITY_THRESHOLDS entry (for calibration)
+_THRESHOLD_TESTS = {
+    "sharp": ("blur_score", operator.gt),
+    "acceptable_sharpness": ("blur_score", operator.gt),
+    "bright_min": ("brightness", operator.ge),
+    "bright_max": ("brightness", operator.le),
+    "dim_min": ("brightness", operator.ge),
+    "dim_max": ("brightness", operator.le),
+    "min_contrast": ("contrast", operator.lt),
+}
+
+
+def fit_threshold(frame_values, roi_values, frame_threshold, compare):
+    """
+    Face-crop threshold whose decisions best agree with a full-frame threshold.
+
+    Args:
+        frame_values (list): Full-frame metric per photo
+        roi_values (list): Face-crop metric of the same photos
+        frame_threshold (float): Full-frame threshold
+        compare (callable): Comparison the threshold is used with (e.g. operator.gt)
+
+    Returns:
+        tuple: (face-crop threshold, share of photos on the same side)
+    """
+    targets = [compare(value, frame_threshold) for value in frame_values]
+    values = sorted(set(roi_values))
+    # Cut between neighbouring values so ties cannot tip the comparison
+    candidates = [values[0] - 1.0] + [(a + b) / 2.0 for a, b in zip(values, values[1:])] + [values[-1] + 1.0]
+
+    best_cut, best_agree = frame_threshold, -1
+    for cut in candidates:
+        agree = sum(compare(value, cut) == target for value, target in zip(roi_values, targets))
+        if agree > best_agree:
+            best_cut, best_agree = cut, agree
+    return round(best_cut, 1), best_agree / len(roi_values)
+
+
+def compare_quality_decisions(photos, roi_thresholds=None):
+    """
+    Compare face-crop quality decisions with the previous full-frame decisions.
+
+    Args:
+        photos (list): [(label, photo_bytes)]; label is True/False for photos
+            known to pass/fail, or None
+        roi_thresholds (dict, optional): Face-crop thresholds to try
+            (default: QUALITY_THRESHOLDS["roi"])
+
+    Returns:
+        dict: Photo count, decisions changed between the two modes, agreement,
+              accuracy of each mode against the labels, mean metric timings and
+              the metrics of both modes per photo with a face
+    """
+    changed = labelled = roi_correct = frame_correct = 0
+    timings = {}
+    metrics = []
+
+    for label, photo_bytes in photos:
+        analysis = FaceAnalysis(photo_bytes)
+        frame_result = analysis.quality(roi=False)
+        roi_result = analysis.quality(roi=True, thresholds=roi_thresholds)
+
+        changed += frame_result["success"] != roi_result["success"]
+        if label is not None:
+            labelled += 1
+            frame_correct += frame_result["success"] == label
+            roi_correct += roi_result["success"] == label
+        if "metrics" in frame_result:
+            metrics.append((frame_result["metrics"], roi_result["metrics"]))
+
+        for mode, result in (("frame", frame_result), ("roi", roi_result)):
+            for metric, ms in result.get("timings_ms", {}).items():
+                timings.setdefault(mode, {}).setdefault(metric, []).append(ms)
+
+    return {
+        "photos": len(photos),
+        "changed_decisions": changed,
+        "agreement": 1.0 - changed / max(1, len(photos)),
+        "labelled": labelled,
+        "frame_accuracy": frame_correct / labelled if labelled else None,
+        "roi_accuracy": roi_correct / labelled if labelled else None,
+        "mean_timings_ms": {mode: {metric: float(np.mean(values)) for metric, values in metrics_ms.items()}
+                            for mode, metrics_ms in timings.items()},
+        "metrics": metrics
+    }
+
+
+def calibrate_roi_thresholds(photos):
+    """
+    Fit face-crop thresholds to the full-frame decisions on a set of real captures.
+
+    Args:
+        photos (list): [(label, photo_bytes)] as for compare_quality_decisions()
+
+    Returns:
+        dict: thresholds (fitted face-crop thresholds), threshold_agreement (per
+              threshold), and the compare_quality_decisions() report with them
+    """
+    metrics = compare_quality_decisions(photos)["metrics"]
+    if not metrics:
+        raise ValueError("No photo with exactly one detected face to calibrate on")
+
+    frame_thresholds = QUALITY_THRESHOLDS["frame"]
+    thresholds, threshold_agreement = {}, {}
+    for name, (metric, compare) in _THRESHOLD_TESTS.items():
+        thresholds[name], threshold_agreement[name] = fit_threshold(
+            [frame[metric] for frame, _ in metrics], [roi[metric] for _, roi in metrics],
+            frame_thresholds[name], compare)
+
+    return {
+        "thresholds": thresholds,
+        "threshold_agreement": threshold_agreement,
+        "report": compare_quality_decisions(photos, thresholds)
+    }
+
+
+def main(argv=None):
+    """Check (or calibrate) face-crop quality metrics against the full-frame pass/fail decisions."""
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="Compare face-crop and full-frame quality decisions")
+    parser.add_argument("photos", help="Folder of photos; optional pass/ and fail/ sub-folders label them")
+    parser.add_argument("--tolerance", type=float, default=QUALITY_DECISION_TOLERANCE,
+                        help="Largest acceptable share of changed decisions")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Fit face-crop thresholds to the full-frame decisions first")
+    args = parser.parse_args(argv)
+
+    suffixes = (".jpg", ".jpeg", ".png")
+    root = Path(args.photos)
+    photos = []
+    for label, folder in ((None, root), (True, root / "pass"), (False, root / "fail")):
+        if folder.is_dir():
+            photos.extend((label, path.read_bytes()) for path in sorted(folder.iterdir())
+                          if path.suffix.lower() in suffixes)
+
+    if not photos:
+        print(f"No photos found in {root}")
+        return 1
+
+    if args.calibrate:
+        calibration = calibrate_roi_thresholds(photos)
+        report = calibration["report"]
+        print('QUALITY_THRESHOLDS["roi"] fitted to the full-frame decisions:')
+        for name, value in calibration["thresholds"].items():
+            print(f"    {name:>20}: {value:8.1f}  (frame {QUALITY_THRESHOLDS['frame'][name]:.1f}, "
+                  f"agreement {calibration['threshold_agreement'][name]:.4f})")
+    else:
+        report = compare_quality_decisions(photos)
+        if not ROI_THRESHOLDS_CALIBRATED:
+            print("Note: face-crop thresholds are not calibrated yet - run with --calibrate")
+
+    print(f"Photos: {report['photos']} ({report['labelled']} labelled)")
+    print(f"Changed decisions: {report['changed_decisions']}  agreement={report['agreement']:.4f} "
+          f"(tolerance {args.tolerance:.2%})")
+    if report["labelled"]:
+        print(f"Accuracy vs labels: frame={report['frame_accuracy']:.4f}  roi={report['roi_accuracy']:.4f}")
+    for mode, metrics in report["mean_timings_ms"].items():
+        print(f"{mode:>6}: " + "  ".join(f"{metric}={ms:.3f}ms" for metric, ms in metrics.items()))
+
+    return 0 if report["changed_decisions"] <= args.tolerance * report["photos"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+"""
+Reduced-resolution face detection with full-resolution encoding.
+HOG detection cost grows with pixel count, but the 128-d encoding only needs
+the face region. Frames are decoded at 1/scale (JPEG DCT scaling via PIL
+draft mode), faces are detected on the small image, the boxes are mapped
+back to full scale and landmarks/encodings are computed on the
+full-resolution image at those boxes. Frames without a face never pay for
+a full-resolution decode.
+
+Optionally (FACE_DETECTION_CASCADE=true, off by default) a cheap OpenCV Haar
+cascade runs first: HOG then only searches the padded regions it proposes,
+and frames without a proposal (an empty kiosk) skip HOG entirely. The
+cascade can miss faces HOG finds (profiles, poor light); measure its miss
+rate against plain HOG on the kiosk's own captures with --cascade before
+turning it on.
+"""
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from face_tracker import box_iou
+
+
+# 1 = detect at full resolution (previous behaviour); JPEG supports 2, 4 and 8 natively
+DEFAULT_DETECTION_SCALE = 2
+
+# Boxes overlapping at least this much count as the same face when measuring recall
+RECALL_IOU = 0.5
+
+# face_recognition.face_encodings() parameters per encoding model version.
+# Encodings made with different versions are not comparable: add a new
+# version (never edit an existing one) when the model, num_jitters or
+# landmark model changes, and face_reencoding re-encodes the stored photos.
+ENCODING_MODELS = {
+    1: {"num_jitters": 1, "model": "small"},
+}
+CURRENT_ENCODING_MODEL = 1
+
+# Haar cascade shipped with opencv-python (cv2.data.haarcascades); tuned for
+# recall - false proposals only cost a small HOG pass, misses lose the face
+CASCADE_FILE = "haarcascade_frontalface_default.xml"
+CASCADE_SCALE_FACTOR = 1.1
+CASCADE_MIN_NEIGHBORS = 3
+CASCADE_MIN_SIZE = 30
+
+# Each proposal is padded by this fraction of its size per side before HOG
+# runs on it (HOG boxes are larger than Haar boxes and need some context)
+PROPOSAL_MARGIN = 0.5
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+
+def encoding_params(encoding_model=None):
+    """face_encodings() keyword arguments for an encoding model version (default: current)."""
+    return ENCODING_MODELS.get(encoding_model or CURRENT_ENCODING_MODEL, ENCODING_MODELS[CURRENT_ENCODING_MODEL])
+
+
+def decode_image(photo_bytes, scale=1):
+    """
+    Decode an encoded photo to an RGB array, optionally reduced.
+
+    Args:
+        photo_bytes (bytes): JPEG/PNG image bytes
+        scale (int): Reduction factor (1 = full resolution)
+
+    Returns:
+        tuple: (image: ndarray HxWx3 uint8, factors: (fy, fx) to map back to full scale)
+    """
+    from PIL import Image
+
+    pil_image = Image.open(io.BytesIO(photo_bytes))
+    full_width, full_height = pil_image.size
+
+    if scale > 1:
+        # JPEG: decode straight to a reduced size (no-op for other formats)
+        pil_image.draft("RGB", (max(1, full_width // scale), max(1, full_height // scale)))
+        if pil_image.size == (full_width, full_height):
+            pil_image = pil_image.reduce(scale)
+
+    pil_image = pil_image.convert("RGB")
+    width, height = pil_image.size
+    return np.asarray(pil_image), (full_height / height, full_width / width)
+
+
+def scale_locations(locations, factors, shape):
+    """
+    Map (top, right, bottom, left) boxes from a reduced image to full scale.
+
+    Args:
+        locations (list): Boxes detected on the reduced image
+        factors (tuple): (fy, fx) from decode_image()
+        shape (tuple): Full-resolution image shape, used to clip the boxes
+
+    Returns:
+        list: Boxes in full-resolution pixel coordinates
+    """
+    fy, fx = factors
+    height, width = shape[:2]
+    return [
+        (max(0, int(round(top * fy))),
+         min(width - 1, int(round(right * fx))),
+         min(height - 1, int(round(bottom * fy))),
+         max(0, int(round(left * fx))))
+        for top, right, bottom, left in locations
+    ]
+
+
+def cascade_enabled():
+    """Whether detection runs the Haar pre-detector first (FACE_DETECTION_CASCADE, default false)."""
+    return os.environ.get('FACE_DETECTION_CASCADE', 'false').lower() == 'true'
+
+
+def _get_cascade():
+    """
+    Load the Haar cascade once per process.
+
+    Returns:
+        cv2.CascadeClassifier or None if OpenCV or the cascade file is unavailable
+    """
+    global _cascade
+
+    with _cascade_lock:
+        if _cascade is None:
+            try:
+                import cv2
+                classifier = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, CASCADE_FILE))
+                _cascade = classifier if not classifier.empty() else False
+            except (ImportError, AttributeError):
+                _cascade = False
+
+            if _cascade is False:
+                sys.stderr.write("⚠️ Haar cascade unavailable - detecting faces with HOG only\n")
+                sys.stderr.flush()
+
+        return _cascade or None
+
+
+def propose_regions(image):
+    """
+    Find candidate face regions with the Haar cascade.
+
+    Args:
+        image (ndarray): RGB image (the reduced detection image)
+
+    Returns:
+        list or None: Padded (top, right, bottom, left) regions, overlapping ones
+                      merged; None if the cascade is unavailable
+    """
+    import cv2
+
+    cascade = _get_cascade()
+    if cascade is None:
+        return None
+
+    gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY))
+    boxes = cascade.detectMultiScale(gray, scaleFactor=CASCADE_SCALE_FACTOR, minNeighbors=CASCADE_MIN_NEIGHBORS,
+                                     minSize=(CASCADE_MIN_SIZE, CASCADE_MIN_SIZE))
+
+    height, width = gray.shape
+    regions = []
+    for x, y, w, h in boxes:
+        pad_x, pad_y = int(w * PROPOSAL_MARGIN), int(h * PROPOSAL_MARGIN)
+        region = [max(0, y - pad_y), min(width, x + w + pad_x), min(height, y + h + pad_y), max(0, x - pad_x)]
+
+        # Merge with every region it overlaps so HOG never sees the same face twice
+        overlapping = [other for other in regions if region[0] < other[2] and other[0] < region[2]
+                       and region[3] < other[1] and other[3] < region[1]]
+        for other in overlapping:
+            regions.remove(other)
+            region = [min(region[0], other[0]), max(region[1], other[1]),
+                      max(region[2], other[2]), min(region[3], other[3])]
+        regions.append(region)
+
+    return [tuple(region) for region in regions]
+
+
+def _hog_in_regions(image, regions, upsample=1, model="hog"):
+    """Run the face detector inside each region and map the boxes back to image coordinates."""
+    import face_recognition
+
+    locations = []
+    for top, right, bottom, left in regions:
+        crop = np.ascontiguousarray(image[top:bottom, left:right])
+        for crop_top, crop_right, crop_bottom, crop_left in face_recognition.face_locations(crop, upsample, model):
+            location = (crop_top + top, crop_right + left, crop_bottom + top, crop_left + left)
+            if all(box_iou(location, other) < RECALL_IOU for other in locations):
+                locations.append(location)
+    return locations
+
+
+def detect_faces(photo_bytes, scale=DEFAULT_DETECTION_SCALE, timer=None, use_cascade=False,
+                 upsample=1, model="hog"):
+    """
+    Detect faces on a reduced decode of a photo.
+
+    Args:
+        photo_bytes (bytes): JPEG/PNG image bytes
+        scale (int): Detection reduction factor (1 = full resolution)
+        timer (StageTimer, optional): Receives image_decode/(pre_detection)/detection laps
+        use_cascade (bool): Run HOG only inside Haar cascade proposals
+            (falls back to a full HOG pass if the cascade is unavailable)
+        upsample (int): Times the detector upsamples the image (finds smaller faces, slower)
+        model (str): "hog" or "cnn" (much slower without a GPU)
+
+    Returns:
+        tuple: (small_image, small_locations, factors) for encode_faces()
+    """
+    import face_recognition
+
+    small_image, factors = decode_image(photo_bytes, scale)
+    if timer is not None:
+        timer.lap("image_decode")
+
+    regions = propose_regions(small_image) if use_cascade else None
+    if regions is not None:
+        if timer is not None:
+            timer.lap("pre_detection")
+        if not regions:
+            # Nobody in front of the kiosk - no HOG at all
+            return small_image, [], factors
+        small_locations = _hog_in_regions(small_image, regions, upsample, model)
+    else:
+        small_locations = face_recognition.face_locations(small_image, upsample, model)
+    if timer is not None:
+        timer.lap("detection")
+
+    return small_image, small_locations, factors
+
+
+def encode_faces(photo_bytes, small_image, small_locations, factors, timer=None, encoding_model=None):
+    """
+    Encode faces found by detect_faces() at full resolution.
+
+    Args:
+        photo_bytes (bytes): The same image bytes passed to detect_faces()
+        small_image, small_locations, factors: detect_faces() result
+        timer (StageTimer, optional): Receives full_decode/encoding laps
+        encoding_model (int, optional): Encoding model version (default: current)
+
+    Returns:
+        tuple: (locations: full-resolution boxes, encodings: list of 128-d arrays)
+    """
+    import face_recognition
+
+    if not small_locations:
+        return [], []
+
+    if factors == (1.0, 1.0):
+        image, locations = small_image, small_locations
+    else:
+        image, _ = decode_image(photo_bytes)
+        locations = scale_locations(small_locations, factors, image.shape)
+        if timer is not None:
+            timer.lap("full_decode")
+
+    encodings = face_recognition.face_encodings(image, known_face_locations=locations,
+                                                **encoding_params(encoding_model))
+    if timer is not None:
+        timer.lap("encoding")
+
+    return locations, encodings
+
+
+def detect_and_encode(photo_bytes, scale=DEFAULT_DETECTION_SCALE, timer=None, use_cascade=False):
+    """
+    Detect faces on a reduced decode and encode them at full resolution.
+
+    Args:
+        photo_bytes (bytes): JPEG/PNG image bytes
+        scale (int): Detection reduction factor (1 = full resolution)
+        timer (StageTimer, optional): Receives image_decode/detection/full_decode/encoding laps
+        use_cascade (bool): Run the Haar pre-detector first (see detect_faces)
+
+    Returns:
+        tuple: (locations: full-resolution boxes, encodings: list of 128-d arrays)
+    """
+    small_image, small_locations, factors = detect_faces(photo_bytes, scale, timer, use_cascade)
+    return encode_faces(photo_bytes, small_image, small_locations, factors, timer)
+
+
+def measure_detection_recall(photos, scales):
+    """
+    Compare reduced-scale detection against full-resolution detection.
+
+    Args:
+        photos (list): Encoded photos (bytes)
+        scales (list): Detection scales to evaluate
+
+    Returns:
+        list: One dict per scale with recall, extra detections, mean detect+encode
+              time and the mean encoding distance to the full-resolution encoding
+    """
+    import face_recognition
+
+    references = []
+    for photo_bytes in photos:
+        image, _ = decode_image(photo_bytes)
+        locations = face_recognition.face_locations(image)
+        references.append((locations, face_recognition.face_encodings(image, known_face_locations=locations,
+                                                                      **encoding_params())))
+
+    report = []
+    for scale in scales:
+        found = total = extra = 0
+        distances = []
+        start_time = time.perf_counter()
+
+        for photo_bytes, (ref_locations, ref_encodings) in zip(photos, references):
+            locations, encodings = detect_and_encode(photo_bytes, scale)
+            matched = set()
+
+            for ref_location, ref_encoding in zip(ref_locations, ref_encodings):
+                total += 1
+                overlaps = [(box_iou(ref_location, location), i) for i, location in enumerate(locations)
+                            if i not in matched]
+                best_iou, best = max(overlaps, default=(0.0, None))
+                if best is not None and best_iou >= RECALL_IOU:
+                    found += 1
+                    matched.add(best)
+                    distances.append(float(np.linalg.norm(encodings[best] - ref_encoding)))
+
+            extra += len(locations) - len(matched)
+
+        report.append({
+            "scale": scale,
+            "faces": total,
+            "recall": found / total if total else None,
+            "extra_detections": extra,
+            "mean_ms": (time.perf_counter() - start_time) * 1000.0 / max(1, len(photos)),
+            "mean_encoding_distance": float(np.mean(distances)) if distances else None
+        })
+
+    return report
+
+
+def measure_cascade_miss_rate(photos, scale=DEFAULT_DETECTION_SCALE):
+    """
+    Compare cascade + HOG-in-regions detection against plain HOG at one scale.
+
+    Args:
+        photos (list): Encoded photos (bytes)
+        scale (int): Detection scale
+
+    Returns:
+        dict: HOG faces, faces the cascade lost (miss rate), frames without any
+              proposal (HOG skipped) and mean detection time of both paths
+    """
+    import face_recognition
+
+    faces = missed = extra = skipped = 0
+    hog_seconds = cascade_seconds = 0.0
+
+    for photo_bytes in photos:
+        image, _ = decode_image(photo_bytes, scale)
+
+        start_time = time.perf_counter()
+        references = face_recognition.face_locations(image)
+        hog_seconds += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        regions = propose_regions(image)
+        if regions is None:
+            raise RuntimeError("Haar cascade unavailable - install opencv-python")
+        locations = _hog_in_regions(image, regions) if regions else []
+        cascade_seconds += time.perf_counter() - start_time
+
+        skipped += not regions
+        matched = set()
+        for reference in references:
+            faces += 1
+            overlaps = [(box_iou(reference, location), i) for i, location in enumerate(locations) if i not in matched]
+            best_iou, best = max(overlaps, default=(0.0, None))
+            if best is not None and best_iou >= RECALL_IOU:
+                matched.add(best)
+            else:
+                missed += 1
+        extra += len(locations) - len(matched)
+
+    count = max(1, len(photos))
+    return {
+        "scale": scale,
+        "photos": len(photos),
+        "faces": faces,
+        "missed": missed,
+        "miss_rate": missed / faces if faces else None,
+        "extra_detections": extra,
+        "hog_skipped_frames": skipped,
+        "hog_ms": hog_seconds * 1000.0 / count,
+        "cascade_ms": cascade_seconds * 1000.0 / count
+    }
+
+
+def main(argv=None):
+    """Report detection recall and latency per scale for a folder of kiosk photos."""
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="Measure reduced-resolution face detection recall")
+    parser.add_argument("--photos", help="Folder of JPEG/PNG photos (default: app data photos directory)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of photos to evaluate")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Also measure the Haar pre-detector's miss rate against HOG at each scale")
+    args = parser.parse_args(argv)
+
+    if args.photos:
+        photos_dir = Path(args.photos)
+    else:
+        from database import get_app_data_dir
+        photos_dir = get_app_data_dir() / "photos"
+
+    paths = sorted(path for path in photos_dir.glob("*") if path.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    paths = paths[:args.limit]
+    if not paths:
+        print(f"No photos found in {photos_dir}")
+        return 1
+
+    photos = [path.read_bytes() for path in paths]
+    print(f"Photos: {len(photos)} from {photos_dir}")
+
+    for row in measure_detection_recall(photos, args.scales):
+        recall = "n/a" if row["recall"] is None else f"{row['recall']:.4f}"
+        distance = "n/a" if row["mean_encoding_distance"] is None else f"{row['mean_encoding_distance']:.4f}"
+        print(f"scale={row['scale']}  recall={recall} ({row['faces']} faces)  "
+              f"extra={row['extra_detections']}  encoding_drift={distance}  {row['mean_ms']:.1f} ms/photo")
+
+    if args.cascade:
+        for scale in args.scales:
+            row = measure_cascade_miss_rate(photos, scale)
+            miss_rate = "n/a" if row["miss_rate"] is None else f"{row['miss_rate']:.4f}"
+            print(f"cascade scale={scale}  miss_rate={miss_rate} ({row['missed']}/{row['faces']} faces)  "
+                  f"extra={row['extra_detections']}  hog_skipped={row['hog_skipped_frames']}/{row['photos']}  "
+                  f"detection {row['hog_ms']:.1f} -> {row['cascade_ms']:.1f} ms/photo")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
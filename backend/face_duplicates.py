@@ -0,0 +1,129 @@
+"""
+Duplicate face detection.
+At registration the new encoding is compared with every active employee;
+another employee closer than DUPLICATE_THRESHOLD is most likely the same
+person under a second employee number, which would make recognition return
+whichever of the two it meets first.
+
+The offline report finds all near-duplicate pairs already in the gallery
+with blocked matrix multiplication (one BLOCK_ROWS x BLOCK_ROWS distance
+tile at a time), so memory stays bounded for tens of thousands of employees:
+    python face_duplicates.py --threshold 0.5
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from face_gallery import APPROX_DISTANCE_MARGIN
+
+
+# Registrations closer than this to another active employee are duplicates
+DUPLICATE_THRESHOLD = 0.5
+
+# What registration does with a duplicate: "reject", "flag" (needs approval) or "off"
+DUPLICATE_POLICIES = ("reject", "flag", "off")
+DEFAULT_DUPLICATE_POLICY = "flag"
+
+# Rows per side of a distance tile in the pairs report (2048^2 float32 = 16 MB)
+BLOCK_ROWS = 2048
+
+
+def get_duplicate_settings():
+    """
+    Registration duplicate check settings.
+
+    Returns:
+        tuple: (policy: str, threshold: float) from FACE_DUPLICATE_POLICY and
+               FACE_DUPLICATE_THRESHOLD, falling back to the defaults
+    """
+    policy = os.environ.get('FACE_DUPLICATE_POLICY', DEFAULT_DUPLICATE_POLICY).lower()
+    if policy not in DUPLICATE_POLICIES:
+        policy = DEFAULT_DUPLICATE_POLICY
+
+    try:
+        threshold = float(os.environ.get('FACE_DUPLICATE_THRESHOLD', DUPLICATE_THRESHOLD))
+    except ValueError:
+        threshold = DUPLICATE_THRESHOLD
+
+    return policy, threshold
+
+
+def find_duplicate_pairs(encodings, threshold=DUPLICATE_THRESHOLD, block_rows=BLOCK_ROWS):
+    """
+    Find all pairs of gallery rows closer than a threshold.
+    Distances are computed tile by tile from ||a||^2 - 2 a.b + ||b||^2 over the
+    upper triangle only; tile hits are re-checked in float64.
+
+    Args:
+        encodings (np.ndarray): (N, 128) encodings
+        threshold (float): Maximum face distance of a pair
+        block_rows (int): Rows per side of a distance tile
+
+    Returns:
+        list: (row_a, row_b, distance) with row_a < row_b, closest first
+    """
+    encodings32 = np.ascontiguousarray(encodings, dtype=np.float32)
+    sq_norms = np.einsum('ij,ij->i', encodings32, encodings32)
+    limit = (threshold + APPROX_DISTANCE_MARGIN) ** 2
+    count = len(encodings32)
+
+    pairs = []
+    for start_a in range(0, count, block_rows):
+        block_a = encodings32[start_a:start_a + block_rows]
+        norms_a = sq_norms[start_a:start_a + block_rows]
+
+        for start_b in range(start_a, count, block_rows):
+            block_b = encodings32[start_b:start_b + block_rows]
+            sq = norms_a[:, None] - 2.0 * (block_a @ block_b.T) + sq_norms[start_b:start_b + block_rows][None, :]
+
+            if start_a == start_b:
+                # Diagonal tile: each pair once, never a row with itself
+                sq[np.tril_indices(len(block_a), 0, len(block_b))] = np.inf
+
+            rows_a, rows_b = np.nonzero(sq < limit)
+            for row_a, row_b in zip(rows_a + start_a, rows_b + start_b):
+                distance = float(np.linalg.norm(encodings[row_a].astype(np.float64) - encodings[row_b]))
+                if distance < threshold:
+                    pairs.append((int(row_a), int(row_b), distance))
+
+    pairs.sort(key=lambda pair: pair[2])
+    return pairs
+
+
+def main(argv=None):
+    """Print every pair of active employees whose registered faces are near-duplicates."""
+    import argparse
+    from face_gallery import FaceGallery
+
+    parser = argparse.ArgumentParser(description="Report near-duplicate registered faces")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Time the report on this many random encodings instead of the database")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        encodings = rng.normal(0.0, 0.1, (args.synthetic, 128)).astype(np.float32)
+        gallery = FaceGallery(encodings, np.arange(1, args.synthetic + 1),
+                              [f"Employee {i}" for i in range(args.synthetic)], list(range(args.synthetic)))
+    else:
+        from database import Database
+        gallery = FaceGallery.from_rows(Database(args.db).get_all_face_encodings())
+
+    start_time = time.perf_counter()
+    pairs = find_duplicate_pairs(gallery.exact_encodings, args.threshold, args.block_rows)
+    elapsed = time.perf_counter() - start_time
+
+    for row_a, row_b, distance in pairs:
+        print(f"{distance:.4f}  #{gallery.employee_numbers[row_a]} {gallery.names[row_a]} (id {gallery.ids[row_a]})"
+              f"  <->  #{gallery.employee_numbers[row_b]} {gallery.names[row_b]} (id {gallery.ids[row_b]})")
+    print(f"{len(pairs)} near-duplicate pairs below {args.threshold} among {len(gallery)} employees ({elapsed:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+"""
+In-memory face gallery for the Kiosk application.
+Keeps all registered face encodings in one contiguous matrix so a probe can
+be matched against every employee with a single batched NumPy operation.
+The scan runs on a float32 copy; the stored float64 rows are kept for the
+exact re-rank, so results equal face_recognition.face_distance().
+"""
+import numpy as np
+
+
+# Face distance < 0.6 is generally considered a match
+MATCH_THRESHOLD = 0.6
+
+# Number of nearest candidates re-ranked in float64 after the float32 scan
+RERANK_CANDIDATES = 8
+
+# Slack added to a distance threshold for the approximate scan before the
+# exact check (covers float32 rounding and quantized scan codes)
+APPROX_DISTANCE_MARGIN = 0.05
+
+
+def match_confidence(distance):
+    """
+    Convert a face distance to the confidence percentage shown in the UI.
+
+    Args:
+        distance (float): Euclidean face distance (lower = more similar)
+
+    Returns:
+        float: Confidence percentage rounded to 2 decimals
+    """
+    return round((1 - float(distance)) * 100, 2)
+
+
+class FaceGallery:
+    """
+    Contiguous float32 matrix of face encodings with precomputed squared norms,
+    the float64 rows for the exact re-rank and parallel id / name /
+    employee_number arrays.
+    Single employees can be added, updated and removed in place; the matrix
+    keeps spare capacity so appends do not copy the whole gallery.
+    """
+
+    # Candidates from the approximate scan re-ranked exactly
+    rerank_candidates = RERANK_CANDIDATES
+
+    def __init__(self, encodings, ids, names, employee_numbers):
+        """
+        Build a gallery from already-parsed encodings.
+
+        Args:
+            encodings: Array-like of shape (N, 128)
+            ids (list): Employee database IDs
+            names (list): Employee names
+            employee_numbers (list): Employee numbers
+        """
+        exact = np.array(encodings, dtype=np.float64)
+        if exact.ndim != 2:
+            exact = exact.reshape(len(ids), -1)
+        matrix = exact.astype(np.float32)
+
+        self._encodings = matrix
+        self._exact = exact
+        self._sq_norms = np.einsum('ij,ij->i', matrix, matrix, dtype=np.float64).astype(np.float32)
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._size = len(self._ids)
+        self._rows = None  # employee id -> row index, built on first patch
+        self.names = list(names)
+        self.employee_numbers = list(employee_numbers)
+
+    @classmethod
+    def from_arrays(cls, encodings, sq_norms, ids, names, employee_numbers, exact=None):
+        """
+        Wrap existing arrays (e.g. memory-mapped snapshot files) without copying.
+        Read-only arrays are copied on the first in-place patch.
+
+        Args:
+            encodings (np.ndarray): (N, D) float32 matrix
+            sq_norms (np.ndarray): (N,) float32 squared norms
+            ids (np.ndarray): (N,) int64 employee IDs
+            names (list): Employee names
+            employee_numbers (list): Employee numbers
+            exact (np.ndarray, optional): (N, D) float64 rows for the re-rank
+                (default: widened from encodings, i.e. float32-rounded)
+
+        Returns:
+            FaceGallery: Gallery backed by the given arrays
+        """
+        gallery = cls.__new__(cls)
+        gallery._encodings = encodings
+        gallery._exact = encodings.astype(np.float64) if exact is None else exact
+        gallery._sq_norms = sq_norms
+        gallery._ids = ids
+        gallery._size = len(ids)
+        gallery._rows = None
+        gallery.names = list(names)
+        gallery.employee_numbers = list(employee_numbers)
+        return gallery
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a gallery from Database.get_all_face_encodings() rows.
+
+        Args:
+            rows (list): Tuples of (id, name, face_encoding, employee_number)
+
+        Returns:
+            FaceGallery: Gallery with one entry per row
+        """
+        ids = []
+        names = []
+        employee_numbers = []
+        encodings = []
+
+        for emp_id, name, face_encoding, employee_number in rows:
+            ids.append(emp_id)
+            names.append(name)
+            employee_numbers.append(employee_number)
+            encodings.append(face_encoding)
+
+        if not encodings:
+            return cls(np.empty((0, 128), dtype=np.float64), [], [], [])
+
+        return cls(np.asarray(encodings, dtype=np.float64), ids, names, employee_numbers)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def encodings(self):
+        """(N, D) float32 encoding matrix."""
+        return self._encodings[:self._size]
+
+    @property
+    def exact_encodings(self):
+        """(N, D) float64 encodings as stored in the database."""
+        return self._exact[:self._size]
+
+    @property
+    def sq_norms(self):
+        """Squared L2 norm of each encoding."""
+        return self._sq_norms[:self._size]
+
+    @property
+    def ids(self):
+        """Employee database IDs, one per row."""
+        return self._ids[:self._size]
+
+    def row_of(self, employee_id):
+        """
+        Get the gallery row of an employee.
+
+        Args:
+            employee_id (int): Database ID of employee
+
+        Returns:
+            int or None: Row index, or None if the employee is not in the gallery
+        """
+        if self._rows is None:
+            self._rows = {int(emp_id): row for row, emp_id in enumerate(self.ids)}
+        return self._rows.get(int(employee_id))
+
+    def _reserve(self, size):
+        """Grow the backing arrays (geometrically) to hold at least size rows."""
+        capacity = len(self._ids)
+        if (size <= capacity and self._encodings.flags.writeable and self._exact.flags.writeable and
+                self._sq_norms.flags.writeable and self._ids.flags.writeable):
+            return
+
+        capacity = max(size, capacity * 2, 64)
+        dims = self._encodings.shape[1] if self._encodings.ndim == 2 else 128
+
+        encodings = np.empty((capacity, dims), dtype=np.float32)
+        encodings[:self._size] = self.encodings
+        exact = np.empty((capacity, dims), dtype=np.float64)
+        exact[:self._size] = self.exact_encodings
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        sq_norms[:self._size] = self.sq_norms
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self.ids
+
+        self._encodings, self._exact, self._sq_norms, self._ids = encodings, exact, sq_norms, ids
+
+    def upsert(self, employee_id, name, face_encoding, employee_number):
+        """
+        Add an employee or replace their gallery entry in place.
+
+        Args:
+            employee_id (int): Database ID of employee
+            name (str): Employee name
+            face_encoding: 128-d face encoding
+            employee_number (int): Employee number
+
+        Returns:
+            tuple: (row: int, added: bool)
+        """
+        row = self.row_of(employee_id)
+        added = row is None
+
+        if added:
+            row = self._size
+            self._reserve(row + 1)
+            self._size += 1
+            self._ids[row] = employee_id
+            self._rows[int(employee_id)] = row
+            self.names.append(name)
+            self.employee_numbers.append(employee_number)
+        else:
+            self._reserve(self._size)
+            self.names[row] = name
+            self.employee_numbers[row] = employee_number
+
+        self._exact[row] = np.asarray(face_encoding, dtype=np.float64)
+        encoding = self._exact[row].astype(np.float32)
+        self._encodings[row] = encoding
+        self._sq_norms[row] = np.dot(encoding, encoding)
+        return row, added
+
+    def remove(self, employee_id):
+        """
+        Remove an employee by moving the last row into their slot.
+
+        Args:
+            employee_id (int): Database ID of employee
+
+        Returns:
+            tuple: (row: int or None, moved_from: int or None) - the removed row and
+                   the former index of the row that now occupies it
+        """
+        row = self.row_of(employee_id)
+        if row is None:
+            return None, None
+
+        self._reserve(self._size)
+        last = self._size - 1
+        del self._rows[int(employee_id)]
+
+        if row != last:
+            self._encodings[row] = self._encodings[last]
+            self._exact[row] = self._exact[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._ids[row] = self._ids[last]
+            self.names[row] = self.names[last]
+            self.employee_numbers[row] = self.employee_numbers[last]
+            self._rows[int(self._ids[row])] = row
+
+        self.names.pop()
+        self.employee_numbers.pop()
+        self._size = last
+        return row, last
+
+    def distances(self, probe, indices=None):
+        """
+        Compute the Euclidean distance from a probe to gallery entries.
+        Uses ||g - p||^2 = ||g||^2 - 2 g.p + ||p||^2 so the whole gallery is
+        scanned with one matrix-vector product.
+
+        Args:
+            probe: 128-d face encoding
+            indices (np.ndarray, optional): Row subset to scan (default: all rows)
+
+        Returns:
+            np.ndarray: float32 distances, one per scanned entry
+        """
+        probe32 = np.asarray(probe, dtype=np.float32)
+        if indices is None:
+            encodings, sq_norms = self.encodings, self.sq_norms
+        else:
+            encodings, sq_norms = self.encodings[indices], self.sq_norms[indices]
+
+        sq = sq_norms - 2.0 * (encodings @ probe32) + np.dot(probe32, probe32)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def _exact_distances(self, probe, indices):
+        """Exact float64 distances for a subset of gallery rows (from the stored float64 rows)."""
+        probe64 = np.asarray(probe, dtype=np.float64)
+        diff = self._exact[indices] - probe64
+        return np.linalg.norm(diff, axis=1)
+
+    def best_match(self, probe, indices=None):
+        """
+        Find the closest gallery entry to a probe.
+        The float32 scan selects the nearest few candidates, which are then
+        re-ranked in float64 so the winner and its distance match a per-row
+        face_recognition.face_distance() loop. Ties resolve to the lowest
+        row index, like the original strict "<" comparison.
+
+        Args:
+            probe: 128-d face encoding
+            indices (np.ndarray, optional): Sorted row subset to search (default: all rows)
+
+        Returns:
+            tuple: (index: int or None, distance: float or None)
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+
+        count = len(indices)
+        if count == 0:
+            return None, None
+
+        approx = self.distances(probe, None if count == len(self) else indices)
+
+        rerank = self.rerank_candidates
+        if count <= rerank:
+            candidates = indices
+        else:
+            nearest = np.argpartition(approx, rerank - 1)[:rerank]
+            candidates = indices[np.sort(nearest)]
+
+        exact = self._exact_distances(probe, candidates)
+        best = int(np.argmin(exact))
+        return int(candidates[best]), float(exact[best])
+
+    def _approx_distances_many(self, probes):
+        """(P, N) float32 approximate distances for several probes in one matrix product."""
+        probes32 = np.asarray(probes, dtype=np.float32)
+        sq = (self.sq_norms[None, :] - 2.0 * (probes32 @ self.encodings.T)
+              + np.einsum('ij,ij->i', probes32, probes32)[:, None])
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def best_matches(self, probes):
+        """
+        Find the closest gallery entry for several probes at once.
+        One (P, N) matrix product replaces P scans; each probe's nearest
+        candidates are re-ranked exactly as in best_match().
+
+        Args:
+            probes: (P, 128) face encodings
+
+        Returns:
+            list: (index, distance) per probe, (None, None) for an empty gallery
+        """
+        probes = np.asarray(probes)
+        if len(self) == 0:
+            return [(None, None)] * len(probes)
+        if len(probes) == 0:
+            return []
+
+        approx = self._approx_distances_many(probes)
+        rerank = self.rerank_candidates
+        results = []
+
+        for probe, row in zip(probes, approx):
+            if len(self) <= rerank:
+                candidates = np.arange(len(self))
+            else:
+                candidates = np.sort(np.argpartition(row, rerank - 1)[:rerank])
+            exact = self._exact_distances(probe, candidates)
+            best = int(np.argmin(exact))
+            results.append((int(candidates[best]), float(exact[best])))
+
+        return results
+
+    def nearest(self, probe, indices, count=2):
+        """
+        Find the closest few entries among a subset of gallery rows.
+        Like best_match(), the float32 scan picks candidates that are
+        re-ranked in float64.
+
+        Args:
+            probe: 128-d face encoding
+            indices (np.ndarray): Row subset to search
+            count (int): Entries to return
+
+        Returns:
+            list: Up to count (index, distance) pairs, closest first
+        """
+        if len(indices) == 0:
+            return []
+
+        approx = self.distances(probe, indices)
+        keep = max(count, self.rerank_candidates)
+        if len(indices) > keep:
+            candidates = indices[np.argpartition(approx, keep - 1)[:keep]]
+        else:
+            candidates = indices
+
+        exact = self._exact_distances(probe, candidates)
+        order = np.argsort(exact, kind="stable")[:count]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+    def within(self, probe, threshold):
+        """
+        Find every gallery entry closer to a probe than a threshold.
+        The whole gallery is scanned (no ANN shortcut); rows within the threshold
+        plus APPROX_DISTANCE_MARGIN are re-checked exactly.
+
+        Args:
+            probe: 128-d face encoding
+            threshold (float): Maximum face distance
+
+        Returns:
+            list: (index, distance) pairs, closest first
+        """
+        if len(self) == 0:
+            return []
+
+        candidates = np.flatnonzero(self.distances(probe) < threshold + APPROX_DISTANCE_MARGIN)
+        if len(candidates) == 0:
+            return []
+
+        exact = self._exact_distances(probe, candidates)
+        order = np.argsort(exact, kind="stable")
+        return [(int(candidates[i]), float(exact[i])) for i in order if exact[i] < threshold]
+
+    def employee_at(self, index, distance):
+        """
+        Build the employee dict returned to the frontend for a gallery row.
+
+        Args:
+            index (int): Gallery row index
+            distance (float): Face distance for the match
+
+        Returns:
+            dict: {id, name, employee_number, confidence}
+        """
+        return {
+            "id": int(self.ids[index]),
+            "name": self.names[index],
+            "employee_number": self.employee_numbers[index],
+            "confidence": match_confidence(distance)
+        }
+
+    def match(self, probe, threshold=MATCH_THRESHOLD):
+        """
+        Match a probe against the gallery.
+
+        Args:
+            probe: 128-d face encoding
+            threshold (float): Maximum face distance accepted as a match
+
+        Returns:
+            tuple: (employee: dict or None, distance: float or None)
+        """
+        index, distance = self.best_match(probe)
+
+        if index is None or distance >= threshold:
+            return None, distance
+
+        return self.employee_at(index, distance), distance
+
+    def match_many(self, probes, threshold=MATCH_THRESHOLD):
+        """
+        Match several probes against the gallery in one batched scan.
+
+        Args:
+            probes: (P, 128) face encodings
+            threshold (float): Maximum face distance accepted as a match
+
+        Returns:
+            list: (employee: dict or None, distance: float or None) per probe
+        """
+        return [(None, distance) if index is None or distance >= threshold
+                else (self.employee_at(index, distance), distance)
+                for index, distance in self.best_matches(probes)]
@@ -0,0 +1,318 @@
+"""
+Change-tracked face gallery cache for the Kiosk application.
+Detects gallery changes through the version counter that database triggers
+maintain, patches single-employee changes in place and rebuilds in the
+background after bulk changes while still serving the old snapshot.
+Full builds are persisted next to kiosk.db and memory-mapped on the next start.
+Optionally the gallery is scanned through float16/int8 codes (face_quantization).
+"""
+import os
+import sys
+import threading
+import time
+
+from face_gallery import FaceGallery, MATCH_THRESHOLD
+from face_gallery_snapshot import get_snapshot_dir, load_gallery_snapshot, save_gallery_snapshot
+
+
+# More changed employees than this triggers a background rebuild instead of patching
+PATCH_LIMIT = 100
+
+# Change log versions kept behind the newest refresh, so another cache on the same
+# database (the recognition worker or the in-process one) that is slightly
+# behind can still patch instead of rebuilding
+CHANGE_LOG_RETAIN_VERSIONS = 100
+
+
+class FaceGalleryCache:
+    """Keeps a FaceGallery (and optional ANN index) in sync with the employee table."""
+
+    def __init__(self, db, use_index=None, nprobe=None, persist=True, quantization=None):
+        """
+        Args:
+            db (Database): Database to read encodings and gallery versions from
+            use_index (bool, optional): Build a CoarseQuantizerIndex over large galleries
+                (default: FACE_GALLERY_INDEX environment variable, else off - the
+                index is approximate, and a recall miss at a time clock is a wrong
+                or rejected punch)
+            nprobe (int, optional): Partitions scanned per probe when indexing
+            persist (bool): Save full builds to disk and warm start from them
+            quantization (str, optional): "float16" or "int8" scan codes
+                (default: FACE_GALLERY_QUANTIZATION environment variable, else off)
+        """
+        self.db = db
+        if use_index is None:
+            use_index = os.environ.get('FACE_GALLERY_INDEX', 'false').lower() == 'true'
+        self.use_index = use_index
+        self.nprobe = nprobe
+        if quantization is None:
+            quantization = os.environ.get('FACE_GALLERY_QUANTIZATION', '').lower() or None
+        self.quantization = quantization
+        self.snapshot_dir = get_snapshot_dir(db.db_path) if persist else None
+        self.gallery = None
+        self.index = None
+        self.version = None
+        # Encoding model the served gallery was built from - probes must be encoded with it
+        self.encoding_model = None
+        self._lock = threading.RLock()
+        self._rebuild_thread = None
+
+    def _build_index(self, gallery):
+        """Build the ANN index for a gallery, or None when indexing is disabled."""
+        if not self.use_index:
+            return None
+
+        from face_index import CoarseQuantizerIndex, DEFAULT_NPROBE
+        index = CoarseQuantizerIndex(gallery, nprobe=self.nprobe or DEFAULT_NPROBE)
+
+        if not index.is_exact:
+            sys.stderr.write(f"🔄 Face index built ({len(index.lists)} partitions, {index.build_seconds:.2f}s)\n")
+            sys.stderr.flush()
+
+        return index
+
+    def _quantize(self, gallery, index):
+        """Swap in the quantized scan codes (the index keeps its partitions)."""
+        if not self.quantization:
+            return gallery, index
+
+        from face_quantization import QuantizedFaceGallery
+        gallery = QuantizedFaceGallery.from_gallery(gallery, self.quantization)
+        if index is not None:
+            index.gallery = gallery
+        return gallery, index
+
+    def _load(self):
+        """Load a complete gallery snapshot from the database (and persist it)."""
+        start_time = time.time()
+        version, rows, encoding_model = self.db.get_face_gallery_snapshot()
+        gallery = FaceGallery.from_rows(rows)
+        index = self._build_index(gallery)
+
+        sys.stderr.write(f"🔄 Face gallery loaded ({len(gallery)} employees, version {version}, "
+                         f"{time.time() - start_time:.2f}s)\n")
+        sys.stderr.flush()
+
+        if self.snapshot_dir is not None:
+            epoch, _ = self.db.get_face_gallery_state()
+            saved = save_gallery_snapshot(self.snapshot_dir, epoch, version, gallery, index)
+
+            if saved and self.quantization:
+                # Serve the exact rows from the memory-mapped snapshot so only
+                # the quantized codes stay resident
+                snapshot = load_gallery_snapshot(self.snapshot_dir, epoch)
+                if snapshot is not None and snapshot[0] == version:
+                    gallery = snapshot[1]
+                    if index is not None:
+                        index.gallery = gallery
+
+        gallery, index = self._quantize(gallery, index)
+        return version, gallery, index, encoding_model
+
+    def _warm_start(self):
+        """
+        Memory-map the persisted gallery if it belongs to this database.
+        A snapshot that is a few changes behind is patched from the change log;
+        anything else falls back to a full load.
+
+        Returns:
+            bool: True if the cache was populated from the snapshot
+        """
+        if self.snapshot_dir is None:
+            return False
+
+        start_time = time.time()
+        epoch, db_version = self.db.get_face_gallery_state()
+        snapshot = load_gallery_snapshot(self.snapshot_dir, epoch)
+        if snapshot is None:
+            return False
+
+        version, gallery, index_arrays = snapshot
+        if version > db_version:
+            return False
+
+        if version < db_version:
+            # refresh() patches the remaining changes right after the warm start
+            _, employee_ids, full_reload = self.db.get_face_gallery_changes(version)
+            if full_reload or len(employee_ids) > PATCH_LIMIT:
+                return False
+
+        index = None
+        if self.use_index:
+            if index_arrays is not None:
+                from face_index import CoarseQuantizerIndex, DEFAULT_NPROBE
+                centroids, assignment = index_arrays
+                index = CoarseQuantizerIndex.from_assignment(gallery, centroids, assignment,
+                                                             nprobe=self.nprobe or DEFAULT_NPROBE)
+            else:
+                index = self._build_index(gallery)
+
+        gallery, index = self._quantize(gallery, index)
+        # A model swap always forces a full reload, so the snapshot has the active model
+        self.encoding_model = self.db.get_face_encoding_model()
+        self.version, self.gallery, self.index = version, gallery, index
+
+        sys.stderr.write(f"⚡ Face gallery warm start from snapshot ({len(gallery)} employees, version {version}, "
+                         f"{time.time() - start_time:.3f}s)\n")
+        sys.stderr.flush()
+        return True
+
+    def _prune_change_log(self, version):
+        """Drop change log entries older than the retained window behind version."""
+        if version > CHANGE_LOG_RETAIN_VERSIONS:
+            self.db.prune_face_gallery_changes(version - CHANGE_LOG_RETAIN_VERSIONS)
+
+    def _rebuild_in_background(self):
+        """Reload the full gallery on a worker thread; the old snapshot keeps serving."""
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return
+
+        def rebuild():
+            try:
+                version, gallery, index, encoding_model = self._load()
+                with self._lock:
+                    if self.version is None or version > self.version:
+                        self.version, self.gallery, self.index = version, gallery, index
+                        self.encoding_model = encoding_model
+                self._prune_change_log(version)
+            except Exception as e:
+                sys.stderr.write(f"❌ Background face gallery rebuild failed: {e}\n")
+                sys.stderr.flush()
+
+        self._rebuild_thread = threading.Thread(target=rebuild, name="FaceGalleryRebuild", daemon=True)
+        self._rebuild_thread.start()
+
+    def _apply_changes(self, employee_ids):
+        """Patch changed employees into the gallery (and index) in place."""
+        rows = {row[0]: row for row in self.db.get_face_encodings_for(employee_ids)}
+
+        for employee_id in employee_ids:
+            row = rows.get(employee_id)
+
+            if row is None:
+                # Deleted, soft-deleted or face registration cleared
+                removed_row, moved_from = self.gallery.remove(employee_id)
+                if removed_row is not None and self.index is not None:
+                    self.index.remove_row(removed_row, moved_from)
+            else:
+                emp_id, name, face_encoding, employee_number = row
+                gallery_row, _ = self.gallery.upsert(emp_id, name, face_encoding, employee_number)
+                if self.index is not None:
+                    self.index.add_row(gallery_row)
+
+    def refresh(self):
+        """
+        Bring the cached gallery up to date with the database.
+        The first call loads synchronously; later calls only read the version
+        counter unless something changed.
+
+        Returns:
+            FaceGallery: Current gallery snapshot
+        """
+        with self._lock:
+            if self.gallery is None:
+                if not self._warm_start():
+                    self.version, self.gallery, self.index, self.encoding_model = self._load()
+                    self._prune_change_log(self.version)
+                return self.refresh()
+
+            if self.db.get_face_gallery_version() == self.version:
+                return self.gallery
+
+            current_version, employee_ids, full_reload = self.db.get_face_gallery_changes(self.version)
+
+            if full_reload or len(employee_ids) > PATCH_LIMIT:
+                # Bulk change (e.g. employee sync) - keep serving the old snapshot
+                self._rebuild_in_background()
+                return self.gallery
+
+            self._apply_changes(employee_ids)
+            self.version = current_version
+            self._prune_change_log(current_version)
+
+            if employee_ids:
+                sys.stderr.write(f"🔄 Face gallery patched ({len(employee_ids)} employees, version {current_version})\n")
+                sys.stderr.flush()
+
+            return self.gallery
+
+    def match(self, probe, threshold=MATCH_THRESHOLD):
+        """
+        Refresh if needed and match a probe against the current snapshot.
+
+        Args:
+            probe: 128-d face encoding
+            threshold (float): Maximum face distance accepted as a match
+
+        Returns:
+            tuple: (employee: dict or None, distance: float or None)
+        """
+        with self._lock:
+            gallery = self.refresh()
+            matcher = self.index if self.index is not None else gallery
+            return matcher.match(probe, threshold)
+
+    def match_many(self, probes, threshold=MATCH_THRESHOLD):
+        """
+        Refresh if needed and match several probes against the current snapshot.
+
+        Args:
+            probes: (P, 128) face encodings
+            threshold (float): Maximum face distance accepted as a match
+
+        Returns:
+            list: (employee: dict or None, distance: float or None) per probe
+        """
+        with self._lock:
+            gallery = self.refresh()
+            matcher = self.index if self.index is not None else gallery
+            return matcher.match_many(probes, threshold)
+
+    def nearest_among(self, probe, employee_ids, count=2):
+        """
+        Refresh if needed and find the closest few of the given employees
+        (exact scan of just their rows, e.g. the hot set of face_hot_set).
+
+        Args:
+            probe: 128-d face encoding
+            employee_ids (list): Database IDs to search; ids without a face are skipped
+            count (int): Entries to return
+
+        Returns:
+            list: Up to count (employee dict, distance) pairs, closest first
+        """
+        import numpy as np
+
+        with self._lock:
+            gallery = self.refresh()
+            rows = (gallery.row_of(employee_id) for employee_id in employee_ids)
+            rows = np.asarray(sorted(row for row in rows if row is not None), dtype=np.int64)
+            return [(gallery.employee_at(index, distance), distance)
+                    for index, distance in gallery.nearest(probe, rows, count)]
+
+    def find_within(self, probe, threshold, exclude_id=None):
+        """
+        Refresh if needed and list every employee closer to a probe than a threshold
+        (exhaustive, for duplicate checks - never uses the ANN index).
+
+        Args:
+            probe: 128-d face encoding
+            threshold (float): Maximum face distance
+            exclude_id (int, optional): Employee to leave out (e.g. the one re-registering)
+
+        Returns:
+            list: Employee dicts with an added "distance", closest first
+        """
+        with self._lock:
+            gallery = self.refresh()
+            found = []
+            for index, distance in gallery.within(probe, threshold):
+                employee = gallery.employee_at(index, distance)
+                if employee["id"] != exclude_id:
+                    employee["distance"] = round(distance, 4)
+                    found.append(employee)
+            return found
+
+    def __len__(self):
+        with self._lock:
+            return len(self.refresh())
@@ -0,0 +1,294 @@
+"""
+Persisted face gallery snapshot for instant warm start.
+Stores the gallery matrix (float32 scan copy and float64 re-rank rows), ids,
+names, employee numbers and the gallery version as .npy files next to
+kiosk.db so that, after a restart, the gallery can be memory-mapped with
+np.load(mmap_mode='r') instead of re-read from SQLite.
+
+The recognition worker and the in-process cache may save at the same time:
+every save writes its own set of files and only the meta file switch (under
+a lock file) decides which set is current. An older save never replaces a
+newer one, and files of the current set are never removed.
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from face_gallery import FaceGallery
+
+
+SNAPSHOT_DIR_NAME = "face_gallery"
+SNAPSHOT_FORMAT = 3
+
+# Written last on save and checked first on load - a snapshot without a
+# matching meta file is ignored. Array files carry the gallery version and a
+# per-save tag in their name, so a save never overwrites files that are still
+# mapped or that another process is writing.
+_META_FILE = "meta.json"
+_LOCK_FILE = "meta.lock"
+_ARRAY_FILES = ("encodings", "exact", "sq_norms", "ids", "names", "employee_numbers")
+_INDEX_FILES = ("index_centroids", "index_assignment")
+
+# Stand-in for a NULL employee_number in the int64 array
+_NULL_EMPLOYEE_NUMBER = np.iinfo(np.int64).min
+
+# How long a save waits for the meta lock, and when a left-over lock is broken
+LOCK_TIMEOUT_SECONDS = 5.0
+STALE_LOCK_SECONDS = 30.0
+
+
+def get_snapshot_dir(db_path):
+    """
+    Get the snapshot directory for a database.
+
+    Args:
+        db_path (str): Path to kiosk.db
+
+    Returns:
+        Path: Directory holding the snapshot files
+    """
+    return Path(db_path).parent / SNAPSHOT_DIR_NAME
+
+
+def _array_path(directory, name, version, tag):
+    """Path of one snapshot array file."""
+    return directory / f"{name}-{version}-{tag}.npy"
+
+
+def _write_array(directory, name, version, tag, array):
+    """Write one .npy file via a temp file and an atomic rename."""
+    path = _array_path(directory, name, version, tag)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _read_meta(directory):
+    """Current meta dict, or None if there is no readable meta file."""
+    try:
+        with open(directory / _META_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _meta_lock(directory):
+    """
+    Hold the snapshot lock file while the meta file is switched.
+
+    Yields:
+        bool: True if the lock was acquired within LOCK_TIMEOUT_SECONDS
+    """
+    lock_path = directory / _LOCK_FILE
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    acquired = False
+
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            acquired = True
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > STALE_LOCK_SECONDS:
+                    # Left behind by a process that died while saving
+                    lock_path.unlink()
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
+
+
+def _remove_files(directory, keep_version, keep_tag):
+    """
+    Best-effort cleanup of array files no longer needed after a meta switch:
+    every older version and other saves of the same version. Newer versions
+    belong to a save still in progress and are left alone.
+    """
+    for path in directory.glob("*.npy"):
+        try:
+            _, version, tag = path.stem.rsplit("-", 2)
+            version = int(version)
+        except ValueError:
+            continue
+        if version < keep_version or (version == keep_version and tag != keep_tag):
+            try:
+                path.unlink()
+            except OSError:
+                # Still memory-mapped (Windows) - removed after the next save
+                pass
+
+
+def _remove_save(directory, version, tag):
+    """Remove the files of a save that did not become current."""
+    for path in directory.glob(f"*-{version}-{tag}.npy"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _encode_employee_numbers(employee_numbers):
+    """Store employee numbers as int64 when possible, else as strings."""
+    if all(number is None or isinstance(number, int) for number in employee_numbers):
+        return "int", np.array([_NULL_EMPLOYEE_NUMBER if number is None else number
+                                for number in employee_numbers], dtype=np.int64)
+    return "str", np.array(["" if number is None else str(number) for number in employee_numbers], dtype=str)
+
+
+def _decode_employee_numbers(kind, array):
+    """Inverse of _encode_employee_numbers."""
+    if kind == "int":
+        return [None if number == _NULL_EMPLOYEE_NUMBER else number for number in array.tolist()]
+    return [number or None for number in array.tolist()]
+
+
+def save_gallery_snapshot(directory, epoch, version, gallery, index=None):
+    """
+    Persist a gallery (and the ANN index partitions, if any) to disk.
+
+    Args:
+        directory (Path): Snapshot directory
+        epoch (str): Database identity from Database.get_face_gallery_state()
+        version (int): Gallery version the snapshot was built at
+        gallery (FaceGallery): Gallery to persist
+        index (CoarseQuantizerIndex, optional): Index whose partitions to persist
+
+    Returns:
+        bool: True if the snapshot was written and is now the current one
+    """
+    tag = f"{os.getpid()}{uuid.uuid4().hex[:8]}"
+    try:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        numbers_kind, numbers = _encode_employee_numbers(gallery.employee_numbers)
+        null_names = [row for row, name in enumerate(gallery.names) if name is None]
+
+        _write_array(directory, "encodings", version, tag,
+                     np.ascontiguousarray(gallery.encodings, dtype=np.float32))
+        _write_array(directory, "exact", version, tag,
+                     np.ascontiguousarray(gallery.exact_encodings, dtype=np.float64))
+        _write_array(directory, "sq_norms", version, tag, np.ascontiguousarray(gallery.sq_norms, dtype=np.float32))
+        _write_array(directory, "ids", version, tag, np.ascontiguousarray(gallery.ids, dtype=np.int64))
+        _write_array(directory, "names", version, tag,
+                     np.array(["" if name is None else name for name in gallery.names], dtype=str))
+        _write_array(directory, "employee_numbers", version, tag, numbers)
+
+        has_index = index is not None and not index.is_exact
+        if has_index:
+            _write_array(directory, "index_centroids", version, tag, index.centroids)
+            _write_array(directory, "index_assignment", version, tag,
+                         np.ascontiguousarray(index.row_lists, dtype=np.int64))
+
+        with _meta_lock(directory) as locked:
+            current = _read_meta(directory)
+            if not locked or (current is not None and current.get("format") == SNAPSHOT_FORMAT
+                              and current.get("epoch") == epoch and current.get("version", -1) >= version):
+                # Another process saved the same or a newer gallery meanwhile
+                _remove_save(directory, version, tag)
+                return False
+
+            meta_path = directory / _META_FILE
+            tmp_meta = directory / f"{_META_FILE}.{tag}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({
+                    "format": SNAPSHOT_FORMAT,
+                    "epoch": epoch,
+                    "version": version,
+                    "tag": tag,
+                    "count": len(gallery),
+                    "null_names": null_names,
+                    "employee_numbers": numbers_kind,
+                    "has_index": has_index
+                }, f)
+            os.replace(tmp_meta, meta_path)
+
+            _remove_files(directory, version, tag)
+        return True
+
+    except Exception as e:
+        sys.stderr.write(f"⚠️ Could not save face gallery snapshot: {e}\n")
+        sys.stderr.flush()
+        try:
+            _remove_save(Path(directory), version, tag)
+        except OSError:
+            pass
+        return False
+
+
+def load_gallery_snapshot(directory, epoch):
+    """
+    Memory-map a persisted gallery.
+
+    Args:
+        directory (Path): Snapshot directory
+        epoch (str): Expected database identity
+
+    Returns:
+        tuple: (version: int, gallery: FaceGallery, index_arrays: tuple or None),
+               or None if there is no usable snapshot for this database
+    """
+    try:
+        directory = Path(directory)
+        meta = _read_meta(directory)
+        if meta is None:
+            return None
+
+        if meta.get("format") != SNAPSHOT_FORMAT or meta.get("epoch") != epoch:
+            return None
+
+        # Empty arrays cannot be memory-mapped (and need no warm start)
+        if meta.get("count", 0) == 0:
+            return None
+
+        version, tag = meta["version"], meta["tag"]
+        arrays = {name: np.load(_array_path(directory, name, version, tag), mmap_mode='r', allow_pickle=False)
+                  for name in _ARRAY_FILES}
+
+        if any(len(array) != meta["count"] for array in arrays.values()):
+            return None
+
+        names = arrays["names"].tolist()
+        for row in meta.get("null_names", []):
+            names[row] = None
+
+        gallery = FaceGallery.from_arrays(
+            arrays["encodings"],
+            arrays["sq_norms"],
+            arrays["ids"],
+            names,
+            _decode_employee_numbers(meta["employee_numbers"], arrays["employee_numbers"]),
+            arrays["exact"]
+        )
+
+        index_arrays = None
+        if meta.get("has_index"):
+            index_arrays = tuple(np.load(_array_path(directory, name, version, tag), allow_pickle=False)
+                                 for name in _INDEX_FILES)
+
+        return version, gallery, index_arrays
+
+    except Exception as e:
+        sys.stderr.write(f"⚠️ Ignoring unreadable face gallery snapshot: {e}\n")
+        sys.stderr.flush()
+        return None
@@ -0,0 +1,146 @@
+"""
+Prior-aware matching: check the employees most likely to be at the kiosk first.
+At shift change nearly everyone clocking in punched yesterday or is still
+clocked in, so their rows (the "hot set", from the timesheet table) are
+scanned before the full gallery. A hot-set match is accepted only when it is
+clearly closer than HOT_SET_ACCEPT_DISTANCE and clearly ahead of the next
+hot-set candidate; anything less falls back to the normal full-gallery
+match. The prior can only change an answer if someone outside the hot set
+is even closer than a clear hot-set match.
+
+Hits, misses and the time spent on each path are kept in get_stats(); the
+recognition stages show them as "hot_set" (every probe) and "matching"
+(fallbacks only).
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from face_gallery import MATCH_THRESHOLD
+
+
+# Employees who punched within this many days (today included) are hot
+HOT_SET_LOOKBACK_DAYS = 2
+
+# How often the hot set is re-read from the timesheet table
+HOT_SET_REFRESH_SECONDS = 60
+
+# A hot-set match must be at least this close to be accepted without a full scan
+HOT_SET_ACCEPT_DISTANCE = 0.4
+
+# ... and at least this much closer than the runner-up in the hot set
+HOT_SET_MARGIN = 0.1
+
+# Above this share of the gallery the hot set saves nothing - always scan everything
+HOT_SET_MAX_FRACTION = 0.5
+
+
+class HotSetMatcher:
+    """Matches probes against the hot set first and the full FaceGalleryCache otherwise."""
+
+    def __init__(self, db, face_cache):
+        """
+        Args:
+            db (Database): Database with the timesheet table
+            face_cache (FaceGalleryCache): Gallery cache to match against
+        """
+        self.db = db
+        self.face_cache = face_cache
+        self._lock = threading.Lock()
+        self._employee_ids = []
+        self._loaded_at = None
+        self._stats = {"probes": 0, "hits": 0, "hot_seconds": 0.0, "fallback_seconds": 0.0}
+
+    @classmethod
+    def from_environment(cls, db, face_cache):
+        """Create a matcher unless FACE_HOT_SET is "false"."""
+        if os.environ.get('FACE_HOT_SET', 'true').lower() == 'false':
+            return None
+        return cls(db, face_cache)
+
+    def _hot_employee_ids(self):
+        """Current hot set (re-read every HOT_SET_REFRESH_SECONDS); empty when it is too large to help."""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_at is None or now - self._loaded_at >= HOT_SET_REFRESH_SECONDS:
+                since = (date.today() - timedelta(days=HOT_SET_LOOKBACK_DAYS - 1)).isoformat()
+                employee_ids = self.db.get_hot_set_employee_ids(since)
+                if len(employee_ids) > HOT_SET_MAX_FRACTION * len(self.face_cache):
+                    employee_ids = []
+                self._employee_ids = employee_ids
+                self._loaded_at = now
+            return self._employee_ids
+
+    def _match_hot_set(self, probe):
+        """Confident hot-set match as (employee, distance), or None to fall back."""
+        employee_ids = self._hot_employee_ids()
+        if not employee_ids:
+            return None
+
+        nearest = self.face_cache.nearest_among(probe, employee_ids, 2)
+        if not nearest:
+            return None
+
+        employee, distance = nearest[0]
+        if distance >= HOT_SET_ACCEPT_DISTANCE:
+            return None
+        if len(nearest) > 1 and nearest[1][1] - distance < HOT_SET_MARGIN:
+            return None
+        return employee, distance
+
+    def match(self, probe, threshold=MATCH_THRESHOLD, timer=None):
+        """
+        Match a probe against the hot set, then the full gallery if needed.
+
+        Args:
+            probe: 128-d face encoding
+            threshold (float): Maximum face distance accepted as a match
+            timer (StageTimer, optional): Receives the "hot_set" and (on fallback) "matching" laps
+
+        Returns:
+            tuple: (employee: dict or None, distance: float or None)
+        """
+        start_time = time.perf_counter()
+        hit = self._match_hot_set(probe)
+        hot_seconds = time.perf_counter() - start_time
+        if timer is not None:
+            timer.lap("hot_set")
+
+        result = hit if hit is not None and hit[1] < threshold else None
+        fallback_seconds = 0.0
+        if result is None:
+            start_time = time.perf_counter()
+            result = self.face_cache.match(probe, threshold)
+            fallback_seconds = time.perf_counter() - start_time
+            if timer is not None:
+                timer.lap("matching")
+
+        with self._lock:
+            self._stats["probes"] += 1
+            self._stats["hits"] += hit is not None
+            self._stats["hot_seconds"] += hot_seconds
+            self._stats["fallback_seconds"] += fallback_seconds
+        return result
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {probes, hits, hit_rate, hot_set_size, avg_hot_ms, avg_fallback_ms}
+                  (avg_fallback_ms is per fallback, so hit_rate x avg_fallback_ms is
+                  roughly the time saved per probe)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._employee_ids)
+
+        probes, hits = stats["probes"], stats["hits"]
+        misses = probes - hits
+        return {
+            "probes": probes,
+            "hits": hits,
+            "hit_rate": round(hits / probes, 4) if probes else None,
+            "hot_set_size": size,
+            "avg_hot_ms": round(stats["hot_seconds"] * 1000 / probes, 3) if probes else None,
+            "avg_fallback_ms": round(stats["fallback_seconds"] * 1000 / misses, 3) if misses else None
+        }
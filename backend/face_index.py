@@ -0,0 +1,368 @@
+"""
+Approximate nearest-neighbour index for very large face galleries.
+Partitions a FaceGallery with k-means (pure NumPy) and only scans the
+partitions whose centroids are closest to the probe, re-ranking the
+candidates exactly. Small galleries are searched exactly.
+
+Run directly to report recall against exact search:
+    python face_index.py --nprobe 1 2 4 8 16
+"""
+import sys
+import time
+
+import numpy as np
+
+from face_gallery import FaceGallery, MATCH_THRESHOLD
+
+
+# Galleries smaller than this are always searched exactly
+ANN_MIN_GALLERY_SIZE = 10000
+
+# Number of partitions scanned per probe
+DEFAULT_NPROBE = 8
+
+# k-means training settings
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLES_PER_LIST = 64
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def _nearest_centroids(vectors, centroids, k=1):
+    """
+    Find the k nearest centroids for each vector, in chunks to bound memory.
+
+    Returns:
+        np.ndarray: (len(vectors), k) centroid indices, nearest first
+    """
+    centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+    result = np.empty((len(vectors), k), dtype=np.int64)
+
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+        # ||x||^2 is constant per row, so it does not affect the ranking
+        scores = centroid_sq - 2.0 * (chunk @ centroids.T)
+        if k == 1:
+            result[start:start + len(chunk), 0] = np.argmin(scores, axis=1)
+        else:
+            nearest = np.argpartition(scores, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(scores, nearest, axis=1), axis=1)
+            result[start:start + len(chunk)] = np.take_along_axis(nearest, order, axis=1)
+
+    return result
+
+
+def train_kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Train k-means centroids with Lloyd's algorithm.
+
+    Args:
+        vectors (np.ndarray): (N, D) float32 training vectors
+        nlist (int): Number of centroids
+        iterations (int): Lloyd iterations
+        seed (int): Random seed for initialization
+
+    Returns:
+        np.ndarray: (nlist, D) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = _nearest_centroids(vectors, centroids)[:, 0]
+        counts = np.bincount(assignment, minlength=nlist)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+
+        empty = counts == 0
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+
+        # Re-seed empty partitions with random training vectors
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class CoarseQuantizerIndex:
+    """
+    Inverted-file index over a FaceGallery.
+    Each gallery row belongs to the partition of its nearest centroid.
+    """
+
+    def __init__(self, gallery, nprobe=DEFAULT_NPROBE, nlist=None,
+                 min_gallery_size=ANN_MIN_GALLERY_SIZE, seed=0):
+        """
+        Build the index (trains k-means unless the gallery is small).
+
+        Args:
+            gallery (FaceGallery): Gallery to index
+            nprobe (int): Partitions scanned per probe
+            nlist (int, optional): Number of partitions (default: sqrt(N))
+            min_gallery_size (int): Below this size search is exact
+            seed (int): Random seed for k-means
+        """
+        self.gallery = gallery
+        self.nprobe = nprobe
+        self.centroids = None
+        self.lists = []
+        self.row_lists = None  # partition of each gallery row
+        self.build_seconds = 0.0
+
+        count = len(gallery)
+        if count < max(min_gallery_size, 2):
+            return
+
+        start_time = time.time()
+        nlist = min(nlist or int(np.sqrt(count)), count)
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * KMEANS_SAMPLES_PER_LIST)
+        sample = gallery.encodings[np.sort(rng.choice(count, sample_size, replace=False))]
+
+        self.centroids = train_kmeans(sample, nlist, seed=seed)
+
+        assignment = _nearest_centroids(gallery.encodings, self.centroids)[:, 0]
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+        self.row_lists = assignment
+
+        self.build_seconds = time.time() - start_time
+
+    @classmethod
+    def from_assignment(cls, gallery, centroids, assignment, nprobe=DEFAULT_NPROBE):
+        """
+        Rebuild an index from previously trained centroids and row assignments
+        (e.g. a persisted gallery snapshot) without running k-means again.
+
+        Args:
+            gallery (FaceGallery): Gallery the assignment belongs to
+            centroids (np.ndarray): (nlist, D) float32 centroids
+            assignment (np.ndarray): Partition of each gallery row
+            nprobe (int): Partitions scanned per probe
+
+        Returns:
+            CoarseQuantizerIndex: Index over the gallery
+        """
+        index = cls(gallery, nprobe=nprobe, min_gallery_size=len(gallery) + 1)
+        nlist = len(centroids)
+        assignment = np.array(assignment, dtype=np.int64)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+
+        index.centroids = np.array(centroids, dtype=np.float32)
+        index.lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+        index.row_lists = assignment
+        return index
+
+    @property
+    def is_exact(self):
+        """True when the gallery was too small to partition."""
+        return self.centroids is None
+
+    def add_row(self, row):
+        """
+        Assign a gallery row that was appended or rewritten in place to its nearest partition.
+        Centroids are not retrained; a full rebuild refreshes them.
+
+        Args:
+            row (int): Gallery row index
+        """
+        if self.is_exact:
+            return
+
+        if row < len(self.row_lists):
+            self._discard(self.row_lists[row], row)
+        else:
+            self.row_lists = np.concatenate([self.row_lists, np.full(row + 1 - len(self.row_lists), -1)])
+
+        partition = int(_nearest_centroids(self.gallery.encodings[row:row + 1], self.centroids)[0, 0])
+        self.lists[partition] = np.append(self.lists[partition], row)
+        self.row_lists[row] = partition
+
+    def remove_row(self, row, moved_from):
+        """
+        Mirror FaceGallery.remove(): drop row and renumber the row moved into its slot.
+
+        Args:
+            row (int): Removed gallery row
+            moved_from (int): Former index of the row now stored at row
+        """
+        if self.is_exact:
+            return
+
+        self._discard(self.row_lists[row], row)
+
+        if moved_from != row:
+            partition = self.row_lists[moved_from]
+            members = self.lists[partition]
+            members[members == moved_from] = row
+            self.row_lists[row] = partition
+
+        self.row_lists = self.row_lists[:moved_from]
+
+    def _discard(self, partition, row):
+        """Remove one row from a partition's member list."""
+        if partition >= 0:
+            members = self.lists[partition]
+            self.lists[partition] = members[members != row]
+
+    def candidates(self, probe, nprobe=None):
+        """
+        Get the sorted gallery rows stored in the partitions nearest to a probe.
+
+        Args:
+            probe: 128-d face encoding
+            nprobe (int, optional): Partitions to scan (default: self.nprobe)
+
+        Returns:
+            np.ndarray: Sorted gallery row indices
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.lists))
+        probe32 = np.asarray(probe, dtype=np.float32)[None, :]
+        nearest = _nearest_centroids(probe32, self.centroids, k=nprobe)[0]
+        return np.sort(np.concatenate([self.lists[i] for i in nearest]))
+
+    def best_match(self, probe, nprobe=None):
+        """
+        Find the closest gallery entry within the probed partitions.
+
+        Args:
+            probe: 128-d face encoding
+            nprobe (int, optional): Partitions to scan (default: self.nprobe)
+
+        Returns:
+            tuple: (index: int or None, distance: float or None)
+        """
+        if self.is_exact:
+            return self.gallery.best_match(probe)
+        return self.gallery.best_match(probe, self.candidates(probe, nprobe))
+
+    def match(self, probe, threshold=MATCH_THRESHOLD):
+        """
+        Match a probe against the gallery (same result format as FaceGallery.match).
+
+        Returns:
+            tuple: (employee: dict or None, distance: float or None)
+        """
+        index, distance = self.best_match(probe)
+
+        if index is None or distance >= threshold:
+            return None, distance
+
+        return self.gallery.employee_at(index, distance), distance
+
+    def match_many(self, probes, threshold=MATCH_THRESHOLD):
+        """
+        Match several probes (same result format as FaceGallery.match_many).
+        Probes visit different partitions, so only an exact index batches the scan.
+
+        Returns:
+            list: (employee: dict or None, distance: float or None) per probe
+        """
+        if self.is_exact:
+            return self.gallery.match_many(probes, threshold)
+        return [self.match(probe, threshold) for probe in probes]
+
+    def evaluate_recall(self, probes, nprobe_values, threshold=MATCH_THRESHOLD):
+        """
+        Compare approximate search against exact search.
+
+        Args:
+            probes (np.ndarray): (P, 128) probe encodings
+            nprobe_values (list): nprobe settings to evaluate
+            threshold (float): Match threshold used for decision agreement
+
+        Returns:
+            list: One dict per nprobe with recall, decision agreement,
+                  scanned fraction and mean latency in milliseconds
+        """
+        exact = []
+        start_time = time.perf_counter()
+        for probe in probes:
+            exact.append(self.gallery.best_match(probe))
+        exact_ms = (time.perf_counter() - start_time) * 1000 / max(len(probes), 1)
+
+        report = []
+        for nprobe in nprobe_values:
+            hits = 0
+            agreements = 0
+            scanned = 0
+            start_time = time.perf_counter()
+
+            for probe, (exact_index, exact_distance) in zip(probes, exact):
+                if self.is_exact:
+                    index, distance = exact_index, exact_distance
+                    scanned += len(self.gallery)
+                else:
+                    rows = self.candidates(probe, nprobe)
+                    scanned += len(rows)
+                    index, distance = self.gallery.best_match(probe, rows)
+
+                hits += index == exact_index
+                agreements += ((index if distance is not None and distance < threshold else None) ==
+                               (exact_index if exact_distance is not None and exact_distance < threshold else None))
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            probe_count = max(len(probes), 1)
+            report.append({
+                "nprobe": nprobe,
+                "recall_at_1": hits / probe_count,
+                "decision_agreement": agreements / probe_count,
+                "scanned_fraction": scanned / (probe_count * max(len(self.gallery), 1)),
+                "mean_ms": elapsed_ms / probe_count,
+                "exact_mean_ms": exact_ms
+            })
+
+        return report
+
+
+def main(argv=None):
+    """Report recall against exact search for the kiosk gallery (or a synthetic one)."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune nprobe for the face gallery ANN index")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use a synthetic gallery of this many employees instead of the database")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.03,
+                        help="Per-dimension Gaussian noise added to gallery rows to form probes")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+
+    if args.synthetic:
+        encodings = rng.normal(0.0, 0.1, (args.synthetic, 128)).astype(np.float32)
+        gallery = FaceGallery(encodings, np.arange(1, args.synthetic + 1),
+                              [f"Employee {i}" for i in range(args.synthetic)],
+                              list(range(args.synthetic)))
+    else:
+        from database import Database
+        gallery = FaceGallery.from_rows(Database(args.db).get_all_face_encodings())
+
+    if len(gallery) == 0:
+        print("No registered faces to index")
+        return 1
+
+    picks = rng.integers(0, len(gallery), args.probes)
+    probes = gallery.encodings[picks] + rng.normal(0.0, args.noise, (args.probes, 128)).astype(np.float32)
+
+    index = CoarseQuantizerIndex(gallery, nlist=args.nlist, min_gallery_size=0)
+    print(f"Gallery: {len(gallery)} employees, {len(index.lists)} partitions, "
+          f"built in {index.build_seconds:.2f}s")
+
+    for row in index.evaluate_recall(probes, args.nprobe):
+        print(f"nprobe={row['nprobe']:>3}  recall@1={row['recall_at_1']:.4f}  "
+              f"decisions={row['decision_agreement']:.4f}  scanned={row['scanned_fraction']:.3f}  "
+              f"{row['mean_ms']:.3f} ms (exact {row['exact_mean_ms']:.3f} ms)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Quantized face gallery for memory-constrained kiosks.
+Scans the gallery through a compact float16 or int8 copy of the encodings
+(per-dimension scale/offset for int8) and re-ranks the nearest candidates
+with the exact float64 rows, so match decisions stay those of the exact
+search. Combined with the gallery snapshot the exact rows stay
+memory-mapped and only the pages of re-ranked candidates are touched.
+
+Run directly to check decisions and latency against exact search:
+    python face_quantization.py --synthetic 20000
+"""
+import sys
+import time
+
+import numpy as np
+
+from face_gallery import FaceGallery, MATCH_THRESHOLD
+
+
+QUANTIZATION_MODES = ("float16", "int8")
+
+# int8 scan error is larger than float32 rounding - re-rank more candidates
+QUANTIZED_RERANK_CANDIDATES = 32
+
+# Rows converted to float32 at a time during the scan (bounds temporary memory)
+SCAN_CHUNK_ROWS = 16384
+
+
+class QuantizedFaceGallery(FaceGallery):
+    """FaceGallery that scans quantized codes and re-ranks with the exact rows."""
+
+    rerank_candidates = QUANTIZED_RERANK_CANDIDATES
+
+    @classmethod
+    def from_gallery(cls, gallery, mode):
+        """
+        Quantize a gallery, sharing (not copying) its exact arrays.
+        The quantized gallery takes ownership - stop using the source afterwards.
+
+        Args:
+            gallery (FaceGallery): Gallery to quantize (may be memory-mapped)
+            mode (str): "float16" or "int8"
+
+        Returns:
+            QuantizedFaceGallery: Quantized view of the gallery
+        """
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+        quantized = cls.from_arrays(gallery.encodings, gallery.sq_norms, gallery.ids,
+                                    gallery.names, gallery.employee_numbers, gallery.exact_encodings)
+        quantized.mode = mode
+
+        encodings = gallery.encodings
+        quantized.offset = quantized.scale = None
+        if mode == "int8":
+            dims = encodings.shape[1] if encodings.ndim == 2 else 128
+            # Per-dimension affine range; later upserts outside it are clipped (re-rank stays exact)
+            low = encodings.min(axis=0) if len(encodings) else np.full(dims, -0.5, dtype=np.float32)
+            high = encodings.max(axis=0) if len(encodings) else np.full(dims, 0.5, dtype=np.float32)
+            quantized.offset = ((low + high) / 2.0).astype(np.float32)
+            quantized.scale = np.maximum((high - low) / 254.0, 1e-8).astype(np.float32)
+
+        quantized._codes = quantized._quantize(encodings)
+        return quantized
+
+    def _quantize(self, rows):
+        """Encode float rows as codes."""
+        rows = np.asarray(rows, dtype=np.float32)
+        if self.mode == "float16":
+            return rows.astype(np.float16)
+        return np.clip(np.rint((rows - self.offset) / self.scale), -127, 127).astype(np.int8)
+
+    @property
+    def codes(self):
+        """(N, D) quantized encodings used for the scan."""
+        return self._codes[:len(self)]
+
+    @property
+    def code_bytes(self):
+        """Memory used by the scan codes."""
+        return self.codes.nbytes
+
+    def distances(self, probe, indices=None):
+        """
+        Approximate distances from the quantized codes.
+        For int8, g = offset + scale * q, so g.p = offset.p + q.(scale * p).
+
+        Args:
+            probe: 128-d face encoding
+            indices (np.ndarray, optional): Row subset to scan (default: all rows)
+
+        Returns:
+            np.ndarray: float32 approximate distances, one per scanned entry
+        """
+        probe32 = np.asarray(probe, dtype=np.float32)
+        if self.mode == "int8":
+            weights, bias = self.scale * probe32, float(np.dot(self.offset, probe32))
+        else:
+            weights, bias = probe32, 0.0
+
+        codes = self.codes if indices is None else self.codes[indices]
+        sq_norms = self.sq_norms if indices is None else self.sq_norms[indices]
+
+        dots = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_CHUNK_ROWS):
+            chunk = codes[start:start + SCAN_CHUNK_ROWS].astype(np.float32)
+            dots[start:start + len(chunk)] = chunk @ weights
+
+        sq = sq_norms - 2.0 * (dots + bias) + np.dot(probe32, probe32)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def _approx_distances_many(self, probes):
+        """(P, N) approximate distances for several probes from the quantized codes."""
+        probes32 = np.asarray(probes, dtype=np.float32)
+        if self.mode == "int8":
+            weights, bias = probes32 * self.scale, probes32 @ self.offset
+        else:
+            weights, bias = probes32, np.zeros(len(probes32), dtype=np.float32)
+
+        codes = self.codes
+        dots = np.empty((len(probes32), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_CHUNK_ROWS):
+            chunk = codes[start:start + SCAN_CHUNK_ROWS].astype(np.float32)
+            dots[:, start:start + len(chunk)] = weights @ chunk.T
+
+        sq = (self.sq_norms[None, :] - 2.0 * (dots + bias[:, None])
+              + np.einsum('ij,ij->i', probes32, probes32)[:, None])
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def _reserve_codes(self):
+        """Keep the code matrix as large as the exact arrays."""
+        capacity = len(self._ids)
+        if len(self._codes) < capacity or not self._codes.flags.writeable:
+            codes = np.empty((capacity,) + self._codes.shape[1:], dtype=self._codes.dtype)
+            # An upsert has already grown len(self) by the row being written
+            kept = min(len(self._codes), len(self))
+            codes[:kept] = self._codes[:kept]
+            self._codes = codes
+
+    def upsert(self, employee_id, name, face_encoding, employee_number):
+        """Add or replace an employee in both the exact rows and the codes."""
+        row, added = super().upsert(employee_id, name, face_encoding, employee_number)
+        self._reserve_codes()
+        self._codes[row] = self._quantize(self._encodings[row:row + 1])[0]
+        return row, added
+
+    def remove(self, employee_id):
+        """Swap-remove an employee from both the exact rows and the codes."""
+        row, moved_from = super().remove(employee_id)
+        if row is not None and row != moved_from:
+            self._reserve_codes()
+            self._codes[row] = self._codes[moved_from]
+        return row, moved_from
+
+
+def evaluate_quantization(gallery, probes, modes=QUANTIZATION_MODES, threshold=MATCH_THRESHOLD):
+    """
+    Compare quantized search with the exact float64 search.
+
+    Args:
+        gallery (FaceGallery): Gallery to quantize
+        probes (np.ndarray): (P, 128) probe encodings
+        modes (tuple): Quantization modes to evaluate
+        threshold (float): Match threshold whose decisions must not change
+
+    Returns:
+        list: One dict per mode (plus "float32") with decision agreement,
+              changed decisions, scan memory and mean latency
+    """
+    exact64 = gallery.exact_encodings
+    reference = []
+    for probe in probes:
+        distances = np.linalg.norm(exact64 - np.asarray(probe, dtype=np.float64), axis=1)
+        best = int(np.argmin(distances))
+        reference.append((best, float(distances[best])))
+
+    report = []
+    for mode in ("float32",) + tuple(modes):
+        searched = gallery if mode == "float32" else QuantizedFaceGallery.from_gallery(gallery, mode)
+
+        changed = 0
+        max_error = 0.0
+        start_time = time.perf_counter()
+        results = [searched.best_match(probe) for probe in probes]
+        elapsed = time.perf_counter() - start_time
+
+        for (ref_index, ref_distance), (index, distance) in zip(reference, results):
+            ref_decision = ref_index if ref_distance < threshold else None
+            decision = index if distance < threshold else None
+            changed += decision != ref_decision
+            max_error = max(max_error, abs(distance - ref_distance))
+
+        report.append({
+            "mode": mode,
+            "probes": len(probes),
+            "matches": sum(distance < threshold for _, distance in reference),
+            "changed_decisions": changed,
+            "decision_agreement": 1.0 - changed / max(1, len(probes)),
+            "max_distance_error": max_error,
+            "scan_bytes": gallery.encodings.nbytes if mode == "float32" else searched.code_bytes,
+            "mean_ms": elapsed * 1000.0 / max(1, len(probes))
+        })
+
+    return report
+
+
+def main(argv=None):
+    """Report match-decision agreement and latency of the quantized modes."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check quantized face gallery decisions against exact search")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use a synthetic gallery of this many employees instead of the database")
+    parser.add_argument("--probes", type=int, default=1000)
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.02, 0.04, 0.05, 0.06],
+                        help="Per-dimension noise levels for genuine probes (spanning the threshold)")
+    parser.add_argument("--impostors", type=float, default=0.25,
+                        help="Fraction of probes drawn from outside the gallery")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+
+    if args.synthetic:
+        encodings = rng.normal(0.0, 0.1, (args.synthetic, 128)).astype(np.float32)
+        gallery = FaceGallery(encodings, np.arange(1, args.synthetic + 1),
+                              [f"Employee {i}" for i in range(args.synthetic)],
+                              list(range(args.synthetic)))
+    else:
+        from database import Database
+        gallery = FaceGallery.from_rows(Database(args.db).get_all_face_encodings())
+
+    if len(gallery) == 0:
+        print("No registered faces to evaluate")
+        return 1
+
+    impostors = int(args.probes * args.impostors)
+    genuine = args.probes - impostors
+    picks = rng.integers(0, len(gallery), genuine)
+    noise = rng.choice(args.noise, genuine)[:, None] * rng.normal(0.0, 1.0, (genuine, 128))
+    spread = gallery.encodings.std(axis=0)
+    probes = np.vstack([
+        gallery.encodings[picks] + noise,
+        gallery.encodings.mean(axis=0) + spread * rng.normal(0.0, 1.0, (impostors, 128))
+    ]).astype(np.float32)
+
+    print(f"Gallery: {len(gallery)} employees, {len(probes)} probes ({impostors} impostors)")
+    for row in evaluate_quantization(gallery, probes):
+        print(f"{row['mode']:>8}  decisions={row['decision_agreement']:.4f} "
+              f"(changed {row['changed_decisions']}, matches {row['matches']})  "
+              f"max_err={row['max_distance_error']:.2e}  scan={row['scan_bytes'] / 2 ** 20:.2f} MB  "
+              f"{row['mean_ms']:.3f} ms")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
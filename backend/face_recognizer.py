@@ -0,0 +1,395 @@
+"""
+Qt-free face recognition pipeline.
+Shared by KioskBridge.recognizeFace and the out-of-process recognition
+service so both produce exactly the same results.
+"""
+import base64
+import os
+import sys
+import threading
+import time
+
+from face_detection import (DEFAULT_DETECTION_SCALE, cascade_enabled, detect_faces, encode_faces,
+                            propose_regions)
+from face_gallery_cache import FaceGalleryCache
+from fidelity_governor import FidelityGovernor, fixed_detection_settings
+from face_hot_set import HotSetMatcher
+from face_tracker import TRACK_CONFIRM_DISTANCE, FaceTracker, face_patch
+
+
+# Longest time an early recognition waits for the warm-up to finish
+WARMUP_WAIT_SECONDS = 60
+
+
+def decode_photo_base64(photo_base64):
+    """
+    Decode a base64 photo, with or without a data URL prefix.
+
+    Args:
+        photo_base64 (str): Base64 encoded photo (data:image/jpeg;base64,...)
+
+    Returns:
+        bytes: Encoded image bytes
+    """
+    if "base64," in photo_base64:
+        photo_base64 = photo_base64.split("base64,")[1]
+    return base64.b64decode(photo_base64)
+
+
+class FaceRecognizer:
+    """Detects, encodes and matches a face photo against the cached gallery."""
+
+    def __init__(self, db, face_cache=None, detection_scale=None, use_tracker=True, use_cascade=None,
+                 use_governor=None):
+        """
+        Args:
+            db (Database): Database holding the registered faces
+            face_cache (FaceGalleryCache, optional): Gallery cache to match against
+            detection_scale (int, optional): Detection downscale factor
+                (default: FACE_DETECTION_SCALE environment variable, else 2)
+            use_tracker (bool): Reuse recent identities for faces that have not moved
+            use_cascade (bool, optional): Run the Haar pre-detector before HOG
+                (default: FACE_DETECTION_CASCADE environment variable, else off)
+            use_governor (bool, optional): Let a FidelityGovernor pick the detection
+                settings instead of detection_scale/use_cascade
+                (default: FACE_FIDELITY_GOVERNOR environment variable, else on unless
+                the detection scale or cascade was set explicitly)
+        """
+        self.db = db
+        fixed_settings = detection_scale is not None or use_cascade is not None or fixed_detection_settings()
+        if detection_scale is None:
+            detection_scale = int(os.environ.get('FACE_DETECTION_SCALE', DEFAULT_DETECTION_SCALE))
+        self.detection_scale = max(1, detection_scale)
+        self.use_cascade = cascade_enabled() if use_cascade is None else use_cascade
+        # Holds the p95 latency target by moving between detection tiers
+        if use_governor is None:
+            self.governor = FidelityGovernor.from_environment(fixed_settings)
+        else:
+            self.governor = FidelityGovernor() if use_governor else None
+        self.tracker = FaceTracker() if use_tracker else None
+        self.face_cache = face_cache if face_cache is not None else FaceGalleryCache(db)
+        # Employees who punched recently are checked first (FACE_HOT_SET=false disables)
+        self.hot_set = HotSetMatcher.from_environment(db, self.face_cache)
+        self._warmup_lock = threading.Lock()
+        self._warmup_done = threading.Event()
+        self._warmup_thread = None
+        self._warmup_status = {"state": "idle", "seconds": None, "message": "Warm-up not started"}
+
+    def start_warmup(self):
+        """Warm up the models and gallery on a background thread (idempotent)."""
+        with self._warmup_lock:
+            if self._warmup_thread is not None:
+                return
+            self._warmup_status = {"state": "running", "seconds": None, "message": "Loading face recognition models"}
+            self._warmup_thread = threading.Thread(target=self.warm_up, name="FaceWarmup", daemon=True)
+            self._warmup_thread.start()
+
+    def warm_up(self):
+        """
+        Import dlib/face_recognition, load the detector, shape predictor and
+        ResNet weights by running one dummy detection and encoding, and build
+        the gallery - so the first employee of the day does not pay for it.
+        """
+        import numpy as np
+
+        start_time = time.time()
+        try:
+            import face_recognition
+
+            image = np.zeros((150, 150, 3), dtype=np.uint8)
+            face_recognition.face_locations(image)
+            if self.use_cascade:
+                propose_regions(image)
+            # Forcing a location runs the shape predictor and ResNet without a real face
+            face_recognition.face_encodings(image, known_face_locations=[(0, 149, 149, 0)])
+            if self.governor is not None:
+                self.governor.enable_gpu_tier()
+
+            gallery_size = len(self.face_cache)
+            elapsed = time.time() - start_time
+            self._warmup_status = {
+                "state": "ready",
+                "seconds": round(elapsed, 2),
+                "message": f"Face recognition ready ({gallery_size} registered faces)"
+            }
+            sys.stderr.write(f"✅ Face recognition warm-up complete ({elapsed:.2f}s, {gallery_size} faces)\n")
+        except Exception as e:
+            self._warmup_status = {
+                "state": "failed",
+                "seconds": round(time.time() - start_time, 2),
+                "message": f"Face recognition warm-up failed: {str(e)}"
+            }
+            sys.stderr.write(f"❌ Face recognition warm-up failed: {e}\n")
+        finally:
+            sys.stderr.flush()
+            self._warmup_done.set()
+
+    def wait_for_warmup(self, timeout=WARMUP_WAIT_SECONDS):
+        """Block until a running warm-up finishes; returns immediately otherwise."""
+        if self._warmup_thread is not None and self._warmup_thread is not threading.current_thread():
+            self._warmup_done.wait(timeout)
+
+    def get_warmup_status(self):
+        """
+        Returns:
+            dict: state (idle/running/ready/failed), seconds and message
+        """
+        return dict(self._warmup_status)
+
+    def _wait_for_warmup(self, timer):
+        """An early scan waits for the warm-up instead of loading the models twice."""
+        if not self._warmup_done.is_set() and self._warmup_thread is not None:
+            self.wait_for_warmup()
+            if timer is not None:
+                timer.lap("warmup_wait")
+
+    @staticmethod
+    def _import_error(caller):
+        """
+        Import face_recognition (fail early with a clear message).
+
+        Returns:
+            dict or None: Error result, or None if the library is available
+        """
+        try:
+            import face_recognition  # noqa: F401
+        except ImportError as e:
+            sys.stderr.write(f"❌ Failed to import face_recognition in {caller}: {e}\n")
+            sys.stderr.flush()
+            return {
+                "success": False,
+                "message": f"Face recognition library not installed: {str(e)}"
+            }
+        except Exception as e:
+            sys.stderr.write(f"❌ Unexpected error importing face_recognition in {caller}: {e}\n")
+            sys.stderr.flush()
+            return {
+                "success": False,
+                "message": f"Error loading face recognition: {str(e)}"
+            }
+        return None
+
+    def reset_tracking(self):
+        """Forget tracked identities (scan restart or a rejected match)."""
+        if self.tracker is not None:
+            self.tracker.clear()
+
+    def _detection_settings(self):
+        """(scale, cascade, upsample, model, tier name) from the governor's tier, else the fixed settings."""
+        if self.governor is not None:
+            tier = self.governor.tier
+            return tier["detection_scale"], tier["cascade"], tier["upsample"], tier["model"], tier["name"]
+        return self.detection_scale, self.use_cascade, 1, "hog", None
+
+    def recognize(self, photo_bytes, timer=None):
+        """
+        Recognize the face in an encoded photo.
+
+        Args:
+            photo_bytes (bytes): JPEG/PNG image bytes
+            timer (StageTimer, optional): Receives per-stage laps
+
+        Returns:
+            dict: {"success": bool, "employee": dict or None, "message": str}
+                  plus "face_detected" once detection ran, "multiple_faces" when
+                  the photo has several (see recognize_all) and "fidelity_tier"
+                  when a face was encoded under the governor
+        """
+        self._wait_for_warmup(timer)
+
+        import_error = self._import_error("recognizeFace")
+        if import_error is not None:
+            return import_error
+
+        start_time = time.perf_counter()
+        try:
+            # Detect on a reduced decode
+            scale, use_cascade, upsample, model, tier_name = self._detection_settings()
+            small_image, small_locations, factors = detect_faces(photo_bytes, scale, timer, use_cascade,
+                                                                 upsample, model)
+
+            if len(small_locations) == 0:
+                return {
+                    "success": True,
+                    "employee": None,
+                    "face_detected": False,
+                    "message": "No face detected in the photo"
+                }
+
+            if len(small_locations) > 1:
+                return {
+                    "success": True,
+                    "employee": None,
+                    "face_detected": True,
+                    "multiple_faces": True,
+                    "message": "Multiple faces detected"
+                }
+
+            # Same face as a few seconds ago - a candidate identity to confirm
+            location = small_locations[0]
+            patch = tracked = None
+            tracker_epoch = self.tracker.epoch if self.tracker is not None else None
+            # Refresh first so a gallery change (e.g. a deleted employee) forces a
+            # re-verify and the probe is encoded with the gallery's encoding model
+            self.face_cache.refresh()
+            if self.tracker is not None:
+                patch = face_patch(small_image, location)
+                tracked = self.tracker.lookup(location, patch, self.face_cache.version)
+                if timer is not None:
+                    timer.lap("tracking")
+
+            # Encode at full resolution
+            _, face_encodings = encode_faces(photo_bytes, small_image, small_locations, factors, timer,
+                                             self.face_cache.encoding_model)
+
+            # Get the face encoding to match
+            unknown_face_encoding = face_encodings[0]
+
+            # Get the registered face gallery (cached, patched when the DB changes)
+            gallery_size = len(self.face_cache)
+            if timer is not None:
+                timer.lap("gallery")
+
+            if gallery_size == 0:
+                return {
+                    "success": True,
+                    "employee": None,
+                    "face_detected": True,
+                    "message": "No registered faces in the system"
+                }
+
+            # A tracked identity is only reused if the fresh encoding confirms it
+            if tracked is not None:
+                tracked_employee, _ = tracked
+                nearest = self.face_cache.nearest_among(unknown_face_encoding, [tracked_employee["id"]], 1)
+                if timer is not None:
+                    timer.lap("track_confirm")
+                if nearest and nearest[0][1] < TRACK_CONFIRM_DISTANCE:
+                    employee, _ = nearest[0]
+                    return {
+                        "success": True,
+                        "employee": employee,
+                        "tracked": True,
+                        "face_detected": True,
+                        "fidelity_tier": tier_name,
+                        "message": f"Match found: {employee['name']} ({employee['confidence']}% confidence)"
+                    }
+                self.tracker.forget(location)
+
+            # Compare against all registered faces in one batched operation
+            # (after a confident hot-set match, not at all)
+            # Face distance < 0.6 is generally considered a match
+            if self.hot_set is not None:
+                best_match, best_distance = self.hot_set.match(unknown_face_encoding, timer=timer)
+            else:
+                best_match, best_distance = self.face_cache.match(unknown_face_encoding)
+                if timer is not None:
+                    timer.lap("matching")
+
+            if best_match:
+                if self.tracker is not None:
+                    self.tracker.update(location, patch, best_match, best_distance, self.face_cache.version,
+                                        tracker_epoch)
+                return {
+                    "success": True,
+                    "employee": best_match,
+                    "face_detected": True,
+                    "fidelity_tier": tier_name,
+                    "message": f"Match found: {best_match['name']} ({best_match['confidence']}% confidence)"
+                }
+            else:
+                return {
+                    "success": True,
+                    "employee": None,
+                    "face_detected": True,
+                    "fidelity_tier": tier_name,
+                    "message": "No match found (confidence too low)"
+                }
+
+        except Exception as e:
+            return {
+                "success": False,
+                "employee": None,
+                "message": f"Error recognizing face: {str(e)}"
+            }
+        finally:
+            # Every frame counts against the latency budget - also frames the tier
+            # found no face in, or the governor would have nothing to promote on
+            if self.governor is not None:
+                self.governor.record(time.perf_counter() - start_time)
+
+    def recognize_all(self, photo_bytes, timer=None):
+        """
+        Recognize every face in a photo (multi-face mode for queues at shift change).
+        All faces are encoded in one call and matched with one batched gallery scan.
+
+        Args:
+            photo_bytes (bytes): JPEG/PNG image bytes
+            timer (StageTimer, optional): Receives per-stage laps
+
+        Returns:
+            dict: {"success": bool, "faces": [{"box", "employee", "distance"}], "message": str}
+                  with identified faces first, most confident first, then unknown faces
+                  left to right
+        """
+        self._wait_for_warmup(timer)
+
+        import_error = self._import_error("recognizeFaces")
+        if import_error is not None:
+            import_error["faces"] = []
+            return import_error
+
+        try:
+            scale, use_cascade, upsample, model, _ = self._detection_settings()
+            small_image, small_locations, factors = detect_faces(photo_bytes, scale, timer, use_cascade,
+                                                                 upsample, model)
+            if not small_locations:
+                return {"success": True, "faces": [], "message": "No face detected in the photo"}
+
+            self.face_cache.refresh()
+            locations, face_encodings = encode_faces(photo_bytes, small_image, small_locations, factors, timer,
+                                                     self.face_cache.encoding_model)
+
+            if len(self.face_cache) == 0:
+                matches = [(None, None)] * len(face_encodings)
+            else:
+                matches = self.face_cache.match_many(face_encodings)
+            if timer is not None:
+                timer.lap("matching")
+
+            faces = [{
+                "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+                "employee": employee,
+                "distance": None if distance is None else round(distance, 4)
+            } for (top, right, bottom, left), (employee, distance) in zip(locations, matches)]
+
+            # One person cannot be two faces - keep the closer match
+            best_for = {}
+            for face in faces:
+                employee = face["employee"]
+                if employee is not None:
+                    other = best_for.get(employee["id"])
+                    if other is None or face["distance"] < other["distance"]:
+                        if other is not None:
+                            other["employee"] = None
+                        best_for[employee["id"]] = face
+                    else:
+                        face["employee"] = None
+
+            faces.sort(key=lambda face: (face["employee"] is None,
+                                         -(face["employee"] or {}).get("confidence", 0),
+                                         face["box"]["left"]))
+
+            identified = sum(face["employee"] is not None for face in faces)
+            return {
+                "success": True,
+                "faces": faces,
+                "message": f"{identified} of {len(faces)} faces identified"
+            }
+
+        except Exception as e:
+            return {
+                "success": False,
+                "faces": [],
+                "message": f"Error recognizing faces: {str(e)}"
+            }
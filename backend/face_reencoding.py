@@ -0,0 +1,218 @@
+"""
+Background re-encoding of stored faces after an encoding model change.
+Encodings made with different face_recognition models, num_jitters or
+landmark models are not comparable (see face_detection.ENCODING_MODELS).
+When CURRENT_ENCODING_MODEL is newer than the gallery's active model, this
+job re-encodes every registered employee from their stored face_photo_path
+in low-priority worker processes, only while nobody is in front of the
+kiosk. Results are staged in the database, so an interrupted job resumes
+where it stopped. When everyone is converted the gallery switches to the new
+model in a single transaction. Until then the kiosk keeps matching with the
+old model. Swapped rows are flagged face_upload_pending; the frontend uploads
+them to cloud before its next employee sync (getPendingFaceUploads).
+
+Run directly to convert without the kiosk UI:
+    python face_reencoding.py
+"""
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from face_detection import CURRENT_ENCODING_MODEL
+
+
+# Photos handed to the pool between idle checks (per worker)
+REENCODE_CHUNK_PER_WORKER = 2
+
+# How often a busy kiosk is re-checked for idleness
+IDLE_POLL_SECONDS = 2.0
+
+# Passes over the remaining rows (re-registrations during a pass need another one)
+MAX_PASSES = 3
+
+
+def _lower_priority():
+    """Worker initializer: run below the UI and recognition processes."""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _reencode_photo(path, encoding_model):
+    """
+    Encode the single face of a stored registration photo (runs in a worker process).
+
+    Args:
+        path (str): face_photo_path of the employee
+        encoding_model (int): Encoding model version to encode with
+
+    Returns:
+        tuple: (encoding list or None, message)
+    """
+    from face_analysis import FaceAnalysis
+
+    try:
+        analysis = FaceAnalysis(Path(path).read_bytes(), encoding_model=encoding_model)
+        if not analysis.decoded:
+            return None, "Registration photo could not be decoded"
+        if len(analysis.face_locations) != 1:
+            return None, f"{len(analysis.face_locations)} faces in registration photo"
+
+        encoding = analysis.encoding
+        if encoding is None:
+            return None, "Face could not be encoded"
+        return encoding.tolist(), "Re-encoded"
+
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+
+
+class FaceReencodingJob:
+    """Converts the stored gallery to CURRENT_ENCODING_MODEL and swaps it in."""
+
+    def __init__(self, db, workers=None, is_idle=None, progress_callback=None):
+        """
+        Args:
+            db (Database): Kiosk database
+            workers (int, optional): Worker processes (default: half the cores)
+            is_idle (callable, optional): Returns False while the kiosk is in use;
+                no new photos are encoded until it returns True again
+            progress_callback (callable, optional): Called with the status dict after each chunk
+        """
+        self.db = db
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.is_idle = is_idle
+        self.progress_callback = progress_callback
+        self.target_model = CURRENT_ENCODING_MODEL
+        self._stop = threading.Event()
+        self._status_lock = threading.Lock()
+        self._status = {"state": "idle", "target_model": self.target_model,
+                        "total": 0, "done": 0, "failed": 0, "message": ""}
+
+    def is_needed(self):
+        """
+        Whether the gallery is not on CURRENT_ENCODING_MODEL yet, or rows were left
+        behind (e.g. re-registered with the old model while the last run finished).
+        """
+        return (self.db.get_face_encoding_model() != self.target_model
+                or bool(self.db.get_face_reencode_candidates(self.target_model)))
+
+    def stop(self):
+        """Stop after the current chunk; staged results are kept for the next run."""
+        self._stop.set()
+
+    def get_status(self):
+        """Snapshot of the job status."""
+        with self._status_lock:
+            return dict(self._status)
+
+    def _update(self, **changes):
+        with self._status_lock:
+            self._status.update(changes)
+            status = dict(self._status)
+        if self.progress_callback is not None:
+            self.progress_callback(status)
+
+    def _wait_until_idle(self):
+        """Block while the kiosk is busy; False if the job was stopped meanwhile."""
+        paused = False
+        while self.is_idle is not None and not self.is_idle():
+            if not paused:
+                self._update(state="paused")
+                paused = True
+            if self._stop.wait(IDLE_POLL_SECONDS):
+                return False
+        if paused:
+            self._update(state="running")
+        return not self._stop.is_set()
+
+    def run(self):
+        """
+        Re-encode all outdated rows, then swap the gallery to the new model.
+
+        Returns:
+            dict: Final status {state, target_model, total, done, failed, message[, not_converted]}
+        """
+        if not self.is_needed():
+            self._update(state="done", message=f"Gallery already uses encoding model {self.target_model}")
+            return self.get_status()
+
+        self._update(state="running", message=f"Re-encoding faces for encoding model {self.target_model}")
+        chunk_size = self.workers * REENCODE_CHUNK_PER_WORKER
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_lower_priority) as pool:
+            for _ in range(MAX_PASSES):
+                candidates = self.db.get_face_reencode_candidates(self.target_model)
+                if not candidates:
+                    break
+                status = self.get_status()
+                self._update(total=status["done"] + status["failed"] + len(candidates))
+
+                # Rows without a photo (e.g. synced from the cloud) never reach the pool
+                missing = [(employee_id, registered_at, None, "Registration photo not found - re-register the face")
+                           for employee_id, path, registered_at in candidates if not path or not Path(path).is_file()]
+                if missing:
+                    self.db.stage_face_reencodings(self.target_model, missing)
+                    self._update(failed=status["failed"] + len(missing))
+                    candidates = [row for row in candidates if row[1] and Path(row[1]).is_file()]
+
+                for start in range(0, len(candidates), chunk_size):
+                    if not self._wait_until_idle():
+                        self._update(state="stopped", message="Stopped - will resume from the staged results")
+                        return self.get_status()
+
+                    chunk = candidates[start:start + chunk_size]
+                    results = pool.map(_reencode_photo, [path for _, path, _ in chunk],
+                                       [self.target_model] * len(chunk))
+                    entries = [(employee_id, registered_at, encoding, message)
+                               for (employee_id, _, registered_at), (encoding, message) in zip(chunk, results)]
+                    self.db.stage_face_reencodings(self.target_model, entries)
+
+                    failed = sum(encoding is None for _, _, encoding, _ in entries)
+                    status = self.get_status()
+                    self._update(done=status["done"] + len(entries) - failed, failed=status["failed"] + failed)
+
+        swapped, not_converted = self.db.swap_face_encoding_model(self.target_model)
+        message = f"Switched to encoding model {self.target_model} ({swapped} faces re-encoded"
+        message += f", {len(not_converted)} need re-registration)" if not_converted else ")"
+        self._update(state="done", message=message,
+                     not_converted=[{"employee_id": employee_id, "message": reason}
+                                    for employee_id, reason in not_converted])
+        return self.get_status()
+
+
+def main(argv=None):
+    """Run the re-encoding job to completion from the command line."""
+    import argparse
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Re-encode stored faces for the current encoding model")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    def progress(status):
+        print(f"[{status['state']}] {status['done'] + status['failed']}/{status['total']} "
+              f"(failed {status['failed']}) {status['message']}")
+
+    status = FaceReencodingJob(Database(args.db), args.workers, progress_callback=progress).run()
+    for row in status.get("not_converted", []):
+        print(f"employee {row['employee_id']}: {row['message']}")
+    return 0 if status["state"] == "done" else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
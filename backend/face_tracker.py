@@ -0,0 +1,168 @@
+"""
+Short-lived face tracking for the recognition path.
+Remembers the face boxes of recently recognized employees for a few
+seconds. A new detection that overlaps a remembered box (IoU) and looks the
+same (normalized cross-correlation of a small grayscale patch) is a track
+candidate: the recognizer still encodes it, but only confirms the encoding
+against the tracked employee's own row (TRACK_CONFIRM_DISTANCE) instead of
+scanning the gallery. Tracks are re-verified with a full match every few
+hits and whenever the gallery changes, and clear() (scan restart, rejected
+match) drops every track - including ones a scan in flight would add.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+# Tracks expire this long after they were last seen
+TRACK_TTL_SECONDS = 5.0
+
+# Box overlap and appearance similarity needed to reuse a track
+TRACK_MIN_IOU = 0.5
+TRACK_MIN_SIMILARITY = 0.8
+
+# A track is only reused if the fresh encoding is this close to the employee's row
+# (stricter than MATCH_THRESHOLD: the gallery scan that would catch a closer employee is skipped)
+TRACK_CONFIRM_DISTANCE = 0.4
+
+# Full encode + match after this many reuses or seconds since the last one
+REVERIFY_EVERY_HITS = 3
+REVERIFY_SECONDS = 3.0
+
+# Side of the grayscale patch compared between frames
+PATCH_SIZE = 24
+
+# Tracks kept at once (one per face in front of the kiosk)
+MAX_TRACKS = 8
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def face_patch(image, location):
+    """
+    Zero-mean, unit-variance grayscale patch of a face box.
+
+    Args:
+        image (np.ndarray): RGB image the box was detected on
+        location (tuple): (top, right, bottom, left) box
+
+    Returns:
+        np.ndarray: (PATCH_SIZE, PATCH_SIZE) float32 patch
+    """
+    top, right, bottom, left = location
+    height, width = image.shape[:2]
+    rows = np.clip(np.linspace(top, bottom - 1, PATCH_SIZE).astype(np.int64), 0, height - 1)
+    cols = np.clip(np.linspace(left, right - 1, PATCH_SIZE).astype(np.int64), 0, width - 1)
+    patch = image[np.ix_(rows, cols)].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    patch -= patch.mean()
+    return patch / (patch.std() + 1e-6)
+
+
+class _Track:
+    """One remembered face."""
+
+    __slots__ = ("location", "patch", "employee", "distance", "gallery_version",
+                 "last_seen", "verified_at", "hits")
+
+    def __init__(self, location, patch, employee, distance, gallery_version, now):
+        self.location = location
+        self.patch = patch
+        self.employee = employee
+        self.distance = distance
+        self.gallery_version = gallery_version
+        self.last_seen = now
+        self.verified_at = now
+        self.hits = 0
+
+
+class FaceTracker:
+    """Reuses recent identities for faces that have not moved or changed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tracks = []
+        # Bumped by clear(); update() ignores matches started before the last clear
+        self.epoch = 0
+
+    def lookup(self, location, patch, gallery_version):
+        """
+        Find a track that can be reused for a detection.
+
+        Args:
+            location (tuple): Detected box (same scale as the tracked boxes)
+            patch (np.ndarray): face_patch() of the detection
+            gallery_version (int): Current gallery version
+
+        Returns:
+            tuple: (employee dict, distance) candidate to confirm against the fresh
+                   encoding, or None if a full match is needed
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._tracks = [track for track in self._tracks if now - track.last_seen < TRACK_TTL_SECONDS]
+
+            best, best_iou = None, TRACK_MIN_IOU
+            for track in self._tracks:
+                iou = box_iou(track.location, location)
+                if iou >= best_iou:
+                    best, best_iou = track, iou
+
+            if best is None:
+                return None
+
+            similarity = float((best.patch * patch).mean())
+            due = (best.hits >= REVERIFY_EVERY_HITS or now - best.verified_at >= REVERIFY_SECONDS
+                   or best.gallery_version != gallery_version)
+
+            if similarity < TRACK_MIN_SIMILARITY or due:
+                # Different-looking face in the same spot, or time to re-verify
+                self._tracks.remove(best)
+                return None
+
+            best.location, best.patch, best.last_seen = location, patch, now
+            best.hits += 1
+            return best.employee, best.distance
+
+    def update(self, location, patch, employee, distance, gallery_version, epoch=None):
+        """
+        Remember a freshly verified identity.
+
+        Args:
+            location (tuple): Detected box
+            patch (np.ndarray): face_patch() of the detection
+            employee (dict): Matched employee
+            distance (float): Match distance
+            gallery_version (int): Gallery version the match was made against
+            epoch (int, optional): self.epoch when the match started; a clear()
+                since then discards the update
+        """
+        now = time.monotonic()
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._tracks = [track for track in self._tracks
+                            if box_iou(track.location, location) < TRACK_MIN_IOU
+                            and now - track.last_seen < TRACK_TTL_SECONDS]
+            self._tracks.append(_Track(location, patch, employee, distance, gallery_version, now))
+            del self._tracks[:-MAX_TRACKS]
+
+    def clear(self):
+        """Forget every track (and the result of any match still in flight)."""
+        with self._lock:
+            self._tracks = []
+            self.epoch += 1
+
+    def forget(self, location):
+        """Drop the track at a box (its candidate failed confirmation)."""
+        with self._lock:
+            self._tracks = [track for track in self._tracks if box_iou(track.location, location) < TRACK_MIN_IOU]
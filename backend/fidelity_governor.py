@@ -0,0 +1,221 @@
+"""
+Latency-budget governor for face recognition.
+Kiosk hardware ranges from fanless Celerons to desktop i7s, so no single
+detection setting fits all. The governor watches how long recognition of
+a frame takes (every scanned frame, with or without a face) and moves
+between FIDELITY_TIERS (fastest first) to keep the p95 under a target: one
+tier down as soon as the p95 is over it, one tier up when there is plenty of
+headroom. A tier that was just left for being too slow is not retried for
+PROMOTE_COOLDOWN_SECONDS. Below the start tier the governor also steps up
+after REPROMOTE_SECONDS without a change whatever the window says, so a
+degraded tier that misses faces (and sees only cheap frames) is retried.
+
+Only detection settings change between tiers. The landmark model and
+num_jitters are part of the encoding model (face_detection.ENCODING_MODELS):
+changing them would make probes incomparable with the stored gallery.
+
+CNN detection takes seconds per frame on a CPU, so CNN_TIER is only on the
+ladder with FACE_FIDELITY_CNN=true, or with the default "auto" once the
+warm-up finds a CUDA build of dlib with a GPU (see enable_gpu_tier).
+
+FACE_LATENCY_TARGET_MS sets the target; FACE_FIDELITY_GOVERNOR=false keeps
+the fixed FACE_DETECTION_SCALE / FACE_DETECTION_CASCADE settings instead.
+Setting either of those also turns the governor off, unless
+FACE_FIDELITY_GOVERNOR=true asks for it explicitly.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+# Detection settings per tier, fastest first (HOG only - see CNN_TIER)
+FIDELITY_TIERS = (
+    {"name": "minimal", "detection_scale": 2, "upsample": 0, "model": "hog", "cascade": True},
+    {"name": "balanced", "detection_scale": 2, "upsample": 1, "model": "hog", "cascade": True},
+    {"name": "thorough", "detection_scale": 2, "upsample": 1, "model": "hog", "cascade": False},
+    {"name": "high", "detection_scale": 1, "upsample": 1, "model": "hog", "cascade": False},
+    {"name": "extended", "detection_scale": 1, "upsample": 2, "model": "hog", "cascade": False},
+)
+
+# Top tier when a GPU (or FACE_FIDELITY_CNN=true) allows CNN detection
+CNN_TIER = {"name": "maximum", "detection_scale": 2, "upsample": 1, "model": "cnn", "cascade": False}
+
+# Tier used at start-up (the fixed defaults: no Haar cascade, see face_detection)
+DEFAULT_TIER = "thorough"
+
+# p95 recognition latency to hold (frames with a face, end to end)
+DEFAULT_LATENCY_TARGET_MS = 500
+
+# Latencies kept for the p95, and how many a tier needs before it is judged
+GOVERNOR_WINDOW = 40
+MIN_SAMPLES = 20
+
+# Move up a tier only while the p95 is below this share of the target
+PROMOTE_HEADROOM = 0.6
+
+# A tier left for being too slow is not tried again for this long
+PROMOTE_COOLDOWN_SECONDS = 600
+
+# Below the start tier, retry the next tier up after this long without a change
+REPROMOTE_SECONDS = 600
+
+# Tier changes kept for get_status()
+HISTORY_SIZE = 20
+
+
+def fixed_detection_settings():
+    """Whether FACE_DETECTION_SCALE or FACE_DETECTION_CASCADE is set in the environment."""
+    return 'FACE_DETECTION_SCALE' in os.environ or 'FACE_DETECTION_CASCADE' in os.environ
+
+
+def cnn_mode():
+    """FACE_FIDELITY_CNN: "true", "false" or "auto" (default, only with a GPU)."""
+    mode = os.environ.get('FACE_FIDELITY_CNN', 'auto').lower()
+    return mode if mode in ('true', 'false') else 'auto'
+
+
+def gpu_available():
+    """
+    Whether dlib was built with CUDA and sees a GPU (imports dlib).
+
+    Returns:
+        bool: True if CNN detection would run on a GPU
+    """
+    try:
+        import dlib
+        return bool(getattr(dlib, 'DLIB_USE_CUDA', False)) and dlib.cuda.get_num_devices() > 0
+    except Exception:
+        return False
+
+
+class FidelityGovernor:
+    """Picks the detection tier from the measured p95 recognition latency."""
+
+    def __init__(self, target_ms=DEFAULT_LATENCY_TARGET_MS, tiers=FIDELITY_TIERS, start_tier=DEFAULT_TIER):
+        """
+        Args:
+            target_ms (float): p95 latency to hold in milliseconds
+            tiers (tuple): Tier settings, fastest first
+            start_tier (str): Name of the tier to start in
+        """
+        self.target_ms = target_ms
+        self.tiers = tuple(tiers)
+        self._index = next((i for i, tier in enumerate(tiers) if tier["name"] == start_tier), 0)
+        self._start_index = self._index
+        self._changed_at = time.monotonic()
+        self._samples = deque(maxlen=GOVERNOR_WINDOW)
+        self._demoted_at = {}  # tier index -> monotonic time it was left for being too slow
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, fixed_settings=False):
+        """
+        Create a governor unless FACE_FIDELITY_GOVERNOR is "false".
+
+        Args:
+            fixed_settings (bool): Detection settings were set explicitly; the governor
+                then stays off unless FACE_FIDELITY_GOVERNOR is "true"
+
+        Returns:
+            FidelityGovernor or None
+        """
+        setting = os.environ.get('FACE_FIDELITY_GOVERNOR', '').lower()
+        if setting == 'false':
+            return None
+        if fixed_settings:
+            if setting != 'true':
+                sys.stderr.write("🎚️ Fixed detection settings configured - fidelity governor off\n")
+                sys.stderr.flush()
+                return None
+            sys.stderr.write("⚠️ FACE_FIDELITY_GOVERNOR=true overrides FACE_DETECTION_SCALE/FACE_DETECTION_CASCADE\n")
+            sys.stderr.flush()
+        try:
+            target_ms = float(os.environ.get('FACE_LATENCY_TARGET_MS', DEFAULT_LATENCY_TARGET_MS))
+        except ValueError:
+            target_ms = DEFAULT_LATENCY_TARGET_MS
+        tiers = FIDELITY_TIERS + (CNN_TIER,) if cnn_mode() == 'true' else FIDELITY_TIERS
+        return cls(target_ms, tiers)
+
+    def enable_gpu_tier(self):
+        """
+        Add CNN_TIER on top of the ladder if FACE_FIDELITY_CNN is "auto" and a GPU is
+        available. Called from the warm-up, which imports dlib anyway.
+
+        Returns:
+            bool: True if the tier was added
+        """
+        if cnn_mode() != 'auto' or not gpu_available():
+            return False
+        with self._lock:
+            if any(tier["model"] == "cnn" for tier in self.tiers):
+                return False
+            self.tiers = self.tiers + (CNN_TIER,)
+        sys.stderr.write("🎚️ GPU detected - CNN detection tier enabled\n")
+        sys.stderr.flush()
+        return True
+
+    @property
+    def tier(self):
+        """Settings of the current tier."""
+        with self._lock:
+            return self.tiers[self._index]
+
+    def _p95_ms(self):
+        samples = sorted(self._samples)
+        return samples[int(round(0.95 * (len(samples) - 1)))] * 1000.0
+
+    def record(self, seconds):
+        """
+        Add the latency of one recognition and change tier if the window calls for it.
+
+        Args:
+            seconds (float): End-to-end recognition time of a scanned frame
+        """
+        with self._lock:
+            self._samples.append(seconds)
+            if self._index < self._start_index and time.monotonic() - self._changed_at >= REPROMOTE_SECONDS:
+                self._change(self._index + 1, self._p95_ms(), "retry")
+                return
+            if len(self._samples) < MIN_SAMPLES:
+                return
+
+            p95_ms = self._p95_ms()
+            if p95_ms > self.target_ms and self._index > 0:
+                self._demoted_at[self._index] = time.monotonic()
+                self._change(self._index - 1, p95_ms)
+            elif p95_ms < self.target_ms * PROMOTE_HEADROOM and self._index < len(self.tiers) - 1:
+                demoted_at = self._demoted_at.get(self._index + 1)
+                if demoted_at is None or time.monotonic() - demoted_at >= PROMOTE_COOLDOWN_SECONDS:
+                    self._change(self._index + 1, p95_ms)
+
+    def _change(self, index, p95_ms, reason="latency"):
+        """Switch tier (lock held) and start a fresh window."""
+        old, new = self.tiers[self._index]["name"], self.tiers[index]["name"]
+        self._index = index
+        self._changed_at = time.monotonic()
+        self._samples.clear()
+        self._history.append({"at": datetime.now().isoformat(timespec="seconds"), "from": old, "to": new,
+                              "p95_ms": round(p95_ms, 1), "reason": reason})
+        sys.stderr.write(f"🎚️ Recognition fidelity {old} -> {new} ({reason}, p95 {p95_ms:.0f} ms, "
+                         f"target {self.target_ms:.0f} ms)\n")
+        sys.stderr.flush()
+
+    def get_status(self):
+        """
+        Returns:
+            dict: {tier, settings, tiers, target_p95_ms, p95_ms, samples, changes}
+        """
+        with self._lock:
+            return {
+                "tier": self.tiers[self._index]["name"],
+                "settings": dict(self.tiers[self._index]),
+                "tiers": [tier["name"] for tier in self.tiers],
+                "target_p95_ms": self.target_ms,
+                "p95_ms": round(self._p95_ms(), 1) if self._samples else None,
+                "samples": len(self._samples),
+                "changes": list(self._history)
+            }
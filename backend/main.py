@@ -231,6 +231,14 @@ class KioskWindow(QMainWindow):
         self.bridge = KioskBridge(parent=self)
         self.channel.registerObject("kioskBridge", self.bridge)
 
+        # Check for RECOGNITION_PROCESS environment variable
+        if os.environ.get('RECOGNITION_PROCESS', 'false').lower() == 'true':
+            logger.info("🚀 RECOGNITION_PROCESS enabled - Starting recognition worker process")
+            try:
+                self.bridge.start_recognition_service()
+            except Exception as e:
+                logger.error(f"Could not start recognition worker, recognizing in-process: {e}", exc_info=True)
+
     def load_frontend(self):
         """Load the Vue.js frontend from local HTTP server or dev server."""
         logger.info("load_frontend() starting")
@@ -346,6 +354,13 @@ class KioskWindow(QMainWindow):
             "Timekeeper Payroll v2.0\nDesktop Application\n\nBuilt with PyQt6 and Vue.js"
         )
 
+    def closeEvent(self, event):
+        """Stop the recognition worker process, the re-encoding job and call recording before the window closes."""
+        self.bridge.stop_recognition_service()
+        self.bridge.stop_face_reencoding()
+        self.bridge.stop_recording()
+        super().closeEvent(event)
+
     def keyPressEvent(self, event):
         """Handle key press events. ESC key exits fullscreen for development."""
         from PyQt6.QtCore import Qt
@@ -387,6 +402,11 @@ def main():
         window.show()
         logger.info("Window shown successfully")
 
+        # Load face models and the gallery in the background so the first scan is fast
+        window.bridge.start_warmup()
+        # Convert stored faces if the encoding model changed (idle-time, resumable)
+        window.bridge.start_face_reencoding()
+
         logger.info("Entering Qt event loop")
         sys.exit(app.exec())
     except Exception as e:
@@ -395,4 +415,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Required for the spawned recognition worker in PyInstaller builds
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
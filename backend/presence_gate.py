@@ -0,0 +1,135 @@
+"""
+Presence gate and adaptive scan cadence for face scanning.
+Decodes each frame at 1/8 scale (JPEG DCT scaling), shrinks it to a tiny
+grayscale thumbnail and compares it with the previous one. A static scene
+is answered immediately with "no change" instead of running the dlib
+pipeline, and the frontend is told how long to wait before the next scan:
+slow while idle, fast while someone is in front of the kiosk. A scan restart
+(reset) and a face that was seen but not matched (request_rescan) make the
+next frame scan regardless of motion, so someone standing still is retried.
+"""
+import io
+import threading
+import time
+
+import numpy as np
+
+
+# Thumbnail compared between frames
+THUMBNAIL_SIZE = (64, 48)
+
+# Mean absolute grayscale difference (0-255) that counts as motion
+MOTION_THRESHOLD = 6.0
+
+# Fraction of skin-coloured thumbnail pixels that counts as someone present
+SKIN_PRESENCE_FRACTION = 0.08
+
+# Recommended delays before the next scan
+IDLE_SCAN_MS = 3000
+ACTIVE_SCAN_MS = 1000
+
+# Stay on the fast cadence this long after the last motion
+ACTIVE_HOLD_SECONDS = 10
+
+# Someone standing still (skin prior) is re-scanned this often
+PRESENT_RESCAN_SECONDS = 5
+
+# Run the full pipeline at least this often even if the scene looks static
+MAX_SKIP_SECONDS = 30
+
+
+def _thumbnail(photo_bytes):
+    """
+    Decode a tiny RGB thumbnail of an encoded photo.
+
+    Returns:
+        np.ndarray: (h, w, 3) float32 thumbnail
+    """
+    from PIL import Image
+
+    pil_image = Image.open(io.BytesIO(photo_bytes))
+    width, height = pil_image.size
+    pil_image.draft("RGB", (max(1, width // 8), max(1, height // 8)))
+    pil_image = pil_image.convert("RGB").resize(THUMBNAIL_SIZE, Image.BILINEAR)
+    return np.asarray(pil_image, dtype=np.float32)
+
+
+def _skin_fraction(thumbnail):
+    """Fraction of pixels inside the usual YCbCr skin range (Cb 77-127, Cr 133-173)."""
+    r, g, b = thumbnail[..., 0], thumbnail[..., 1], thumbnail[..., 2]
+    cb = 128.0 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 128.0 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    skin = (cb >= 77) & (cb <= 127) & (cr >= 133) & (cr <= 173)
+    return float(skin.mean())
+
+
+class PresenceGate:
+    """Decides whether a frame is worth running face recognition on."""
+
+    def __init__(self, use_skin_prior=True):
+        """
+        Args:
+            use_skin_prior (bool): Re-scan a static scene with enough skin-coloured
+                pixels every PRESENT_RESCAN_SECONDS (someone standing still)
+        """
+        self.use_skin_prior = use_skin_prior
+        self._lock = threading.Lock()
+        self._previous = None
+        self._last_motion = 0.0
+        self._last_scan = 0.0
+        self._rescan = False
+
+    def reset(self):
+        """Forget the previous frame so the next one is scanned (scanning restarts)."""
+        with self._lock:
+            self._previous = None
+            self._rescan = True
+
+    def request_rescan(self):
+        """Scan the next frame even if nothing moved (a face was seen but not matched)."""
+        with self._lock:
+            self._rescan = True
+
+    def is_active(self):
+        """Whether there was motion in front of the kiosk within ACTIVE_HOLD_SECONDS."""
+        with self._lock:
+            return time.monotonic() - self._last_motion < ACTIVE_HOLD_SECONDS
+
+    def check(self, photo_bytes):
+        """
+        Compare a frame with the previous one.
+
+        Args:
+            photo_bytes (bytes): Encoded camera frame
+
+        Returns:
+            dict: {scan: bool, motion: float, present: bool, next_scan_ms: int}
+        """
+        thumbnail = _thumbnail(photo_bytes)
+        gray = thumbnail @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        present = self.use_skin_prior and _skin_fraction(thumbnail) >= SKIN_PRESENCE_FRACTION
+        now = time.monotonic()
+
+        with self._lock:
+            previous, self._previous = self._previous, gray
+            motion = float(np.abs(gray - previous).mean()) if previous is not None else float("inf")
+
+            moving = motion >= MOTION_THRESHOLD
+            if moving:
+                self._last_motion = now
+
+            since_scan = now - self._last_scan
+            scan = (self._rescan or moving or (present and since_scan >= PRESENT_RESCAN_SECONDS)
+                    or since_scan >= MAX_SKIP_SECONDS)
+            if scan:
+                self._last_scan = now
+                self._rescan = False
+
+            active = now - self._last_motion < ACTIVE_HOLD_SECONDS
+
+        return {
+            "scan": scan,
+            "motion": round(motion, 2) if previous is not None else None,
+            "present": bool(present),
+            "next_scan_ms": ACTIVE_SCAN_MS if active else IDLE_SCAN_MS
+        }
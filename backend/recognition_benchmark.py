@@ -0,0 +1,407 @@
+"""
+Offline face recognition benchmark.
+Drives the same code path as KioskBridge.recognizeFace (decode_photo_base64 +
+FaceRecognizer over a FaceGalleryCache) without Qt, against throwaway
+databases holding 100 to 100k synthetic employees plus, optionally, people
+enrolled from a directory of real photos. Reports per-stage latency
+percentiles, throughput and memory as JSON so releases can be compared.
+
+Usage:
+    python recognition_benchmark.py --sizes 100 1000 10000 100000 --output bench.json
+    python recognition_benchmark.py --images probes/ --output bench.json
+
+With --images, each sub-directory is one person: the first photo is enrolled
+and the remaining photos are used as probes. Loose photos in the top-level
+directory are probed without enrollment (latency only).
+"""
+import base64
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from database import Database, face_encoding_to_blob, FACE_ENCODING_FORMAT
+from face_gallery_cache import FaceGalleryCache
+from face_recognizer import FaceRecognizer, decode_photo_base64
+from recognition_metrics import RecognitionMetrics, StageTimer
+
+
+BENCHMARK_FORMAT = 1
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# Synthetic encodings roughly follow the spread of real dlib encodings
+SYNTHETIC_STD = 0.1
+PROBE_NOISE = 0.03
+
+# Faces per synthetic frame in the multi-face (recognizeFaces) comparison
+DEFAULT_FACES_PER_FRAME = 4
+
+# Probes traced with tracemalloc for the per-stage memory figures (tracing
+# slows everything down, so it runs as a separate pass)
+MEMORY_PROBES = 20
+
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+class _MemoryStageTimer(StageTimer):
+    """StageTimer that records the tracemalloc peak of each stage instead of its duration."""
+
+    __slots__ = ("peaks",)
+
+    def __init__(self, peaks):
+        super().__init__(None, "memory")
+        self.peaks = peaks
+        tracemalloc.reset_peak()
+
+    def lap(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peaks[stage] = max(self.peaks.get(stage, 0), peak - current)
+        tracemalloc.reset_peak()
+
+    def merge(self, stages):
+        pass
+
+
+def _load_image_set(images_dir):
+    """
+    Split a photo directory into enrollment and probe photos.
+
+    Returns:
+        tuple: (enroll: [(name, bytes)], probes: [(expected name or None, bytes)])
+    """
+    enroll, probes = [], []
+    images_dir = Path(images_dir)
+
+    for person_dir in sorted(path for path in images_dir.iterdir() if path.is_dir()):
+        photos = sorted(path for path in person_dir.iterdir() if path.suffix.lower() in _IMAGE_SUFFIXES)
+        if photos:
+            enroll.append((person_dir.name, photos[0].read_bytes()))
+            probes.extend((person_dir.name, path.read_bytes()) for path in photos[1:])
+
+    for path in sorted(images_dir.iterdir()):
+        if path.is_file() and path.suffix.lower() in _IMAGE_SUFFIXES:
+            probes.append((None, path.read_bytes()))
+
+    return enroll, probes
+
+
+def _encode_enrollment(enroll):
+    """Encode enrollment photos with the recognition pipeline; skips photos without exactly one face."""
+    from face_detection import decode_image, encoding_params
+    import face_recognition
+
+    encoded = []
+    for name, photo_bytes in enroll:
+        image, _ = decode_image(photo_bytes)
+        encodings = face_recognition.face_encodings(image, **encoding_params())
+        if len(encodings) == 1:
+            encoded.append((name, encodings[0]))
+        else:
+            print(f"⚠️ Skipping enrollment photo for {name}: {len(encodings)} faces")
+    return encoded
+
+
+def build_benchmark_database(db_path, size, rng, enrolled=()):
+    """
+    Create a database with size synthetic employees plus enrolled real faces.
+
+    Args:
+        db_path (str): Path of the (new) database file
+        size (int): Number of synthetic employees
+        rng (np.random.Generator): Source of synthetic encodings
+        enrolled (list): [(name, encoding)] of real people to register as well
+
+    Returns:
+        tuple: (Database, synthetic encodings ndarray)
+    """
+    db = Database(db_path)
+    synthetic = rng.normal(0.0, SYNTHETIC_STD, (size, 128))
+    now = datetime.now().isoformat()
+
+    rows = [(f"Synthetic {i}", i + 1, face_encoding_to_blob(encoding), now)
+            for i, encoding in enumerate(synthetic)]
+    rows += [(name, size + i + 1, face_encoding_to_blob(encoding), now)
+             for i, (name, encoding) in enumerate(enrolled)]
+
+    conn = db.get_connection()
+    conn.executemany(f"""
+        INSERT INTO employee (name, employee_number, has_face_registration,
+                              face_encoding_blob, face_encoding_format, face_registered_at)
+        VALUES (?, ?, 1, ?, {FACE_ENCODING_FORMAT}, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+    return db, synthetic
+
+
+def _measure_load(db, use_index):
+    """Time a cold load from SQLite (with tracemalloc peak) and a warm start from the snapshot."""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    cache = FaceGalleryCache(db, use_index=use_index)
+    cache.refresh()
+    cold_seconds = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    warm_cache = FaceGalleryCache(db, use_index=use_index)
+    warm_cache.refresh()
+    warm_seconds = time.perf_counter() - start_time
+
+    gallery = cache.gallery
+    gallery_bytes = (gallery.encodings.nbytes + gallery.exact_encodings.nbytes
+                     + gallery.sq_norms.nbytes + gallery.ids.nbytes)
+    index = cache.index
+
+    return cache, {
+        "cold_seconds": round(cold_seconds, 4),
+        "warm_start_seconds": round(warm_seconds, 4),
+        "cold_peak_mb": round(peak / 2 ** 20, 2),
+        "gallery_mb": round(gallery_bytes / 2 ** 20, 2),
+        "index_partitions": len(index.lists) if index is not None and not index.is_exact else 0
+    }
+
+
+def _run_synthetic(cache, synthetic, probes, rng):
+    """Match noisy copies of gallery rows (the gallery and matching stages of recognizeFace)."""
+    metrics = RecognitionMetrics(window_size=max(1, probes))
+    picks = rng.integers(0, len(synthetic), probes)
+    queries = synthetic[picks] + rng.normal(0.0, PROBE_NOISE, (probes, 128))
+    expected = [f"Synthetic {i}" for i in picks]
+
+    def run_one(query, timer):
+        len(cache)
+        timer.lap("gallery")
+        employee, _ = cache.match(query)
+        timer.lap("matching")
+        return employee
+
+    correct = 0
+    start_time = time.perf_counter()
+    for query, name in zip(queries, expected):
+        timer = metrics.start("synthetic")
+        employee = run_one(query, timer)
+        timer.finish()
+        correct += employee is not None and employee["name"] == name
+    wall = time.perf_counter() - start_time
+
+    peaks = {}
+    tracemalloc.start()
+    for query in queries[:MEMORY_PROBES]:
+        run_one(query, _MemoryStageTimer(peaks))
+    tracemalloc.stop()
+
+    return {
+        "probes": probes,
+        "throughput_per_second": round(probes / wall, 2) if wall > 0 else None,
+        "top1_accuracy": round(correct / probes, 4) if probes else None,
+        "stages": metrics.snapshot().get("synthetic", {}),
+        "memory_peak_kb": {stage: round(peak / 1024, 1) for stage, peak in peaks.items()}
+    }
+
+
+def _run_multi_synthetic(cache, synthetic, frames, faces_per_frame, rng):
+    """
+    Compare people identified per minute when a frame holds several faces:
+    one match() per face (recognizeFace) vs one batched match_many() per frame (recognizeFaces).
+    """
+    picks = rng.integers(0, len(synthetic), (frames, faces_per_frame))
+    queries = synthetic[picks] + rng.normal(0.0, PROBE_NOISE, (frames, faces_per_frame, 128))
+
+    start_time = time.perf_counter()
+    single = sum(cache.match(query)[0] is not None for frame in queries for query in frame)
+    single_wall = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    multi = sum(employee is not None for frame in queries for employee, _ in cache.match_many(frame))
+    multi_wall = time.perf_counter() - start_time
+
+    return {
+        "frames": frames,
+        "faces_per_frame": faces_per_frame,
+        "single_people_per_minute": round(single * 60.0 / single_wall, 1) if single_wall > 0 else None,
+        "multi_people_per_minute": round(multi * 60.0 / multi_wall, 1) if multi_wall > 0 else None,
+        "speedup": round(single_wall / multi_wall, 2) if multi_wall > 0 else None
+    }
+
+
+def _run_images(recognizer, probes):
+    """Run real photos through base64 decode + FaceRecognizer.recognize (the recognizeFace path)."""
+    metrics = RecognitionMetrics(window_size=max(1, len(probes)))
+    payloads = [(name, "data:image/jpeg;base64," + base64.b64encode(photo_bytes).decode("ascii"))
+                for name, photo_bytes in probes]
+
+    def run_one(photo_base64, timer):
+        photo_bytes = decode_photo_base64(photo_base64)
+        timer.lap("base64_decode")
+        return recognizer.recognize(photo_bytes, timer)
+
+    correct = labelled = matched = 0
+    start_time = time.perf_counter()
+    for name, photo_base64 in payloads:
+        timer = metrics.start("images")
+        result = run_one(photo_base64, timer)
+        timer.finish()
+
+        employee = result.get("employee")
+        matched += employee is not None
+        if name is not None:
+            labelled += 1
+            correct += employee is not None and employee["name"] == name
+    wall = time.perf_counter() - start_time
+
+    peaks = {}
+    tracemalloc.start()
+    for _, photo_base64 in payloads[:MEMORY_PROBES]:
+        run_one(photo_base64, _MemoryStageTimer(peaks))
+    tracemalloc.stop()
+
+    return {
+        "probes": len(payloads),
+        "throughput_per_second": round(len(payloads) / wall, 2) if wall > 0 else None,
+        "match_rate": round(matched / len(payloads), 4) if payloads else None,
+        "top1_accuracy": round(correct / labelled, 4) if labelled else None,
+        "stages": metrics.snapshot().get("images", {}),
+        "memory_peak_kb": {stage: round(peak / 1024, 1) for stage, peak in peaks.items()}
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, probes=1000, images_dir=None, use_index=False,
+                  detection_scale=None, seed=0, faces_per_frame=DEFAULT_FACES_PER_FRAME):
+    """
+    Benchmark every gallery size.
+
+    Args:
+        sizes (list): Synthetic gallery sizes
+        probes (int): Synthetic probes per size
+        images_dir (str, optional): Directory of real photos (see module docstring)
+        use_index (bool): Let FaceGalleryCache build the ANN index for large galleries
+            (off by default, like the kiosk)
+        detection_scale (int, optional): FaceRecognizer detection scale
+        seed (int): Random seed for synthetic encodings and probes
+        faces_per_frame (int): Faces per synthetic frame for the multi-face comparison (0 = skip)
+
+    Returns:
+        dict: JSON-serialisable benchmark report
+    """
+    enrolled, image_probes = [], []
+    if images_dir:
+        enroll, image_probes = _load_image_set(images_dir)
+        enrolled = _encode_enrollment(enroll)
+
+    results = []
+    for size in sizes:
+        rng = np.random.default_rng(seed)
+        work_dir = Path(tempfile.mkdtemp(prefix="kiosk-bench-"))
+        try:
+            start_time = time.perf_counter()
+            db, synthetic = build_benchmark_database(str(work_dir / "kiosk.db"), size, rng, enrolled)
+            build_seconds = time.perf_counter() - start_time
+
+            cache, load = _measure_load(db, use_index)
+            entry = {
+                "gallery_size": size + len(enrolled),
+                "build_seconds": round(build_seconds, 2),
+                "load": load,
+                "synthetic": _run_synthetic(cache, synthetic, probes, rng) if probes else None,
+                "multi": (_run_multi_synthetic(cache, synthetic, max(1, probes // faces_per_frame),
+                                               faces_per_frame, rng)
+                          if probes and faces_per_frame else None),
+                "images": None
+            }
+
+            if image_probes:
+                # A fixed --detection-scale is benchmarked as is, without tier changes
+                recognizer = FaceRecognizer(db, cache, detection_scale=detection_scale,
+                                            use_governor=False if detection_scale is not None else None)
+                entry["images"] = _run_images(recognizer, image_probes)
+
+            results.append(entry)
+            print(_format_entry(entry))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "format": BENCHMARK_FORMAT,
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": np.__version__
+        },
+        "config": {
+            "sizes": list(sizes),
+            "probes": probes,
+            "images_dir": str(images_dir) if images_dir else None,
+            "enrolled": len(enrolled),
+            "image_probes": len(image_probes),
+            "use_index": use_index,
+            "detection_scale": detection_scale,
+            "seed": seed,
+            "faces_per_frame": faces_per_frame
+        },
+        "results": results
+    }
+
+
+def _format_entry(entry):
+    """One human-readable summary line per gallery size."""
+    load = entry["load"]
+    line = (f"gallery={entry['gallery_size']:>7}  cold={load['cold_seconds']:.3f}s  "
+            f"warm={load['warm_start_seconds']:.3f}s  gallery={load['gallery_mb']:.1f}MB")
+
+    for kind in ("synthetic", "images"):
+        run = entry[kind]
+        if run and "total" in run["stages"]:
+            total = run["stages"]["total"]
+            line += (f"  {kind}: p50={total['p50_ms']:.2f} p95={total['p95_ms']:.2f} "
+                     f"p99={total['p99_ms']:.2f} ms, {run['throughput_per_second']}/s")
+
+    multi = entry.get("multi")
+    if multi:
+        line += (f"  multi x{multi['faces_per_frame']}: {multi['single_people_per_minute']:.0f} -> "
+                 f"{multi['multi_people_per_minute']:.0f} people/min")
+    return line
+
+
+def main(argv=None):
+    """Run the benchmark and write the JSON report."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the kiosk face recognition path without Qt")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--probes", type=int, default=1000, help="Synthetic probes per gallery size")
+    parser.add_argument("--images", help="Directory of real photos (one sub-directory per person)")
+    parser.add_argument("--index", action="store_true", help="Enable the ANN index (FACE_GALLERY_INDEX)")
+    parser.add_argument("--detection-scale", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--faces-per-frame", type=int, default=DEFAULT_FACES_PER_FRAME,
+                        help="Faces per frame for the multi-face throughput comparison (0 = skip)")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.probes, args.images, args.index,
+                           args.detection_scale, args.seed, args.faces_per_frame)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
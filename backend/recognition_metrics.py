@@ -0,0 +1,141 @@
+"""
+Per-stage timing for face recognition, quality check and registration.
+Each call collects perf_counter laps in a StageTimer and hands them over
+in one locked append when it finishes, so instrumentation costs well under
+a microsecond per stage and can stay on in production. Samples are kept in
+fixed-size rolling windows; percentiles are only computed when asked for.
+"""
+import threading
+import time
+from collections import deque
+
+
+# Samples kept per (operation, stage) for the rolling percentiles
+WINDOW_SIZE = 1024
+
+# How often the bridge writes a summary line to timekeeper_debug.log
+SUMMARY_INTERVAL_SECONDS = 300
+
+
+class StageTimer:
+    """Sequential lap timer for one call; each lap closes the previous stage."""
+
+    __slots__ = ("metrics", "operation", "stages", "_start", "_last")
+
+    def __init__(self, metrics, operation):
+        """
+        Args:
+            metrics (RecognitionMetrics or None): Where finish() records; None just collects
+            operation (str): "recognition", "quality" or "registration"
+        """
+        self.metrics = metrics
+        self.operation = operation
+        self.stages = []
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or start) as stage."""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def merge(self, stages):
+        """
+        Add stages timed elsewhere (e.g. in the recognition worker process).
+        Time since the previous lap not covered by them is recorded as "ipc".
+        """
+        now = time.perf_counter()
+        remote = sum(seconds for _, seconds in stages)
+        self.stages.extend(stages)
+        self.stages.append(("ipc", max(0.0, now - self._last - remote)))
+        self._last = now
+
+    def finish(self):
+        """
+        Add the total and record every stage.
+
+        Returns:
+            list: [(stage, seconds), ...] including "total"
+        """
+        self.stages.append(("total", time.perf_counter() - self._start))
+        if self.metrics is not None:
+            self.metrics.record(self.operation, self.stages)
+        return self.stages
+
+
+def _percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class RecognitionMetrics:
+    """Rolling per-stage latency histograms."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._samples = {}   # (operation, stage) -> deque of seconds
+        self._counts = {}    # (operation, stage) -> lifetime count
+        self._started_at = time.time()
+
+    def start(self, operation):
+        """Start timing one call of operation."""
+        return StageTimer(self, operation)
+
+    def record(self, operation, stages):
+        """Record a finished call's [(stage, seconds), ...]."""
+        with self._lock:
+            for stage, seconds in stages:
+                key = (operation, stage)
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = deque(maxlen=self.window_size)
+                    self._counts[key] = 0
+                samples.append(seconds)
+                self._counts[key] += 1
+
+    def snapshot(self):
+        """
+        Percentiles over the rolling window.
+
+        Returns:
+            dict: {operation: {stage: {count, window, p50_ms, p95_ms, p99_ms, max_ms}}}
+        """
+        with self._lock:
+            copies = {key: (list(samples), self._counts[key]) for key, samples in self._samples.items()}
+
+        result = {}
+        for (operation, stage), (samples, count) in copies.items():
+            samples.sort()
+            result.setdefault(operation, {})[stage] = {
+                "count": count,
+                "window": len(samples),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000.0, 2),
+                "p95_ms": round(_percentile(samples, 0.95) * 1000.0, 2),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000.0, 2),
+                "max_ms": round(samples[-1] * 1000.0, 2)
+            }
+        return result
+
+    def total_count(self):
+        """Number of finished calls across all operations."""
+        with self._lock:
+            return sum(count for (_, stage), count in self._counts.items() if stage == "total")
+
+    def format_summary(self):
+        """One log line per operation: stage p50/p95/p99 in milliseconds."""
+        lines = []
+        for operation, stages in sorted(self.snapshot().items()):
+            parts = [f"{stage} {s['p50_ms']:.1f}/{s['p95_ms']:.1f}/{s['p99_ms']:.1f}"
+                     for stage, s in stages.items() if stage != "total"]
+            total = stages.get("total")
+            if total is not None:
+                parts.append(f"total {total['p50_ms']:.1f}/{total['p95_ms']:.1f}/{total['p99_ms']:.1f} "
+                             f"(n={total['count']})")
+            lines.append(f"📊 {operation} p50/p95/p99 ms: " + ", ".join(parts))
+        return "\n".join(lines)
+
+
+# Process-wide metrics shared by the bridge and the face pipeline
+METRICS = RecognitionMetrics()
@@ -0,0 +1,391 @@
+"""
+Out-of-process face recognition service for the Kiosk application.
+Runs detection, encoding and gallery matching in a dedicated worker process
+so dlib never competes with the Qt GUI thread for the GIL. Frames are passed
+through a shared-memory ring buffer; the queues only carry slot numbers.
+The supervisor restarts the worker if it crashes and keeps frames/s and
+matches/s counters for the kiosk diagnostics.
+"""
+import multiprocessing
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from queue import Empty
+
+
+# Ring geometry - a 1080p JPEG from the kiosk camera is well below 2 MB
+RING_SLOTS = 4
+SLOT_SIZE = 2 * 1024 * 1024
+
+# Window for the frames/s and matches/s counters
+STATS_WINDOW_SECONDS = 60
+
+# Crash-restart policy
+RESTART_BACKOFF_SECONDS = (1, 2, 5, 10, 30)
+STABLE_RUN_SECONDS = 60
+
+# How long the supervisor waits for the worker to exit on stop()
+SHUTDOWN_TIMEOUT_SECONDS = 5
+
+
+class FrameRing:
+    """Fixed number of fixed-size frame slots in one shared-memory block."""
+
+    def __init__(self, slots=RING_SLOTS, slot_size=SLOT_SIZE, name=None):
+        """
+        Args:
+            slots (int): Number of frames that can be in flight at once
+            slot_size (int): Maximum encoded frame size in bytes
+            name (str, optional): Attach to an existing block instead of creating one
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._free = list(range(slots)) if self.owner else []
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self):
+        """Reserve a free slot, or None if every slot is in flight."""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, slot):
+        """Return a slot to the free list."""
+        with self._lock:
+            if slot not in self._free:
+                self._free.append(slot)
+
+    def write(self, slot, data):
+        """
+        Copy a frame into a slot.
+
+        Returns:
+            int: Number of bytes written
+        """
+        if len(data) > self.slot_size:
+            raise ValueError(f"Frame of {len(data)} bytes exceeds slot size {self.slot_size}")
+        offset = slot * self.slot_size
+        self.shm.buf[offset:offset + len(data)] = data
+        return len(data)
+
+    def read(self, slot, length):
+        """Copy a frame out of a slot."""
+        offset = slot * self.slot_size
+        return bytes(self.shm.buf[offset:offset + length])
+
+    def close(self):
+        """Detach from (and, for the owner, free) the shared-memory block."""
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except (OSError, FileNotFoundError):
+            pass
+
+
+def _worker_main(db_path, ring_name, slots, slot_size, request_queue, result_queue):
+    """
+    Recognition worker process entry point.
+    Receives (request_id, slot, length), replies (request_id, result dict, stage timings).
+    A "reset_tracking" request forgets tracked identities; None shuts the worker down.
+    """
+    from database import Database
+    from face_gallery_cache import FaceGalleryCache
+    from face_recognizer import FaceRecognizer
+    from recognition_metrics import StageTimer
+
+    ring = FrameRing(slots, slot_size, name=ring_name)
+    db = Database(db_path)
+    recognizer = FaceRecognizer(db, FaceGalleryCache(db))
+    recognizer.start_warmup()
+
+    try:
+        while True:
+            request = request_queue.get()
+            if request is None:
+                break
+            if request == "reset_tracking":
+                recognizer.reset_tracking()
+                continue
+
+            request_id, slot, length = request
+            timer = StageTimer(None, "recognition")
+            try:
+                result = recognizer.recognize(ring.read(slot, length), timer)
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "employee": None,
+                    "message": f"Error recognizing face: {str(e)}"
+                }
+            result_queue.put((request_id, result, timer.stages))
+    finally:
+        ring.close()
+
+
+class _PendingRequest:
+    """A frame waiting for the worker's answer."""
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.event = threading.Event()
+        self.result = None
+        self.stages = []
+
+
+class RecognitionService:
+    """Supervises the recognition worker process and routes frames to it."""
+
+    def __init__(self, db_path, slots=RING_SLOTS, slot_size=SLOT_SIZE):
+        """
+        Args:
+            db_path (str): Path to kiosk.db (the worker opens its own connection)
+            slots (int): Frames that can be in flight at once
+            slot_size (int): Maximum encoded frame size in bytes
+        """
+        self.db_path = db_path
+        self.slots = slots
+        self.slot_size = slot_size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ring = None
+        self._process = None
+        self._request_queue = None
+        self._result_queue = None
+        self._monitor_thread = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next_request_id = 0
+        self._stopping = threading.Event()
+        self._started_at = None
+        self.restarts = 0
+        self._consecutive_crashes = 0
+        self._frames = deque()
+        self._matches = deque()
+        # Why frames were handed back for in-process recognition: reason -> count
+        self.fallbacks = {}
+        self._local = threading.local()
+
+    @property
+    def is_running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """Allocate the frame ring and launch the worker and its supervisor thread."""
+        if self._monitor_thread is not None:
+            return
+
+        self._stopping.clear()
+        self._ring = FrameRing(self.slots, self.slot_size)
+        self._spawn_worker()
+        self._monitor_thread = threading.Thread(target=self._monitor, name="RecognitionSupervisor", daemon=True)
+        self._monitor_thread.start()
+
+    def stop(self):
+        """Shut the worker down and release the frame ring."""
+        if self._monitor_thread is None:
+            return
+
+        self._stopping.set()
+        try:
+            self._request_queue.put(None)
+        except Exception:
+            pass
+
+        self._process.join(SHUTDOWN_TIMEOUT_SECONDS)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+        self._monitor_thread.join(SHUTDOWN_TIMEOUT_SECONDS)
+        self._monitor_thread = None
+        self._fail_pending()
+        self._ring.close()
+        self._ring = None
+
+    def _spawn_worker(self):
+        """Start a worker with fresh queues (a crashed worker may leave them broken)."""
+        self._request_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.db_path, self._ring.name, self.slots, self.slot_size,
+                  self._request_queue, self._result_queue),
+            name="RecognitionWorker",
+            daemon=True
+        )
+        self._process.start()
+        self._started_at = time.monotonic()
+
+        sys.stderr.write(f"🚀 Recognition worker started (pid {self._process.pid})\n")
+        sys.stderr.flush()
+
+    def _monitor(self):
+        """Deliver results and restart the worker when it dies."""
+        while not self._stopping.is_set():
+            try:
+                request_id, result, stages = self._result_queue.get(timeout=0.5)
+            except Empty:
+                if not self._process.is_alive() and not self._stopping.is_set():
+                    self._restart_worker()
+                continue
+            except (EOFError, OSError):
+                if not self._stopping.is_set():
+                    self._restart_worker()
+                continue
+
+            self._deliver(request_id, result, stages)
+
+    def _restart_worker(self):
+        """Fail in-flight frames and relaunch the worker after a backoff."""
+        exit_code = self._process.exitcode
+        self._fail_pending()
+
+        if time.monotonic() - self._started_at >= STABLE_RUN_SECONDS:
+            self._consecutive_crashes = 0
+        backoff = RESTART_BACKOFF_SECONDS[min(self._consecutive_crashes, len(RESTART_BACKOFF_SECONDS) - 1)]
+        self._consecutive_crashes += 1
+
+        sys.stderr.write(f"❌ Recognition worker exited (code {exit_code}), restarting in {backoff}s\n")
+        sys.stderr.flush()
+
+        if self._stopping.wait(backoff):
+            return
+
+        self.restarts += 1
+        self._spawn_worker()
+
+    def _deliver(self, request_id, result, stages):
+        """Hand a worker result to the waiting caller and update the counters."""
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+            self._frames.append(now)
+            if result.get("employee"):
+                self._matches.append(now)
+
+        if pending is not None:
+            self._ring.release(pending.slot)
+            pending.result = result
+            pending.stages = stages
+            pending.event.set()
+
+    def _fail_pending(self):
+        """Wake every waiting caller without a result (they fall back in-process)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for request in pending.values():
+            if self._ring is not None:
+                self._ring.release(request.slot)
+            request.event.set()
+
+    def reset_tracking(self):
+        """Make the worker forget tracked identities (after the frames already queued)."""
+        if not self.is_running:
+            return
+        try:
+            self._request_queue.put("reset_tracking")
+        except Exception:
+            pass
+
+    @property
+    def last_fallback_reason(self):
+        """Why the last recognize() call on this thread returned None (None if it did not)."""
+        return getattr(self._local, "fallback_reason", None)
+
+    def _fallback(self, reason):
+        """Count a frame the caller has to recognize in-process; returns None for recognize()."""
+        self._local.fallback_reason = reason
+        with self._lock:
+            self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+        return None
+
+    def recognize(self, photo_bytes, timeout=30, timer=None):
+        """
+        Recognize a frame in the worker process.
+
+        Args:
+            photo_bytes (bytes): Encoded image
+            timeout (float): Seconds to wait for the worker
+            timer (StageTimer, optional): Receives the worker's stage timings plus "ipc"
+
+        Returns:
+            dict: Same result dict as FaceRecognizer.recognize(), or None if the
+                  service is unavailable and the caller should run in-process;
+                  last_fallback_reason then says why (not_running, frame_too_large,
+                  ring_full, queue_error, timeout, worker_crashed)
+        """
+        self._local.fallback_reason = None
+        if not self.is_running:
+            return self._fallback("not_running")
+        if len(photo_bytes) > self.slot_size:
+            return self._fallback("frame_too_large")
+
+        slot = self._ring.acquire()
+        if slot is None:
+            return self._fallback("ring_full")
+
+        self._ring.write(slot, photo_bytes)
+        request = _PendingRequest(slot)
+
+        with self._lock:
+            self._next_request_id += 1
+            request_id = self._next_request_id
+            self._pending[request_id] = request
+
+        try:
+            self._request_queue.put((request_id, slot, len(photo_bytes)))
+        except Exception:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._ring.release(slot)
+            return self._fallback("queue_error")
+
+        if not request.event.wait(timeout):
+            # Keep the slot reserved until the worker answers (or is restarted)
+            return self._fallback("timeout")
+
+        if request.result is None:
+            # Woken by _fail_pending() - the worker crashed or is being stopped
+            return self._fallback("worker_crashed")
+
+        if timer is not None:
+            timer.merge(request.stages)
+
+        return request.result
+
+    def get_stats(self):
+        """
+        Throughput and health counters over the last STATS_WINDOW_SECONDS.
+
+        Returns:
+            dict: running, pid, restarts, in_flight, frames_per_second, matches_per_second
+                  and fallbacks (lifetime in-process fallbacks by reason)
+        """
+        cutoff = time.monotonic() - STATS_WINDOW_SECONDS
+        with self._lock:
+            for samples in (self._frames, self._matches):
+                while samples and samples[0] < cutoff:
+                    samples.popleft()
+            frames, matches, in_flight = len(self._frames), len(self._matches), len(self._pending)
+            fallbacks = dict(self.fallbacks)
+
+        return {
+            "running": self.is_running,
+            "pid": self._process.pid if self._process is not None else None,
+            "restarts": self.restarts,
+            "in_flight": in_flight,
+            "frames_per_second": round(frames / STATS_WINDOW_SECONDS, 3),
+            "matches_per_second": round(matches / STATS_WINDOW_SECONDS, 3),
+            "fallbacks": fallbacks
+        }
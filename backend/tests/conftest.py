@@ -0,0 +1,5 @@
+"""Shared pytest setup: the backend modules are imported as top-level modules, like main.py does."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,122 @@
+"""Bulk enrollment followed by an employee sync (cloud is the source of truth for faces)."""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PyQt6")
+
+import bulk_enrollment  # noqa: E402
+from bulk_enrollment import BulkEnrollmentJob  # noqa: E402
+from database import Database  # noqa: E402
+
+
+ENCODING = [0.01 * i for i in range(128)]
+
+# (backend_id, employee_number, name)
+EMPLOYEES = [(501, 1001, "Jane Doe"), (502, 1002, "John Roe")]
+
+
+class _InlinePool(ThreadPoolExecutor):
+    """ProcessPoolExecutor stand-in: same interface, runs the patched analyzer in threads."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+def _fake_analyze(path, encoding_model):
+    return {"accepted": True, "quality_score": 90, "message": "Good quality", "issues": [], "encoding": ENCODING}
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "kiosk.db"))
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO employee (backend_id, employee_number, name) VALUES (?, ?, ?)", EMPLOYEES)
+    conn.commit()
+    conn.close()
+    return database
+
+
+@pytest.fixture
+def report(db, tmp_path, monkeypatch):
+    photos = tmp_path / "photos_in"
+    photos.mkdir()
+    for _, number, _ in EMPLOYEES:
+        (photos / f"{number}.jpg").write_bytes(b"jpeg")
+
+    monkeypatch.setattr(bulk_enrollment, "ProcessPoolExecutor", _InlinePool)
+    monkeypatch.setattr(bulk_enrollment, "_analyze_photo", _fake_analyze)
+    monkeypatch.setattr(bulk_enrollment, "get_app_data_dir", lambda: tmp_path)
+    return BulkEnrollmentJob(db, str(photos), key="employee_number", workers=2).run()
+
+
+@pytest.fixture
+def bridge(db):
+    from PyQt6.QtCore import QCoreApplication
+    from bridge import KioskBridge
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 - keeps timers valid
+    yield KioskBridge(db_path=db.db_path)
+
+
+def _registered_faces(db):
+    conn = db.get_connection()
+    rows = conn.execute("SELECT backend_id FROM employee WHERE has_face_registration = 1").fetchall()
+    conn.close()
+    return {backend_id for (backend_id,) in rows}
+
+
+def _cloud_employees(uploads):
+    """The timekeeper API response after the given uploads reached the cloud."""
+    uploaded = {upload["backend_id"]: upload["face_encoding"] for upload in uploads}
+    return [{
+        "id": backend_id,
+        "timekeeper_id": number,
+        "name": name,
+        "face_encoding": uploaded.get(backend_id),
+        "face_registered_at": "2026-10-17T08:00:00" if backend_id in uploaded else None,
+        "has_face_registration": backend_id in uploaded
+    } for backend_id, number, name in EMPLOYEES]
+
+
+def test_report_carries_uploads_for_every_enrolled_employee(report):
+    assert report["success"]
+    assert report["enrolled"] == len(EMPLOYEES)
+    assert {upload["backend_id"] for upload in report["uploads"]} == {backend_id for backend_id, _, _ in EMPLOYEES}
+    for upload in report["uploads"]:
+        assert json.loads(upload["face_encoding"]) == pytest.approx(ENCODING)
+
+
+def test_sync_after_uploading_keeps_bulk_enrolled_faces(db, report, bridge):
+    result = json.loads(bridge.syncEmployeesFromAPIWithCleanup(json.dumps(_cloud_employees(report["uploads"]))))
+
+    assert result["success"]
+    assert result["face_sync_count"] == 0
+    assert _registered_faces(db) == {backend_id for backend_id, _, _ in EMPLOYEES}
+
+
+def test_sync_without_uploading_clears_bulk_enrolled_faces(db, report, bridge):
+    # Why the report carries the uploads: the cloud wins on the next sync
+    result = json.loads(bridge.syncEmployeesFromAPIWithCleanup(json.dumps(_cloud_employees([]))))
+
+    assert result["success"]
+    assert _registered_faces(db) == set()
+
+
+def test_progress_from_the_job_thread_is_emitted_on_the_gui_thread(bridge):
+    import threading
+    from PyQt6.QtCore import QCoreApplication
+
+    received = []
+    bridge.bulkEnrollmentProgress.connect(
+        lambda progress_json: received.append((threading.current_thread(), json.loads(progress_json))))
+
+    worker = threading.Thread(target=bridge._emit_progress, args=("bulk_enrollment", {"processed": 1, "total": 2}))
+    worker.start()
+    worker.join()
+    assert received == []  # queued until the GUI thread's event loop runs
+
+    QCoreApplication.processEvents()
+    assert received == [(threading.main_thread(), {"processed": 1, "total": 2})]
@@ -0,0 +1,124 @@
+"""Quality thresholds: pinned per measurement area, and the face-crop calibration fit."""
+import operator
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import face_analysis  # noqa: E402
+from face_analysis import (QUALITY_THRESHOLDS, ROI_THRESHOLDS_CALIBRATED, fit_threshold,  # noqa: E402
+                           roi_quality_enabled, score_brightness, score_sharpness)
+
+
+FRAME = QUALITY_THRESHOLDS["frame"]
+ROI = QUALITY_THRESHOLDS["roi"]
+
+
+def test_full_frame_thresholds_are_unchanged():
+    assert FRAME == {
+        "sharp": 80.0,
+        "acceptable_sharpness": 30.0,
+        "bright_min": 80.0,
+        "bright_max": 180.0,
+        "dim_min": 50.0,
+        "dim_max": 200.0,
+        "min_contrast": 25.0,
+    }
+
+
+def test_face_crop_thresholds_are_pinned():
+    # Update together with ROI_THRESHOLDS_CALIBRATED and the measured agreement
+    # in the face_analysis docstring after `python face_analysis.py photos/ --calibrate`
+    assert set(ROI) == set(FRAME)
+    assert ROI == {
+        "sharp": 80.0,
+        "acceptable_sharpness": 30.0,
+        "bright_min": 80.0,
+        "bright_max": 180.0,
+        "dim_min": 50.0,
+        "dim_max": 200.0,
+        "min_contrast": 25.0,
+    }
+
+
+def test_face_crop_stays_off_by_default_until_calibrated(monkeypatch):
+    monkeypatch.delenv("FACE_QUALITY_ROI", raising=False)
+    assert roi_quality_enabled() is False
+    assert ROI_THRESHOLDS_CALIBRATED is False
+
+    monkeypatch.setenv("FACE_QUALITY_ROI", "true")
+    assert roi_quality_enabled() is True
+
+
+@pytest.mark.parametrize("laplacian_var, points", [(200.0, 30), (80.1, 30), (80.0, 20), (30.1, 20), (30.0, 10), (0.0, 10)])
+def test_sharpness_bands(laplacian_var, points):
+    assert score_sharpness(laplacian_var, FRAME)[0] == points
+
+
+@pytest.mark.parametrize("brightness, points", [
+    (80.0, 20), (180.0, 20), (79.9, 10), (50.0, 10), (180.1, 10), (200.0, 10), (49.9, 0), (200.1, 0)
+])
+def test_brightness_bands(brightness, points):
+    assert score_brightness(brightness, FRAME)[0] == points
+
+
+def test_scoring_follows_the_given_thresholds():
+    thresholds = dict(FRAME, sharp=150.0, bright_min=100.0)
+    assert score_sharpness(120.0, thresholds)[0] == 20
+    assert score_brightness(90.0, thresholds)[0] == 10
+
+
+def test_fit_threshold_maps_the_frame_cut_onto_the_crop_scale():
+    # Face-crop sharpness runs about twice the full-frame value on these photos
+    frame_values = [10.0, 40.0, 70.0, 90.0, 120.0, 300.0]
+    roi_values = [value * 2.0 for value in frame_values]
+
+    cut, agreement = fit_threshold(frame_values, roi_values, 80.0, operator.gt)
+
+    assert agreement == 1.0
+    assert 140.0 < cut < 180.0
+
+
+def test_fit_threshold_upper_bound():
+    frame_values = [150.0, 170.0, 190.0, 210.0]
+    roi_values = [value - 30.0 for value in frame_values]
+
+    cut, agreement = fit_threshold(frame_values, roi_values, 180.0, operator.le)
+
+    assert agreement == 1.0
+    assert 140.0 <= cut < 160.0
+
+
+def test_calibration_covers_every_threshold():
+    assert set(face_analysis._THRESHOLD_TESTS) == set(FRAME)
+
+
+def _flat_analysis():
+    """A uniform gray 200x200 photo with one centered 100x100 face box (no dlib needed)."""
+    import cv2
+    import numpy as np
+
+    _, png = cv2.imencode(".png", np.full((200, 200, 3), 128, dtype=np.uint8))
+    analysis = face_analysis.FaceAnalysis(png.tobytes())
+    analysis._locations = [(50, 150, 150, 50)]
+    return analysis
+
+
+def test_default_frame_mode_output_is_pinned(monkeypatch):
+    pytest.importorskip("cv2")
+    monkeypatch.delenv("FACE_QUALITY_ROI", raising=False)
+
+    result = _flat_analysis().quality()
+
+    # The frame mode reports what it did before face-crop metrics existed: no contrast warning
+    assert [issue["type"] for issue in result["issues"]] == ["blur"]
+    assert result["quality_score"] == 73
+    assert result["metrics"]["contrast"] == 0.0
+
+
+def test_contrast_warning_only_on_the_face_crop():
+    pytest.importorskip("cv2")
+
+    result = _flat_analysis().quality(roi=True)
+
+    assert "contrast" in [issue["type"] for issue in result["issues"]]
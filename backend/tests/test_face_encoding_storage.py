@@ -0,0 +1,117 @@
+"""Binary face encoding storage: blob format, legacy JSON migration and mixed reads."""
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from database import (FACE_ENCODING_FORMAT, FACE_ENCODING_FORMAT_FLOAT32,  # noqa: E402
+                      FACE_ENCODING_FORMAT_FLOAT64, Database, face_encoding_from_blob,
+                      face_encoding_to_blob)
+
+
+def _encoding(seed):
+    return np.random.default_rng(seed).normal(0.0, 0.1, 128)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / "kiosk.db"))
+
+
+def _insert(db, name, face_encoding=None, blob=None, encoding_format=None):
+    """Insert a registered employee straight into the table, like an older kiosk version did."""
+    conn = db.get_connection()
+    cursor = conn.execute("""
+        INSERT INTO employee (name, employee_number, face_encoding, face_encoding_blob,
+                              face_encoding_format, has_face_registration)
+        VALUES (?, ?, ?, ?, ?, 1)
+    """, (name, None, face_encoding, blob, encoding_format))
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def _columns(db, employee_id):
+    conn = db.get_connection()
+    row = conn.execute("SELECT face_encoding, face_encoding_blob, face_encoding_format FROM employee WHERE id = ?",
+                       (employee_id,)).fetchone()
+    conn.close()
+    return row
+
+
+@pytest.mark.parametrize("encoding_format, dtype", [(FACE_ENCODING_FORMAT_FLOAT64, np.float64),
+                                                    (FACE_ENCODING_FORMAT_FLOAT32, np.float32)])
+def test_blob_round_trip(encoding_format, dtype):
+    encoding = _encoding(0)
+
+    blob = face_encoding_to_blob(encoding.tolist(), encoding_format)
+    decoded = face_encoding_from_blob(blob, encoding_format)
+
+    assert len(blob) == 128 * np.dtype(dtype).itemsize
+    assert decoded.dtype == dtype
+    np.testing.assert_array_equal(decoded, encoding.astype(dtype))
+    # Zero-copy view over the bytes
+    assert not decoded.flags.writeable
+
+
+def test_default_format_is_lossless_against_the_json_form():
+    encoding = _encoding(1)
+    from_json = json.loads(json.dumps(encoding.tolist()))
+
+    decoded = face_encoding_from_blob(face_encoding_to_blob(from_json), FACE_ENCODING_FORMAT)
+
+    assert decoded.tolist() == from_json
+
+
+def test_migration_converts_legacy_json_rows_in_batches(db):
+    legacy = {_insert(db, f"Legacy {i}", face_encoding=json.dumps(_encoding(i).tolist())): _encoding(i)
+              for i in range(5)}
+    unreadable = _insert(db, "Broken", face_encoding="not json")
+    version = db.get_face_gallery_version()
+
+    after_id, converted_total, batches = 0, 0, 0
+    while True:
+        scanned, converted, after_id = db.migrate_face_encodings_batch(after_id, batch_size=2)
+        converted_total += converted
+        batches += 1
+        if scanned < 2:
+            break
+
+    assert converted_total == len(legacy)
+    assert batches == 4
+    for employee_id, encoding in legacy.items():
+        face_encoding, blob, encoding_format = _columns(db, employee_id)
+        assert face_encoding is None
+        assert encoding_format == FACE_ENCODING_FORMAT
+        np.testing.assert_array_equal(face_encoding_from_blob(blob, encoding_format), encoding)
+
+    # Unreadable rows are left as they were, and moving columns is not a gallery change
+    assert _columns(db, unreadable) == ("not json", None, None)
+    assert db.get_face_gallery_version() == version
+    assert db.migrate_face_encodings_batch() == (1, 0, unreadable)
+
+
+def test_mixed_json_and_blob_rows_read_alike(db):
+    rows = {
+        _insert(db, "Json", face_encoding=json.dumps(_encoding(10).tolist())): _encoding(10),
+        _insert(db, "Float64", blob=face_encoding_to_blob(_encoding(11), FACE_ENCODING_FORMAT_FLOAT64),
+                encoding_format=FACE_ENCODING_FORMAT_FLOAT64): _encoding(11),
+        _insert(db, "Float32", blob=face_encoding_to_blob(_encoding(12), FACE_ENCODING_FORMAT_FLOAT32),
+                encoding_format=FACE_ENCODING_FORMAT_FLOAT32): _encoding(12).astype(np.float32),
+        # Blob written before the format column existed: float64
+        _insert(db, "No format", blob=face_encoding_to_blob(_encoding(13))): _encoding(13),
+    }
+    _insert(db, "Broken", face_encoding="not json")
+
+    read = {employee_id: face_encoding for employee_id, _, face_encoding, _ in db.get_all_face_encodings()}
+
+    assert set(read) == set(rows)
+    for employee_id, encoding in rows.items():
+        np.testing.assert_array_equal(read[employee_id], encoding)
+        success, face_encoding, _ = db.get_face_encoding(employee_id)
+        assert success
+        np.testing.assert_array_equal(face_encoding, encoding)
+
+    subset = sorted(rows)[:2]
+    assert [row[0] for row in db.get_face_encodings_for(subset)] == subset
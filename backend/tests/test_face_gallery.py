@@ -0,0 +1,64 @@
+"""Gallery search must return what the per-row face_recognition.face_distance() loop returned."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from face_gallery import FaceGallery  # noqa: E402
+
+
+def _legacy_best(encodings, probe):
+    """The original loop: face_distance per row, strict "<" keeps the first of equal distances."""
+    best_index, best_distance = None, None
+    for index, encoding in enumerate(encodings):
+        distance = float(np.linalg.norm(np.asarray([encoding]) - probe, axis=1)[0])
+        if best_distance is None or distance < best_distance:
+            best_index, best_distance = index, distance
+    return best_index, best_distance
+
+
+def _gallery(encodings):
+    return FaceGallery.from_rows([(i + 1, f"Employee {i}", encoding.tolist(), i)
+                                  for i, encoding in enumerate(encodings)])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_best_match_equals_legacy_loop(seed):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.1, (300, 128))
+    gallery = _gallery(encodings)
+
+    probes = np.vstack([encodings[rng.integers(0, len(encodings), 20)] + rng.normal(0.0, 0.02, (20, 128)),
+                        rng.normal(0.0, 0.1, (20, 128))])
+    for probe in probes:
+        assert gallery.best_match(probe) == _legacy_best(encodings, probe)
+    assert gallery.best_matches(probes) == [_legacy_best(encodings, probe) for probe in probes]
+
+
+def test_ties_resolve_to_the_first_row():
+    rng = np.random.default_rng(7)
+    encodings = rng.normal(0.0, 0.1, (50, 128))
+    # Same face registered three times, far apart in gallery order
+    encodings[[5, 23, 41]] = encodings[23]
+    gallery = _gallery(encodings)
+
+    for probe in (encodings[23], encodings[23] + 1e-9, encodings[23] + rng.normal(0.0, 0.02, 128)):
+        index, distance = gallery.best_match(probe)
+        assert (index, distance) == _legacy_best(encodings, probe)
+        assert index == 5
+
+
+def test_rerank_uses_stored_float64_rows():
+    rng = np.random.default_rng(3)
+    encodings = rng.normal(0.0, 0.1, (20, 128))
+    gallery = _gallery(encodings)
+    probe = encodings[4] + rng.normal(0.0, 0.01, 128)
+
+    # Distances are exact, not float32-rounded
+    _, distance = gallery.best_match(probe)
+    assert distance == float(np.linalg.norm(encodings[4:5] - probe, axis=1)[0])
+
+    # ... including rows written by an in-place upsert
+    replacement = rng.normal(0.0, 0.1, 128)
+    gallery.upsert(5, "Employee 4", replacement, 4)
+    encodings[4] = replacement
+    assert gallery.best_match(replacement + 1e-3) == _legacy_best(encodings, replacement + 1e-3)
@@ -0,0 +1,144 @@
+"""Gallery change tracking: employee triggers, the change log and how FaceGalleryCache uses it."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import face_gallery_cache  # noqa: E402
+from database import Database  # noqa: E402
+from face_gallery_cache import FaceGalleryCache  # noqa: E402
+
+
+def _encoding(seed):
+    return np.random.default_rng(seed).normal(0.0, 0.1, 128)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / "kiosk.db"))
+
+
+def _execute(db, sql, params=()):
+    conn = db.get_connection()
+    cursor = conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def _add_employee(db, name, seed=None):
+    employee_id = _execute(db, "INSERT INTO employee (name, employee_number) VALUES (?, ?)", (name, None))
+    if seed is not None:
+        db.save_face_encoding(employee_id, _encoding(seed), "photo.jpg")
+    return employee_id
+
+
+def _change_log(db):
+    conn = db.get_connection()
+    rows = conn.execute("SELECT version, employee_id FROM face_gallery_changes ORDER BY version").fetchall()
+    conn.close()
+    return rows
+
+
+def _cache(db):
+    cache = FaceGalleryCache(db, use_index=False, persist=False)
+    cache.refresh()
+    return cache
+
+
+def _finish_rebuild(cache):
+    if cache._rebuild_thread is not None:
+        cache._rebuild_thread.join(10)
+    return cache.refresh()
+
+
+def test_triggers_log_face_relevant_writes(db):
+    without_face = _add_employee(db, "No face")
+    assert db.get_face_gallery_version() == 0
+
+    employee_id = _add_employee(db, "Jane", seed=1)
+    assert _change_log(db) == [(1, employee_id)]
+
+    _execute(db, "UPDATE employee SET name = 'Jane Doe' WHERE id = ?", (employee_id,))
+    _execute(db, "UPDATE employee SET employee_code = 'X1' WHERE id = ?", (employee_id,))
+    _execute(db, "UPDATE employee SET name = 'Nobody' WHERE id = ?", (without_face,))
+    assert _change_log(db) == [(1, employee_id), (2, employee_id)]
+
+    _execute(db, """
+        INSERT INTO employee (name, face_encoding, has_face_registration) VALUES ('Imported', '[0.1]', 1)
+    """)
+    _execute(db, "DELETE FROM employee WHERE id = ?", (employee_id,))
+    assert [employee for _, employee in _change_log(db)][2:] == [employee_id + 1, employee_id]
+    assert db.get_face_gallery_version() == 4
+
+
+def test_changes_since_a_version(db):
+    first = _add_employee(db, "Jane", seed=1)
+    second = _add_employee(db, "John", seed=2)
+    db.save_face_encoding(first, _encoding(3), "photo.jpg")
+
+    version, employee_ids, full_reload = db.get_face_gallery_changes(0)
+    assert (version, sorted(employee_ids), full_reload) == (3, [first, second], False)
+    assert db.get_face_gallery_changes(2) == (3, [first], False)
+    assert db.get_face_gallery_changes(3) == (3, [], False)
+
+    # An employee-less change means "everything may have changed"
+    db.swap_face_encoding_model(db.get_face_encoding_model() + 1)
+    assert db.get_face_gallery_changes(3)[2]
+
+
+def test_prune_forces_a_full_reload_for_older_versions(db):
+    for seed in range(4):
+        _add_employee(db, f"Employee {seed}", seed=seed)
+
+    db.prune_face_gallery_changes(2)
+
+    assert [version for version, _ in _change_log(db)] == [3, 4]
+    assert db.get_face_gallery_changes(1) == (4, [], True)
+    assert db.get_face_gallery_changes(2)[2] is False
+
+
+def test_cache_rebuilds_when_its_version_was_pruned(db):
+    _add_employee(db, "Jane", seed=1)
+    cache = _cache(db)
+    gallery = cache.gallery
+
+    added = _add_employee(db, "John", seed=2)
+    db.prune_face_gallery_changes(db.get_face_gallery_version())
+
+    assert cache.refresh() is gallery  # keeps serving while the rebuild runs
+    rebuilt = _finish_rebuild(cache)
+    assert rebuilt is not gallery
+    assert rebuilt.row_of(added) is not None
+    assert cache.version == db.get_face_gallery_version()
+
+
+def test_patch_up_to_the_limit_rebuild_beyond(db, monkeypatch):
+    monkeypatch.setattr(face_gallery_cache, "PATCH_LIMIT", 3)
+    cache = _cache(db)
+    gallery = cache.gallery
+
+    patched = [_add_employee(db, f"Patched {seed}", seed=seed) for seed in range(3)]
+    assert cache.refresh() is gallery
+    assert all(gallery.row_of(employee_id) is not None for employee_id in patched)
+
+    rebuilt_ids = [_add_employee(db, f"Rebuilt {seed}", seed=seed) for seed in range(10, 14)]
+    assert cache.refresh() is gallery
+    assert all(gallery.row_of(employee_id) is None for employee_id in rebuilt_ids)
+
+    rebuilt = _finish_rebuild(cache)
+    assert rebuilt is not gallery
+    assert len(rebuilt) == len(patched) + len(rebuilt_ids)
+
+
+def test_patch_refresh_prunes_the_change_log(db, monkeypatch):
+    monkeypatch.setattr(face_gallery_cache, "CHANGE_LOG_RETAIN_VERSIONS", 2)
+    cache = _cache(db)
+
+    for seed in range(5):
+        _add_employee(db, f"Employee {seed}", seed=seed)
+        cache.refresh()
+
+    assert [version for version, _ in _change_log(db)] == [4, 5]
+    # A second cache a couple of versions behind still patches
+    assert db.get_face_gallery_changes(3)[2] is False
+    assert len(cache.gallery) == 5
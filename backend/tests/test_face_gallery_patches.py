@@ -0,0 +1,104 @@
+"""In-place patches (upsert / swap-remove) keep quantized and indexed search equal to exact search."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from face_gallery import FaceGallery  # noqa: E402
+from face_index import CoarseQuantizerIndex  # noqa: E402
+from face_quantization import QUANTIZATION_MODES, QuantizedFaceGallery  # noqa: E402
+
+
+def _rows(rng, ids):
+    """{employee id: (name, encoding, employee number)} with clustered encodings."""
+    centers = rng.normal(0.0, 0.1, (20, 128))
+    return {employee_id: (f"Employee {employee_id}",
+                          centers[employee_id % 20] + rng.normal(0.0, 0.03, 128), employee_id + 1000)
+            for employee_id in ids}
+
+
+def _gallery(rows):
+    return FaceGallery.from_rows([(employee_id, name, encoding, number)
+                                  for employee_id, (name, encoding, number) in rows.items()])
+
+
+def _patch(rng, rows, galleries, index=None, steps=300):
+    """Apply the same random upserts and removes to rows and every gallery (and the index)."""
+    next_id = max(rows) + 1
+    for _ in range(steps):
+        action = rng.random()
+        if action < 0.35 and len(rows) > 10:
+            employee_id = int(rng.choice(list(rows)))
+            del rows[employee_id]
+            for gallery in galleries:
+                row, moved_from = gallery.remove(employee_id)
+                if index is not None and gallery is index.gallery:
+                    index.remove_row(row, moved_from)
+            continue
+
+        if action < 0.7:
+            employee_id, next_id = next_id, next_id + 1
+        else:
+            employee_id = int(rng.choice(list(rows)))
+        rows.update(_rows(rng, [employee_id]))
+        name, encoding, number = rows[employee_id]
+        for gallery in galleries:
+            row, _ = gallery.upsert(employee_id, name, encoding, number)
+            if index is not None and gallery is index.gallery:
+                index.add_row(row)
+
+
+def _assert_same_results(rng, rows, searched, search=None):
+    exact = _gallery(rows)
+    encodings = np.asarray([encoding for _, encoding, _ in rows.values()])
+    probes = np.vstack([encodings[rng.integers(0, len(encodings), 100)] + rng.normal(0.0, 0.01, (100, 128)),
+                        rng.normal(0.0, 0.1, (20, 128))])
+    search = search or searched.best_match
+
+    for probe in probes:
+        exact_index, exact_distance = exact.best_match(probe)
+        index, distance = search(probe)
+        assert searched.ids[index] == exact.ids[exact_index]
+        assert distance == exact_distance
+        assert searched.employee_at(index, distance) == exact.employee_at(exact_index, exact_distance)
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_quantized_gallery_after_patches_equals_exact(mode):
+    rng = np.random.default_rng(1)
+    rows = _rows(rng, range(1, 401))
+    quantized = QuantizedFaceGallery.from_gallery(_gallery(rows), mode)
+
+    _patch(rng, rows, [quantized])
+
+    assert len(quantized) == len(rows)
+    _assert_same_results(rng, rows, quantized)
+
+
+def test_indexed_gallery_after_patches_equals_exact():
+    rng = np.random.default_rng(2)
+    rows = _rows(rng, range(1, 401))
+    gallery = _gallery(rows)
+    index = CoarseQuantizerIndex(gallery, min_gallery_size=0)
+
+    _patch(rng, rows, [gallery], index)
+
+    # Every row sits in exactly the partition row_lists says
+    members = np.sort(np.concatenate(index.lists))
+    np.testing.assert_array_equal(members, np.arange(len(gallery)))
+    assert len(index.row_lists) == len(gallery)
+    for partition, rows_in_partition in enumerate(index.lists):
+        assert all(index.row_lists[row] == partition for row in rows_in_partition)
+
+    # With every partition probed the index must give the exact answer
+    _assert_same_results(rng, rows, gallery, lambda probe: index.best_match(probe, nprobe=len(index.lists)))
+
+
+def test_quantized_and_indexed_gallery_after_patches_equals_exact():
+    rng = np.random.default_rng(3)
+    rows = _rows(rng, range(1, 401))
+    gallery = QuantizedFaceGallery.from_gallery(_gallery(rows), "int8")
+    index = CoarseQuantizerIndex(gallery, min_gallery_size=0)
+
+    _patch(rng, rows, [gallery], index)
+
+    _assert_same_results(rng, rows, gallery, lambda probe: index.best_match(probe, nprobe=len(index.lists)))
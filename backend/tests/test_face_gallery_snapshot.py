@@ -0,0 +1,113 @@
+"""Gallery snapshots: faithful round trip, concurrent saves and when a warm start must rebuild instead."""
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from database import Database  # noqa: E402
+from face_gallery import FaceGallery  # noqa: E402
+from face_gallery_cache import FaceGalleryCache  # noqa: E402
+from face_gallery_snapshot import get_snapshot_dir, load_gallery_snapshot, save_gallery_snapshot  # noqa: E402
+
+
+def _gallery(count, seed=0):
+    encodings = np.random.default_rng(seed).normal(0.0, 0.1, (count, 128))
+    return FaceGallery(encodings, np.arange(1, count + 1), [f"Employee {i}" for i in range(count)],
+                       list(range(count)))
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "kiosk.db"))
+    rng = np.random.default_rng(1)
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO employee (name, employee_number) VALUES (?, ?)",
+                     [(f"Employee {i}", 100 + i) for i in range(3)])
+    conn.commit()
+    conn.close()
+    for employee_id in (1, 2, 3):
+        database.save_face_encoding(employee_id, rng.normal(0.0, 0.1, 128), "photo.jpg")
+    return database
+
+
+def test_round_trip_keeps_none_names_and_numbers(tmp_path):
+    gallery = FaceGallery(np.random.default_rng(0).normal(0.0, 0.1, (3, 128)), [1, 2, 3],
+                          ["Jane", None, "None"], [7, None, 9])
+
+    assert save_gallery_snapshot(tmp_path, "epoch", 4, gallery)
+    version, loaded, _ = load_gallery_snapshot(tmp_path, "epoch")
+
+    assert version == 4
+    assert loaded.names == ["Jane", None, "None"]
+    assert loaded.employee_numbers == [7, None, 9]
+    np.testing.assert_array_equal(loaded.exact_encodings, gallery.exact_encodings)
+    np.testing.assert_array_equal(loaded.ids, gallery.ids)
+
+
+def test_older_save_never_replaces_a_newer_one(tmp_path):
+    assert save_gallery_snapshot(tmp_path, "epoch", 6, _gallery(4, seed=6))
+    assert not save_gallery_snapshot(tmp_path, "epoch", 5, _gallery(3, seed=5))
+
+    version, loaded, _ = load_gallery_snapshot(tmp_path, "epoch")
+    assert (version, len(loaded)) == (6, 4)
+    # Only the current save's files are left
+    assert {path.stem.split("-")[1] for path in tmp_path.glob("*.npy")} == {"6"}
+
+
+def test_concurrent_saves_leave_a_loadable_newest_snapshot(tmp_path):
+    galleries = {version: _gallery(version, seed=version) for version in range(2, 10)}
+    threads = [threading.Thread(target=save_gallery_snapshot, args=(tmp_path, "epoch", version, gallery))
+               for version, gallery in galleries.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    version, loaded, _ = load_gallery_snapshot(tmp_path, "epoch")
+    assert version == max(galleries)
+    np.testing.assert_array_equal(loaded.exact_encodings, galleries[version].exact_encodings)
+    assert not (tmp_path / "meta.lock").exists()
+
+
+def test_epoch_mismatch_rebuilds(db):
+    FaceGalleryCache(db, use_index=False).refresh()
+    conn = db.get_connection()
+    conn.execute("UPDATE face_gallery_state SET epoch = 'recreated'")
+    conn.commit()
+    conn.close()
+
+    cache = FaceGalleryCache(db, use_index=False)
+    assert not cache._warm_start()
+    assert len(cache.refresh()) == 3
+
+
+def test_snapshot_ahead_of_the_database_rebuilds(db):
+    epoch, version = db.get_face_gallery_state()
+    save_gallery_snapshot(get_snapshot_dir(db.db_path), epoch, version + 5, _gallery(7))
+
+    cache = FaceGalleryCache(db, use_index=False)
+    assert not cache._warm_start()
+    assert len(cache.refresh()) == 3
+    assert cache.version == version
+
+
+def test_snapshot_behind_a_pruned_change_log_rebuilds(db):
+    FaceGalleryCache(db, use_index=False).refresh()
+    db.delete_face_encoding(1)
+    db.prune_face_gallery_changes(db.get_face_gallery_version())
+
+    cache = FaceGalleryCache(db, use_index=False)
+    assert not cache._warm_start()
+    assert cache.refresh().row_of(1) is None
+
+
+def test_snapshot_a_few_changes_behind_warm_starts_and_patches(db):
+    FaceGalleryCache(db, use_index=False).refresh()
+    db.delete_face_encoding(1)
+
+    cache = FaceGalleryCache(db, use_index=False)
+    assert cache._warm_start()
+    gallery = cache.refresh()
+    assert gallery.row_of(1) is None and len(gallery) == 2
+    assert cache.version == db.get_face_gallery_version()
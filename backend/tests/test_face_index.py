@@ -0,0 +1,56 @@
+"""The ANN index is opt-in and agrees with exact search at the default nprobe."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from database import Database  # noqa: E402
+from face_gallery import FaceGallery  # noqa: E402
+from face_gallery_cache import FaceGalleryCache  # noqa: E402
+from face_index import DEFAULT_NPROBE, CoarseQuantizerIndex  # noqa: E402
+
+
+def _clustered_gallery(rng, clusters=40, per_cluster=50):
+    """Synthetic gallery with structure like real encodings (people who look alike)."""
+    centers = rng.normal(0.0, 0.1, (clusters, 128))
+    encodings = (np.repeat(centers, per_cluster, axis=0)
+                 + rng.normal(0.0, 0.03, (clusters * per_cluster, 128))).astype(np.float32)
+    count = len(encodings)
+    return FaceGallery(encodings, np.arange(1, count + 1), [f"Employee {i}" for i in range(count)],
+                       list(range(count)))
+
+
+def test_ann_top1_matches_exact_top1_at_default_nprobe():
+    rng = np.random.default_rng(7)
+    gallery = _clustered_gallery(rng)
+    index = CoarseQuantizerIndex(gallery, nprobe=DEFAULT_NPROBE, min_gallery_size=0)
+    assert not index.is_exact
+
+    picks = rng.integers(0, len(gallery), 300)
+    probes = gallery.encodings[picks] + rng.normal(0.0, 0.005, (len(picks), 128)).astype(np.float32)
+
+    for probe in probes:
+        exact_index, exact_distance = gallery.best_match(probe)
+        ann_index, ann_distance = index.best_match(probe)
+        assert ann_index == exact_index
+        assert ann_distance == exact_distance
+
+
+def test_recall_report_is_perfect_at_default_nprobe():
+    rng = np.random.default_rng(11)
+    gallery = _clustered_gallery(rng)
+    index = CoarseQuantizerIndex(gallery, min_gallery_size=0)
+    probes = gallery.encodings[rng.integers(0, len(gallery), 200)]
+
+    (row,) = index.evaluate_recall(probes, [DEFAULT_NPROBE])
+    assert row["recall_at_1"] == 1.0
+    assert row["decision_agreement"] == 1.0
+
+
+def test_gallery_cache_searches_exactly_unless_opted_in(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "kiosk.db"))
+
+    monkeypatch.delenv("FACE_GALLERY_INDEX", raising=False)
+    assert FaceGalleryCache(db, persist=False).use_index is False
+
+    monkeypatch.setenv("FACE_GALLERY_INDEX", "true")
+    assert FaceGalleryCache(db, persist=False).use_index is True
@@ -0,0 +1,147 @@
+"""Encoding model bookkeeping: every write path records the model, re-encoded faces are queued for cloud."""
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from database import Database  # noqa: E402
+
+
+ENCODING = [0.01 * i for i in range(128)]
+NEW_MODEL = 99
+
+# (backend_id, employee_number, name)
+EMPLOYEES = [(601, 2001, "Jane Doe"), (602, 2002, "John Roe")]
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "kiosk.db"))
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO employee (backend_id, employee_number, name) VALUES (?, ?, ?)", EMPLOYEES)
+    conn.commit()
+    conn.close()
+    return database
+
+
+def _employee_id(db, backend_id):
+    conn = db.get_connection()
+    (employee_id,) = conn.execute("SELECT id FROM employee WHERE backend_id = ?", (backend_id,)).fetchone()
+    conn.close()
+    return employee_id
+
+
+def _encoding_models(db):
+    conn = db.get_connection()
+    rows = conn.execute("SELECT backend_id, face_encoding_model FROM employee").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def _reencode_all(db, encoding_model):
+    candidates = db.get_face_reencode_candidates(encoding_model)
+    db.stage_face_reencodings(encoding_model, [(employee_id, registered_at, [0.5] * 128, "Re-encoded")
+                                               for employee_id, _, registered_at in candidates])
+    return db.swap_face_encoding_model(encoding_model)
+
+
+def test_delete_clears_encoding_model(db):
+    employee_id = _employee_id(db, 601)
+    db.save_face_encoding(employee_id, ENCODING, "photo.jpg")
+    assert _encoding_models(db)[601] == db.get_face_encoding_model()
+
+    db.delete_face_encoding(employee_id)
+
+    assert _encoding_models(db)[601] is None
+
+
+def test_swap_queues_reencoded_faces_for_upload(db):
+    for backend_id, _, _ in EMPLOYEES:
+        db.save_face_encoding(_employee_id(db, backend_id), ENCODING, "photo.jpg")
+    assert db.get_pending_face_uploads() == []
+
+    swapped, not_converted = _reencode_all(db, NEW_MODEL)
+
+    assert swapped == len(EMPLOYEES) and not_converted == []
+    pending = db.get_pending_face_uploads()
+    assert {backend_id for _, backend_id, _ in pending} == {backend_id for backend_id, _, _ in EMPLOYEES}
+    for _, _, face_encoding in pending:
+        assert face_encoding == pytest.approx([0.5] * 128)
+
+    db.mark_face_uploads_done([pending[0][0]])
+    assert [employee_id for employee_id, _, _ in db.get_pending_face_uploads()] == [pending[1][0]]
+
+
+def test_delete_drops_pending_upload(db):
+    employee_id = _employee_id(db, 601)
+    db.save_face_encoding(employee_id, ENCODING, "photo.jpg")
+    _reencode_all(db, NEW_MODEL)
+
+    db.delete_face_encoding(employee_id)
+
+    assert db.get_pending_face_uploads() == []
+
+
+def test_sync_records_active_encoding_model(db):
+    pytest.importorskip("PyQt6")
+    from PyQt6.QtCore import QCoreApplication
+    from bridge import KioskBridge
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 - keeps timers valid
+    bridge = KioskBridge(db_path=db.db_path)
+
+    # One existing employee without a local face, one that only exists in cloud
+    cloud = [{"id": backend_id, "timekeeper_id": number, "name": name,
+              "face_encoding": json.dumps(ENCODING), "face_registered_at": "2026-10-17T08:00:00",
+              "has_face_registration": True}
+             for backend_id, number, name in EMPLOYEES[:1] + [(603, 2003, "New Hire")]]
+    cloud.append({"id": 602, "timekeeper_id": 2002, "name": "John Roe", "face_encoding": None,
+                  "face_registered_at": None, "has_face_registration": False})
+    result = json.loads(bridge.syncEmployeesFromAPIWithCleanup(json.dumps(cloud)))
+
+    assert result["success"]
+    models = _encoding_models(db)
+    assert models[601] == models[603] == db.get_face_encoding_model()
+    assert models[602] is None
+
+
+def test_bridge_exposes_pending_uploads(db):
+    pytest.importorskip("PyQt6")
+    from PyQt6.QtCore import QCoreApplication
+    from bridge import KioskBridge
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 - keeps timers valid
+    bridge = KioskBridge(db_path=db.db_path)
+    employee_id = _employee_id(db, 601)
+    db.save_face_encoding(employee_id, ENCODING, "photo.jpg")
+    _reencode_all(db, NEW_MODEL)
+
+    pending = json.loads(bridge.getPendingFaceUploads())
+    assert pending["success"]
+    assert [(upload["employee_id"], upload["backend_id"]) for upload in pending["uploads"]] == [(employee_id, 601)]
+    assert json.loads(pending["uploads"][0]["face_encoding"]) == pytest.approx([0.5] * 128)
+
+    assert json.loads(bridge.markFaceUploadsDone(json.dumps([employee_id])))["success"]
+    assert json.loads(bridge.getPendingFaceUploads())["uploads"] == []
+
+
+def test_reencoding_progress_is_emitted_on_the_gui_thread(db):
+    pytest.importorskip("PyQt6")
+    import threading
+    from PyQt6.QtCore import QCoreApplication
+    from bridge import KioskBridge
+
+    app = QCoreApplication.instance() or QCoreApplication([])  # noqa: F841 - keeps timers valid
+    bridge = KioskBridge(db_path=db.db_path)
+    received = []
+    bridge.faceReencodingProgress.connect(
+        lambda status_json: received.append((threading.current_thread(), json.loads(status_json))))
+
+    worker = threading.Thread(target=bridge._emit_progress, args=("face_reencoding", {"state": "running", "done": 1}))
+    worker.start()
+    worker.join()
+    assert received == []
+
+    QCoreApplication.processEvents()
+    assert received == [(threading.main_thread(), {"state": "running", "done": 1})]
@@ -0,0 +1,46 @@
+"""Tracked identities never survive a reset."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from face_tracker import FaceTracker  # noqa: E402
+
+
+BOX = (10, 110, 110, 10)
+EMPLOYEE = {"id": 1, "name": "Jane Doe", "confidence": 80.0}
+
+
+def _patch():
+    patch = np.random.default_rng(0).standard_normal((24, 24)).astype(np.float32)
+    return (patch - patch.mean()) / patch.std()
+
+
+def test_track_is_a_candidate_until_cleared():
+    tracker = FaceTracker()
+    patch = _patch()
+    tracker.update(BOX, patch, EMPLOYEE, 0.3, gallery_version=1)
+
+    assert tracker.lookup(BOX, patch, 1) == (EMPLOYEE, 0.3)
+
+    tracker.clear()
+    assert tracker.lookup(BOX, patch, 1) is None
+
+
+def test_match_started_before_a_clear_is_not_remembered():
+    tracker = FaceTracker()
+    patch = _patch()
+    epoch = tracker.epoch
+
+    tracker.clear()  # e.g. the operator rejected the match while it was in flight
+    tracker.update(BOX, patch, EMPLOYEE, 0.3, gallery_version=1, epoch=epoch)
+
+    assert tracker.lookup(BOX, patch, 1) is None
+
+
+def test_forget_drops_the_track_at_a_box():
+    tracker = FaceTracker()
+    patch = _patch()
+    tracker.update(BOX, patch, EMPLOYEE, 0.3, gallery_version=1)
+
+    tracker.forget(BOX)
+    assert tracker.lookup(BOX, patch, 1) is None
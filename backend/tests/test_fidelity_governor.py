@@ -0,0 +1,62 @@
+"""Fidelity tier changes: latency driven, and a timed retry out of degraded tiers."""
+import fidelity_governor
+from fidelity_governor import (CNN_TIER, DEFAULT_TIER, FIDELITY_TIERS, MIN_SAMPLES, REPROMOTE_SECONDS,
+                               FidelityGovernor)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _governor(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(fidelity_governor.time, "monotonic", clock)
+    return FidelityGovernor(target_ms=500, start_tier="balanced"), clock
+
+
+def test_automatic_ladder_is_hog_only_and_varies_upsample():
+    assert all(tier["model"] == "hog" for tier in FIDELITY_TIERS)
+    assert CNN_TIER not in FIDELITY_TIERS
+    assert len({tier["upsample"] for tier in FIDELITY_TIERS}) > 1
+
+
+def test_start_tier_does_not_use_the_cascade():
+    # The cascade's miss rate is unmeasured; only latency pressure may turn it on
+    assert FidelityGovernor().tier["name"] == DEFAULT_TIER
+    assert not FidelityGovernor().tier["cascade"]
+
+
+def test_slow_frames_demote(monkeypatch):
+    governor, _ = _governor(monkeypatch)
+    for _ in range(MIN_SAMPLES):
+        governor.record(0.8)
+    assert governor.tier["name"] == "minimal"
+
+
+def test_degraded_tier_is_retried_after_repromote_seconds(monkeypatch):
+    governor, clock = _governor(monkeypatch)
+    for _ in range(MIN_SAMPLES):
+        governor.record(0.8)
+    assert governor.tier["name"] == "minimal"
+
+    # Frames in the window are neither fast enough to promote nor slow (e.g. few faces found)
+    clock.now += REPROMOTE_SECONDS - 1
+    governor.record(0.45)
+    assert governor.tier["name"] == "minimal"
+
+    clock.now += 1
+    governor.record(0.45)
+    status = governor.get_status()
+    assert status["tier"] == "balanced"
+    assert status["changes"][-1]["reason"] == "retry"
+
+
+def test_no_timed_retry_at_or_above_the_start_tier(monkeypatch):
+    governor, clock = _governor(monkeypatch)
+    clock.now += REPROMOTE_SECONDS * 2
+    governor.record(0.45)
+    assert governor.tier["name"] == "balanced"
@@ -0,0 +1,36 @@
+"""A static scene is skipped unless scanning restarted or a face went unmatched."""
+import io
+
+import pytest
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from presence_gate import PresenceGate  # noqa: E402
+
+
+def _frame():
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (40, 60, 200)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def gate():
+    gate = PresenceGate(use_skin_prior=False)
+    frame = _frame()
+    assert gate.check(frame)["scan"]       # first frame always scans
+    assert not gate.check(frame)["scan"]   # then the static scene is skipped
+    return gate
+
+
+def test_reset_scans_the_next_static_frame(gate):
+    gate.reset()
+    assert gate.check(_frame())["scan"]
+    assert not gate.check(_frame())["scan"]
+
+
+def test_request_rescan_scans_the_next_static_frame_once(gate):
+    gate.request_rescan()
+    assert gate.check(_frame())["scan"]
+    assert not gate.check(_frame())["scan"]
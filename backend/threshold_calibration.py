@@ -0,0 +1,368 @@
+"""
+Offline match-threshold calibration.
+Scores a labeled probe set against the kiosk gallery and reports, for every
+candidate threshold, the false accept rate (probes of people who are not
+enrolled that still match someone), the false reject rate (enrolled people
+who match nobody), misidentifications and top-1 accuracy. MATCH_THRESHOLD
+can then be chosen from measured numbers instead of the dlib default.
+
+It also replays the early stop the kiosk used before the vectorized gallery:
+accept the first employee (in database order) closer than 0.4 instead of the
+closest one. The report shows how often that changed the answer.
+
+All probe x gallery distances are computed in blocked matrix form (one
+PROBE_BLOCK x GALLERY_BLOCK tile at a time) keeping only per-probe
+state, so 100k probes against 50k employees fit in a few hundred MB.
+
+Usage:
+    python threshold_calibration.py --probes probes/ --save-probes probes.npz
+    python threshold_calibration.py --probes-npz probes.npz --output calibration.json
+    python threshold_calibration.py --synthetic 100000 --gallery-size 50000
+
+With --probes, each sub-directory is named after an employee number and
+holds photos of that employee. Photos in "unknown/" (or any directory
+that is not an enrolled employee number) are people who are not enrolled.
+A --probes-npz file holds "encodings" (P, 128) and "labels" (P,) employee
+numbers, with -1 for people who are not enrolled.
+"""
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from face_gallery import FaceGallery, MATCH_THRESHOLD
+
+
+# Early-stop distance of the original per-employee recognizeFace loop
+LEGACY_EARLY_STOP_THRESHOLD = 0.4
+
+# Thresholds evaluated by default
+DEFAULT_THRESHOLDS = tuple(round(0.30 + 0.01 * i, 2) for i in range(41))
+
+# Tile size of the probe x gallery distance blocks (1024 x 8192 float32 = 32 MB)
+PROBE_BLOCK = 1024
+GALLERY_BLOCK = 8192
+
+# False accept rate the recommended threshold must stay under
+DEFAULT_TARGET_FAR = 0.001
+
+# Label of probes whose person is not enrolled
+NOT_ENROLLED = -1
+
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+# Synthetic encodings roughly follow the spread of real dlib encodings
+SYNTHETIC_STD = 0.1
+SYNTHETIC_PROBE_NOISE = 0.03
+
+
+def _encode_probe(path, encoding_model):
+    """Encode the single face of a probe photo (runs in a worker process); None if not exactly one face."""
+    from face_analysis import FaceAnalysis
+
+    try:
+        analysis = FaceAnalysis(Path(path).read_bytes(), encoding_model=encoding_model)
+        if not analysis.decoded or len(analysis.face_locations) != 1:
+            return None
+        encoding = analysis.encoding
+        return encoding.tolist() if encoding is not None else None
+    except Exception:
+        return None
+
+
+def encode_probe_folder(folder, encoding_model=None, workers=None):
+    """
+    Encode a labeled probe folder (see module docstring) across CPU cores.
+
+    Args:
+        folder (str): Folder with one sub-directory per employee number
+        encoding_model (int, optional): Encoding model version (default: current)
+        workers (int, optional): Worker processes (default: every core but one)
+
+    Returns:
+        tuple: (encodings (P, 128) float32, labels (P,) int64); photos without
+               exactly one face are skipped
+    """
+    from bulk_enrollment import default_workers
+
+    paths, labels = [], []
+    for person_dir in sorted(path for path in Path(folder).iterdir() if path.is_dir()):
+        label = int(person_dir.name) if person_dir.name.isdigit() else NOT_ENROLLED
+        for path in sorted(person_dir.iterdir()):
+            if path.suffix.lower() in _IMAGE_SUFFIXES:
+                paths.append(str(path))
+                labels.append(label)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or default_workers(), mp_context=context) as pool:
+        encoded = list(pool.map(_encode_probe, paths, [encoding_model] * len(paths), chunksize=8))
+
+    kept = [i for i, encoding in enumerate(encoded) if encoding is not None]
+    if len(kept) < len(paths):
+        print(f"⚠️ Skipped {len(paths) - len(kept)} probe photos without exactly one face")
+
+    encodings = np.asarray([encoded[i] for i in kept], dtype=np.float32).reshape(len(kept), 128)
+    return encodings, np.asarray([labels[i] for i in kept], dtype=np.int64)
+
+
+def score_probes(gallery, probes, probe_block=PROBE_BLOCK, gallery_block=GALLERY_BLOCK,
+                 early_stop_threshold=LEGACY_EARLY_STOP_THRESHOLD):
+    """
+    Find, for every probe, the closest gallery row and the first row (in gallery
+    order) under the early-stop threshold.
+
+    Args:
+        gallery (FaceGallery): Gallery in database order
+        probes: (P, 128) probe encodings
+        probe_block (int): Probes per tile
+        gallery_block (int): Gallery rows per tile
+        early_stop_threshold (float): Distance the legacy loop stopped at
+
+    Returns:
+        dict: Arrays of length P - best_row, best_distance (exact float64),
+              first_hit_row (-1 if no row was under the early-stop threshold)
+    """
+    probes32 = np.ascontiguousarray(probes, dtype=np.float32)
+    encodings = gallery.encodings
+    count = len(probes32)
+
+    best_row = np.full(count, -1, dtype=np.int64)
+    best_sq = np.full(count, np.inf, dtype=np.float32)
+    first_hit_row = np.full(count, -1, dtype=np.int64)
+
+    for start_p in range(0, count, probe_block):
+        block_p = probes32[start_p:start_p + probe_block]
+        rows_p = np.arange(len(block_p))
+        # ||p||^2 is constant per probe: leave it out of the tile and fold it into the limit
+        hit_limit = early_stop_threshold ** 2 - np.einsum('ij,ij->i', block_p, block_p)
+        block_best_row = best_row[start_p:start_p + probe_block]
+        block_best_sq = best_sq[start_p:start_p + probe_block]
+        block_first_hit = first_hit_row[start_p:start_p + probe_block]
+
+        for start_g in range(0, len(encodings), gallery_block):
+            tile = block_p @ (-2.0 * encodings[start_g:start_g + gallery_block].T)
+            tile += gallery.sq_norms[start_g:start_g + gallery_block]
+
+            nearest = np.argmin(tile, axis=1)
+            nearest_sq = tile[rows_p, nearest]
+            closer = nearest_sq < block_best_sq
+            block_best_sq[closer] = nearest_sq[closer]
+            block_best_row[closer] = nearest[closer] + start_g
+
+            hits = tile < hit_limit[:, None]
+            new_hit = (block_first_hit < 0) & hits.any(axis=1)
+            block_first_hit[new_hit] = np.argmax(hits[new_hit], axis=1) + start_g
+
+    return {
+        "best_row": best_row,
+        "best_distance": _exact_distances(gallery.exact_encodings, probes, best_row),
+        "first_hit_row": first_hit_row
+    }
+
+
+def _exact_distances(encodings, probes, rows):
+    """Exact float64 distance from each probe to its gallery row (inf where row is -1)."""
+    distances = np.full(len(rows), np.inf)
+    valid = rows >= 0
+    diff = encodings[rows[valid]].astype(np.float64) - np.asarray(probes, dtype=np.float64)[valid]
+    distances[valid] = np.linalg.norm(diff, axis=1)
+    return distances
+
+
+def calibrate(gallery, probes, labels, thresholds=DEFAULT_THRESHOLDS, target_far=DEFAULT_TARGET_FAR,
+              probe_block=PROBE_BLOCK, gallery_block=GALLERY_BLOCK,
+              early_stop_threshold=LEGACY_EARLY_STOP_THRESHOLD):
+    """
+    Compute FAR / FRR / top-1 curves and the early-stop impact for a labeled probe set.
+
+    Args:
+        gallery (FaceGallery): Kiosk gallery
+        probes: (P, 128) probe encodings
+        labels: (P,) employee numbers, NOT_ENROLLED for people who are not enrolled
+        thresholds (list): Match thresholds to evaluate
+        target_far (float): False accept rate the recommended threshold must stay under
+        probe_block (int): Probes per distance tile
+        gallery_block (int): Gallery rows per distance tile
+        early_stop_threshold (float): Distance the legacy loop stopped at
+
+    Returns:
+        dict: JSON-serialisable report {probes, curves, early_stop, recommended}
+    """
+    row_by_number = {number: row for row, number in enumerate(gallery.employee_numbers)}
+    own_row = np.asarray([row_by_number.get(int(label), -1) for label in labels], dtype=np.int64)
+    genuine = own_row >= 0
+    impostor = ~genuine
+    genuine_count = int(genuine.sum())
+    impostor_count = int(impostor.sum())
+
+    start_time = time.perf_counter()
+    scores = score_probes(gallery, probes, probe_block, gallery_block, early_stop_threshold)
+    scoring_seconds = time.perf_counter() - start_time
+
+    best_row, best_distance = scores["best_row"], scores["best_distance"]
+    first_hit_row = scores["first_hit_row"]
+    # The legacy loop accepted the first row under the early-stop distance, else the closest row
+    legacy_row = np.where(first_hit_row >= 0, first_hit_row, best_row)
+    legacy_distance = np.where(first_hit_row >= 0, _exact_distances(gallery.exact_encodings, probes, first_hit_row),
+                               best_distance)
+
+    def rate(mask, total):
+        return round(float(mask.sum()) / total, 6) if total else None
+
+    curves = []
+    for threshold in thresholds:
+        accepted = best_distance < threshold
+        legacy_accepted = legacy_distance < threshold
+        curves.append({
+            "threshold": threshold,
+            "far": rate(impostor & accepted, impostor_count),
+            "frr": rate(genuine & ~accepted, genuine_count),
+            "misidentification_rate": rate(genuine & accepted & (best_row != own_row), genuine_count),
+            "top1_accuracy": rate(genuine & accepted & (best_row == own_row), genuine_count),
+            "early_stop_top1_accuracy": rate(genuine & legacy_accepted & (legacy_row == own_row), genuine_count)
+        })
+
+    changed = legacy_row != best_row
+    early_stop = {
+        "threshold": early_stop_threshold,
+        "stopped_early": int((first_hit_row >= 0).sum()),
+        "changed_answer": int(changed.sum()),
+        "changed_rate": rate(changed, len(labels)),
+        "correct_to_wrong": int((genuine & changed & (best_row == own_row)).sum()),
+        "wrong_to_correct": int((genuine & changed & (legacy_row == own_row)).sum())
+    }
+
+    return {
+        "gallery_size": len(gallery),
+        "probes": {"total": len(labels), "enrolled": genuine_count, "not_enrolled": impostor_count},
+        "scoring_seconds": round(scoring_seconds, 2),
+        "rank1_accuracy": rate(genuine & (best_row == own_row), genuine_count),
+        "curves": curves,
+        "early_stop": early_stop,
+        "recommended": _recommend(curves, target_far)
+    }
+
+
+def _recommend(curves, target_far):
+    """Equal-error threshold and the most accurate threshold under the target FAR."""
+    recommended = {"current_threshold": MATCH_THRESHOLD, "target_far": target_far,
+                   "equal_error_threshold": None, "best_threshold_under_target_far": None}
+
+    scored = [point for point in curves if point["far"] is not None and point["frr"] is not None]
+    if scored:
+        equal = min(scored, key=lambda point: abs(point["far"] - point["frr"]))
+        recommended["equal_error_threshold"] = equal["threshold"]
+
+    under = [point for point in curves if point["top1_accuracy"] is not None
+             and (point["far"] is None or point["far"] <= target_far)]
+    if under:
+        # Highest accuracy; on ties the stricter (lower) threshold
+        best = max(under, key=lambda point: (point["top1_accuracy"], -point["threshold"]))
+        recommended["best_threshold_under_target_far"] = best["threshold"]
+
+    return recommended
+
+
+def _synthetic_set(gallery_size, probe_count, rng):
+    """Random gallery plus probes: noisy copies of 80% enrolled employees and 20% strangers."""
+    encodings = rng.normal(0.0, SYNTHETIC_STD, (gallery_size, 128)).astype(np.float32)
+    gallery = FaceGallery(encodings, np.arange(1, gallery_size + 1),
+                          [f"Synthetic {i}" for i in range(gallery_size)], list(range(1, gallery_size + 1)))
+
+    enrolled = int(probe_count * 0.8)
+    picks = rng.integers(0, gallery_size, enrolled)
+    probes = np.concatenate([
+        encodings[picks] + rng.normal(0.0, SYNTHETIC_PROBE_NOISE, (enrolled, 128)),
+        rng.normal(0.0, SYNTHETIC_STD, (probe_count - enrolled, 128))
+    ]).astype(np.float32)
+    labels = np.concatenate([picks + 1, np.full(probe_count - enrolled, NOT_ENROLLED)])
+    return gallery, probes, labels
+
+
+def _format_report(report):
+    """Human-readable threshold table and summary."""
+    lines = [f"{'threshold':>9}  {'FAR':>8}  {'FRR':>8}  {'misid':>8}  {'top1':>8}  {'top1 (early stop)':>17}"]
+
+    def fmt(value):
+        return f"{value:8.4f}" if value is not None else f"{'-':>8}"
+
+    for point in report["curves"]:
+        marker = "  <- current" if point["threshold"] == MATCH_THRESHOLD else ""
+        lines.append(f"{point['threshold']:9.2f}  {fmt(point['far'])}  {fmt(point['frr'])}  "
+                     f"{fmt(point['misidentification_rate'])}  {fmt(point['top1_accuracy'])}  "
+                     f"{fmt(point['early_stop_top1_accuracy']):>17}{marker}")
+
+    probes, early, recommended = report["probes"], report["early_stop"], report["recommended"]
+    lines.append(f"{probes['total']} probes ({probes['enrolled']} enrolled, {probes['not_enrolled']} not enrolled) "
+                 f"x {report['gallery_size']} employees scored in {report['scoring_seconds']}s; "
+                 f"rank-1 accuracy {report['rank1_accuracy']}")
+    lines.append(f"Early stop < {early['threshold']}: stopped early on {early['stopped_early']} probes, "
+                 f"changed {early['changed_answer']} answers ({early['correct_to_wrong']} correct -> wrong, "
+                 f"{early['wrong_to_correct']} wrong -> correct)")
+    lines.append(f"Equal error threshold: {recommended['equal_error_threshold']}; most accurate threshold with "
+                 f"FAR <= {recommended['target_far']}: {recommended['best_threshold_under_target_far']} "
+                 f"(current {recommended['current_threshold']})")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Calibrate the match threshold and print the table; optionally write the JSON report."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibrate the face match threshold on a labeled probe set")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--probes", help="Folder with one sub-directory of photos per employee number")
+    source.add_argument("--probes-npz", help="Pre-encoded probes (encodings, labels)")
+    source.add_argument("--synthetic", type=int, help="Random probe count (uses a random gallery)")
+    parser.add_argument("--db", help="Path to kiosk.db (default: app data directory)")
+    parser.add_argument("--gallery-size", type=int, default=10000, help="Random gallery size with --synthetic")
+    parser.add_argument("--save-probes", help="Write the encoded --probes set to this .npz for later runs")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--target-far", type=float, default=DEFAULT_TARGET_FAR)
+    parser.add_argument("--early-stop", type=float, default=LEGACY_EARLY_STOP_THRESHOLD)
+    parser.add_argument("--probe-block", type=int, default=PROBE_BLOCK)
+    parser.add_argument("--gallery-block", type=int, default=GALLERY_BLOCK)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        gallery, probes, labels = _synthetic_set(args.gallery_size, args.synthetic, np.random.default_rng(args.seed))
+    else:
+        from database import Database
+        db = Database(args.db)
+        gallery = FaceGallery.from_rows(db.get_all_face_encodings())
+
+        if args.probes:
+            probes, labels = encode_probe_folder(args.probes, db.get_face_encoding_model(), args.workers)
+            if args.save_probes:
+                np.savez(args.save_probes, encodings=probes, labels=labels)
+                print(f"Probe encodings written to {args.save_probes}")
+        else:
+            with np.load(args.probes_npz) as data:
+                probes, labels = data["encodings"], data["labels"]
+
+    if len(gallery) == 0 or len(probes) == 0:
+        print("❌ Need at least one registered face and one probe")
+        return 1
+
+    report = calibrate(gallery, probes, labels, sorted(args.thresholds), args.target_far,
+                       args.probe_block, args.gallery_block, args.early_stop)
+    print(_format_report(report))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
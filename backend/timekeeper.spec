@@ -17,13 +17,20 @@ try:
 except ImportError:
     face_models_datas = []
 
+# Haar cascade used by the face pre-detector (face_detection.CASCADE_FILE)
+try:
+    import cv2
+    cascade_datas = [(os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'), 'cv2/data')]
+except (ImportError, AttributeError):
+    cascade_datas = []
+
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
     datas=[
         ('../frontend/dist', 'frontend/dist'),  # Include built frontend
-    ] + face_models_datas,  # Include face recognition model files
+    ] + face_models_datas + cascade_datas,  # Include face recognition model files and the Haar cascade
     hiddenimports=[
         'PyQt6.QtCore',
         'PyQt6.QtGui',
@@ -39,6 +46,11 @@ a = Analysis(
         'numpy',
         'PIL',
         'PIL.Image',
+        # Backend modules imported lazily (function-level imports)
+        'bulk_enrollment',
+        'face_index',
+        'face_reencoding',
+        'recognition_service',
     ],
     hookspath=[],
     hooksconfig={},
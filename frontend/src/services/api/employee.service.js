@@ -41,6 +41,13 @@ class EmployeeService {
    */
   async syncEmployeesWithCleanup() {
     try {
+      // Step 0: Push faces re-encoded after a model change, so cloud never
+      // hands other kiosks (or this one) the old encodings
+      const pendingUploads = await this.uploadPendingFaceEncodings()
+      if (!pendingUploads.success) {
+        console.warn('Some re-encoded faces were not uploaded:', pendingUploads.message)
+      }
+
       // Step 1: Fetch employees from API using the timekeeper endpoint
       const employeesResponse = await this.http.get('/api/employees/timekeeper/')
 
@@ -107,6 +114,71 @@ class EmployeeService {
     }
   }
 
+  /**
+   * Upload the encodings of a finished bulk enrollment to cloud
+   * (without this the next employee sync clears the new faces)
+   * @param {Array} uploads - [{employee_id, backend_id, face_encoding}] from the bulk enrollment report
+   */
+  async uploadBulkEnrollment(uploads) {
+    const failed = []
+
+    for (const upload of uploads || []) {
+      const result = await this.uploadFaceEncoding(upload.backend_id, upload.face_encoding)
+      if (!result.success) {
+        failed.push({ ...upload, message: result.message })
+      }
+    }
+
+    const uploaded = (uploads || []).length - failed.length
+    return {
+      success: failed.length === 0,
+      uploaded,
+      failed,
+      message: failed.length === 0
+        ? `Uploaded ${uploaded} face encodings`
+        : `Uploaded ${uploaded} face encodings, ${failed.length} failed`
+    }
+  }
+
+  /**
+   * Upload faces the kiosk re-encoded after an encoding model change
+   * (queued in the local database until cloud accepts them)
+   */
+  async uploadPendingFaceEncodings() {
+    if (!window.kioskBridge || !window.kioskBridge.getPendingFaceUploads) {
+      return { success: true, uploaded: 0, failed: [], message: 'No pending face uploads' }
+    }
+
+    try {
+      const pending = JSON.parse(await window.kioskBridge.getPendingFaceUploads())
+      if (!pending.success) {
+        throw new Error(pending.error || 'Failed to read pending face uploads')
+      }
+      if (pending.uploads.length === 0) {
+        return { success: true, uploaded: 0, failed: [], message: 'No pending face uploads' }
+      }
+
+      const result = await this.uploadBulkEnrollment(pending.uploads)
+      const failedIds = new Set(result.failed.map(upload => upload.employee_id))
+      const uploadedIds = pending.uploads
+        .map(upload => upload.employee_id)
+        .filter(employeeId => !failedIds.has(employeeId))
+      if (uploadedIds.length > 0) {
+        await window.kioskBridge.markFaceUploadsDone(JSON.stringify(uploadedIds))
+      }
+      return result
+
+    } catch (error) {
+      console.error('Error uploading re-encoded faces:', error)
+      return {
+        success: false,
+        uploaded: 0,
+        failed: [],
+        message: error.message || 'Failed to upload re-encoded faces'
+      }
+    }
+  }
+
   /**
    * Delete face encoding from cloud
    * @param {number} employeeId - Employee database ID
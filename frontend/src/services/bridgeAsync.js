@@ -0,0 +1,59 @@
+/**
+ * Async Bridge Shim
+ * Face recognition, quality check and registration run on a Python worker
+ * thread (recognizeFaceAsync etc.) and report back through Qt signals tagged
+ * with a request id. installAsyncBridge() wraps the bridge so existing
+ * `await kioskBridge.recognizeFace(photo)` call sites keep resolving to the
+ * same JSON string - without freezing the kiosk UI while dlib runs.
+ */
+
+const ASYNC_METHODS = {
+  recognizeFace: { slot: 'recognizeFaceAsync', signal: 'recognitionResult' },
+  recognizeFaces: { slot: 'recognizeFacesAsync', signal: 'multiRecognitionResult' },
+  checkFaceQuality: { slot: 'checkFaceQualityAsync', signal: 'faceQualityResult' },
+  registerFaceEncoding: { slot: 'registerFaceEncodingAsync', signal: 'faceRegistrationResult' },
+  registerFaceEncodingApproved: { slot: 'registerFaceEncodingApprovedAsync', signal: 'faceRegistrationResult' }
+}
+
+// Safety net in case a result never arrives (e.g. the worker crashed)
+const REQUEST_TIMEOUT_MS = 60000
+
+let nextRequestId = 1
+
+/**
+ * Route face methods through their async slots when the backend provides them.
+ * Safe to call more than once and on older backends (methods stay synchronous).
+ */
+export function installAsyncBridge(bridge) {
+  if (!bridge || bridge.__asyncInstalled) return bridge
+
+  for (const [method, { slot, signal }] of Object.entries(ASYNC_METHODS)) {
+    if (typeof bridge[slot] !== 'function' || !bridge[signal]) continue
+
+    const pending = new Map()
+
+    bridge[signal].connect((payloadJson) => {
+      const payload = JSON.parse(payloadJson)
+      const request = pending.get(payload.request_id)
+      if (!request) return
+
+      pending.delete(payload.request_id)
+      clearTimeout(request.timer)
+      request.resolve(JSON.stringify(payload.result))
+    })
+
+    bridge[method] = (...args) => new Promise((resolve, reject) => {
+      const requestId = `${method}-${nextRequestId++}`
+      const timer = setTimeout(() => {
+        pending.delete(requestId)
+        reject(new Error(`${method} timed out`))
+      }, REQUEST_TIMEOUT_MS)
+
+      pending.set(requestId, { resolve, timer })
+      bridge[slot](requestId, ...args)
+    })
+  }
+
+  bridge.__asyncInstalled = true
+  return bridge
+}